@@ -1,6 +1,7 @@
-from typing import Counter, Dict, List, Optional, Tuple
+from typing import Callable, Counter, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
 from a2_support import *
-import math
+import heapq
+import inspect
 
 
 # Replace these <strings> with your name, student number and email address.
@@ -14,6 +15,8 @@ __version__ = 1.0
 # Implement your classes here.
 class PokemonStats(object):
     """A class modelling the stats of a pokemon. These stats must be non-negative."""
+    __slots__ = ('_hit_chance', '_health', '_attack', '_defense')
+
     def __init__(self, stats: Tuple[float, int, int, int]) -> None:
         """Constructs an instance of PokemonStats.
         
@@ -26,12 +29,19 @@ class PokemonStats(object):
         self._attack = stats[STAT_ATTACK]
         self._defense = stats[STAT_DEFENSE]
         
-    def level_up(self) -> None:
-        """Grows the PokemonStats instance after the pokemon has levelled up."""
+    def level_up(self, levels: int = 1) -> None:
+        """Grows the PokemonStats instance after the pokemon has levelled up.
+
+        Parameters:
+            levels(int): The number of levels gained. The stats are the same as
+                after levelling up one level at a time.
+        """
+        if levels < 1:
+            return
         self._hit_chance = 1
-        self._health = int(self.get_max_health() * LEVEL_UP_STAT_GROWTH)
-        self._attack = int(self.get_attack() * LEVEL_UP_STAT_GROWTH)
-        self._defense = int(self.get_defense() * LEVEL_UP_STAT_GROWTH)
+        self._health = grow_stat(self.get_max_health(), levels)
+        self._attack = grow_stat(self.get_attack(), levels)
+        self._defense = grow_stat(self.get_defense(), levels)
 
     def get_hit_chance(self) -> float:
         """Return the pokemon's current chance at making a successful attack.
@@ -82,6 +92,22 @@ class PokemonStats(object):
             self._defense + modifier[3] if self._defense + modifier[3] > 0 else 0 
         ))
 
+    def snapshot(self) -> Tuple[float, int, int, int]:
+        """Returns a snapshot of these stats, which can later be passed to restore.
+
+        Returns:
+            (Tuple[float, int, int, int]): The stats, in the same structure as the constructor's.
+        """
+        return (self._hit_chance, self._health, self._attack, self._defense)
+
+    def restore(self, snapshot: Tuple[float, int, int, int]) -> None:
+        """Restores these stats, in place, to the state of a snapshot.
+
+        Parameters:
+            snapshot(Tuple[float, int, int, int]): A snapshot returned by snapshot.
+        """
+        self._hit_chance, self._health, self._attack, self._defense = snapshot
+
     def __str__(self) -> str:
         """(str): Returns the string representation of this class."""
         return f'PokemonStats(({self._hit_chance}, {self._health}, {self._attack}, {self._defense}))'
@@ -93,6 +119,10 @@ class PokemonStats(object):
 
 class Pokemon(object):
     """A class which represents a Pokemon."""
+    __slots__ = ('_name', '_stats', '_health', '_element_type', '_element_type_id', '_level',
+                 '_experience', '_moves', '_move_uses', '_move_slots', '_sorted_move_slots',
+                 '_modification_list', '_effective_stats', '_journal', '_faint_counters')
+
     def __init__(self, name: str, stats: PokemonStats, element_type: str, 
                 moves: List['Move'], level: int = 1) -> None:
         """Creates a Pokemon instance.
@@ -107,14 +137,30 @@ class Pokemon(object):
         self._name = name
         self._stats = stats
         self._health = stats.get_max_health()
+        # The unfainted counts of the trainers this pokemon belongs to. Each is a
+        # one-element list shared with its trainer, kept up to date by _set_health.
+        self._faint_counters: List[List[int]] = []
         self._element_type = element_type
+        self._element_type_id = ElementType.id_of(element_type)
         self._level = level
         self._experience = self._level ** 3
-        self._move_info: List[Tuple['Move', int]] = []
+        if len(moves) > MAXIMUM_MOVE_SLOTS:
+            raise ValueError(f'A pokemon can know at most {MAXIMUM_MOVE_SLOTS} moves.')
+        # Each move slot holds a move (or None) and its remaining uses. Slots are
+        # indexed by move, and the name-sorted slot order used by
+        # get_move_info is only rebuilt when a move is learned or forgotten.
+        self._moves: List[Optional['Move']] = [None] * MAXIMUM_MOVE_SLOTS
+        self._move_uses: List[int] = [0] * MAXIMUM_MOVE_SLOTS
+        self._move_slots: Dict['Move', int] = {}
+        self._sorted_move_slots: List[int] = []
         for move in moves:
             """Iterate over the information for each move in the move list."""
-            self._move_info.append((move, move.get_max_uses()))
+            self.learn_move(move)
         self._modification_list = []
+        # The stats after applying every modifier, or None when they need recomputing.
+        self._effective_stats: Optional[PokemonStats] = None
+        # The undo journal of the battle this pokemon is in, if it is journaling.
+        self._journal: Optional[List[Tuple]] = None
 
     def get_name(self) -> str:
         """Get this pokemon's name.
@@ -148,6 +194,22 @@ class Pokemon(object):
         """
         return self._element_type
 
+    def get_element_type_id(self) -> int:
+        """Get the id of the type of this pokemon.
+
+        Returns:
+            (int): Get the id of the type of this pokemon.
+        """
+        return self._element_type_id
+
+    def get_base_stats(self) -> PokemonStats:
+        """Get the stats of this pokemon before stat modifiers are applied.
+
+        Returns:
+            (PokemonStats): Get the base stats of this pokemon.
+        """
+        return self._stats
+
     def get_remaining_move_uses(self, move: 'Move') -> int:
         """Gets the number of moves left for the supplied move, or 0 if the pokemon doesn't know the move.
         
@@ -157,11 +219,11 @@ class Pokemon(object):
         Returns:
             (int):Gets the number of moves left for the supplied move.
         """
-        for learned_move in self._move_info:
-            """Iterate over the information for each learned move in the move information list."""
-            if learned_move[0] == move:
-                """Find the move in the move information list that is the same as the input move parameter."""
-                return learned_move[1]
+        slot = self._move_slots.get(move)
+        if slot is None:
+            """The pokemon doesn't know this move."""
+            return 0
+        return self._move_uses[slot]
 
     def get_level(self) -> int:
         """Get the level of this pokemon.
@@ -194,7 +256,7 @@ class Pokemon(object):
         Returns:
             (List): Gets the list of move information.
         """
-        return sorted(self._move_info, key=lambda key: key[0].get_name())
+        return [(self._moves[slot], self._move_uses[slot]) for slot in self._sorted_move_slots]
 
     def has_fainted(self) -> bool:
         """Return true if the pokemon has fainted.
@@ -214,14 +276,25 @@ class Pokemon(object):
         Parameters:
             change(int): The health change to be applied to the pokemon.
         """
+        if self._journal is not None:
+            self._journal.append((Pokemon._set_health, self, self._health))
         modified_health = self._health + change
         if modified_health >= self.get_stats().get_max_health():
             """Assume that the adjusted Health of the Pokemon is greater than its maximum health."""
-            self._health = self.get_stats().get_max_health()
+            self._set_health(self.get_stats().get_max_health())
         elif modified_health < 0:
-            self._health =  0
+            self._set_health(0)
         else:
-            self._health =  modified_health
+            self._set_health(modified_health)
+
+    def _set_health(self, health: int) -> None:
+        """Sets this pokemon's health, updating the unfainted count of each of its
+        trainers if the pokemon faints or is revived."""
+        if (health <= 0) != (self._health <= 0):
+            change = 1 if health > 0 else -1
+            for counter in self._faint_counters:
+                counter[0] += change
+        self._health = health
 
     def gain_experience(self, experience: int) -> None:
         """Increase the experience of this pokemon by the supplied amount, and level up if necessary.
@@ -229,19 +302,38 @@ class Pokemon(object):
         Parameters:
             experience(int): The amount of experience points to increase.
         """
+        if self._journal is not None:
+            self._journal.append((setattr, self, '_experience', self._experience))
         self._experience += experience
-        new_level = math.floor(self._experience ** (1/3))
-        for _ in range(new_level - self.get_level()):
-            """Iterate over how many levels pokemon have advanced in total, and update the upgraded properties."""
-            self.level_up()
+        levels = level_for_experience(self._experience) - self._level
+        if levels > 0:
+            """Jump straight to the new level, however many levels the pokemon has advanced."""
+            self.level_up(levels)
+
+    def level_up(self, levels: int = 1) -> None:
+        """Increase the level of this pokemon.
 
-    def level_up(self) -> None:
-        """Increase the level of this pokemon."""
+        Parameters:
+            levels(int): The number of levels to increase by. The stats and health are
+                the same as after levelling up one level at a time.
+        """
+        if self._journal is not None:
+            self._journal.append((Pokemon._undo_level_up, self, self._stats.snapshot(), self._level,
+                                  self._health, self._effective_stats))
         old_max_health = self._stats.get_max_health()
-        self._stats.level_up()
-        self._level += 1
+        self._stats.level_up(levels)
+        self._effective_stats = None
+        self._level += levels
         heal = self._stats.get_max_health() - old_max_health
-        self._health += heal
+        self._set_health(self._health + heal)
+
+    def _undo_level_up(self, stats: Tuple[float, int, int, int], level: int, health: int,
+                       effective_stats: Optional[PokemonStats]) -> None:
+        """Reverts a level up recorded in the undo journal."""
+        self._stats.restore(stats)
+        self._level = level
+        self._set_health(health)
+        self._effective_stats = effective_stats
 
     def experience_on_death(self) -> int:
         """The experience awarded to the victorious pokemon if this pokemon faints.
@@ -260,16 +352,11 @@ class Pokemon(object):
         Returns:
             (bool): Identify if this pokemon can learn this move.
         """
-        if len(self._move_info) >= MAXIMUM_MOVE_SLOTS:
+        if len(self._move_slots) >= MAXIMUM_MOVE_SLOTS:
             """Assume that the moves in the move list are greater than or equal to the maximum number of move that can be held."""
             return False
         else:
-            for learned_move in self._move_info:
-                if learned_move[0] == move:
-                    return False
-                else:
-                    pass
-            return True
+            return move not in self._move_slots
 
     def learn_move(self, move: 'Move') -> None:
         """Learns the given move, assuming the pokemon is able to.
@@ -277,7 +364,11 @@ class Pokemon(object):
         Parameters:
             move('Move'): move for pokemon to learn.
         """
-        self._move_info.append((move, move.get_max_uses()))
+        slot = next(slot for slot, learned_move in enumerate(self._moves) if learned_move is None)
+        self._moves[slot] = move
+        self._move_uses[slot] = move.get_max_uses()
+        self._move_slots[move] = slot
+        self._sort_move_slots()
 
     def forget_move(self, move: 'Move') -> None:
         """Forgets the supplied move, if the pokemon knows it.
@@ -285,10 +376,17 @@ class Pokemon(object):
         Parameters:
             move('Move'): move for pokemon to forget.
         """
-        for learned_move in self._move_info:
-            """Iterate over each learned move in the move list."""
-            if learned_move[0] == move:
-                self._move_info.remove(learned_move)
+        slot = self._move_slots.pop(move, None)
+        if slot is not None:
+            """The pokemon knows the move, so empty its slot."""
+            self._moves[slot] = None
+            self._move_uses[slot] = 0
+            self._sort_move_slots()
+
+    def _sort_move_slots(self) -> None:
+        """Rebuilds the name-sorted order of the occupied move slots."""
+        self._sorted_move_slots = sorted(self._move_slots.values(),
+                                         key=lambda slot: self._moves[slot].get_name())
 
     def has_moves_left(self) -> bool:
         """Returns true if the pokemon has any moves they can use.
@@ -296,12 +394,10 @@ class Pokemon(object):
         Returns:
             (bool): Identify if this pokemon has remaining move.
         """
-        for learned_move in  self._move_info:
-            """Iterate over each learned move in the move list."""
-            if learned_move[1] > 0:
+        for slot in self._sorted_move_slots:
+            """Iterate over each learned move's slot."""
+            if self._move_uses[slot] > 0:
                 return True
-            else:
-                pass
         return False
 
     def reduce_move_count(self, move: 'Move') -> None:
@@ -310,12 +406,16 @@ class Pokemon(object):
         Parameters:
             move('Move'): move for pokemon to reduce it uses.       
         """
-        for learned_move in self._move_info:
-            """Iterate over each learned move in the move list."""
-            if learned_move[0] == move:
-                count = learned_move[1] - 1
-                self._move_info.remove(learned_move)
-                self._move_info.append((move, count))
+        slot = self._move_slots.get(move)
+        if slot is not None:
+            """The pokemon knows the move."""
+            if self._journal is not None:
+                self._journal.append((Pokemon._undo_reduce_move_count, self, slot))
+            self._move_uses[slot] -= 1
+
+    def _undo_reduce_move_count(self, slot: int) -> None:
+        """Reverts a move use recorded in the undo journal."""
+        self._move_uses[slot] += 1
 
     def add_stat_modifier(self, modifier: Tuple[float, int, int, int], rounds: int) -> None:
         """Adds a stat modifier for a supplied number of rounds.
@@ -324,52 +424,142 @@ class Pokemon(object):
             modifier('Tuple[float, int, int, int]'): A stat modifier to be applied to the pokemon.
             rounds(int): The number of rounds that the stat modifier will be in effect for.         
         """
+        if self._journal is not None:
+            self._journal.append((Pokemon._undo_stat_modifier, self, self._health, self._effective_stats))
         self._modification_list.append((modifier, rounds))
+        if self._effective_stats is not None:
+            """Extend the cached stats with the new modifier, exactly as get_stats would."""
+            self._effective_stats = self._effective_stats.apply_modifier(modifier)
         new_stats = self.get_stats()
         new_max_health = new_stats.get_max_health()
         if self._health > new_max_health:
             """Assume that the current health is greater than the updated health upper limit."""
-            self._health = new_max_health
+            self._set_health(new_max_health)
         else:
             pass
 
+    def _undo_stat_modifier(self, health: int, effective_stats: Optional[PokemonStats]) -> None:
+        """Reverts a stat modifier recorded in the undo journal."""
+        self._modification_list.pop()
+        self._set_health(health)
+        self._effective_stats = effective_stats
+
+    def get_stat_modifiers(self) -> List[Tuple[Tuple[float, int, int, int], int]]:
+        """Return the stat modifiers currently in effect, in the order they were added.
+
+        Returns:
+            (List): Get the list of (modifier, remaining rounds) pairs.
+        """
+        return list(self._modification_list)
+
     def get_stats(self) -> PokemonStats:
         """Return the pokemon stats after applying all current modifications.
 
         Returns:
             (PokemonStats): Get current pokemon stats.
         """
-        new_stats = self._stats
-        for modification in self._modification_list:
-            """Iterate over each change in the modification list."""
-            new_stats = new_stats.apply_modifier(modification[0])
-        return new_stats
+        if self._effective_stats is None:
+            """The cached stats are out of date, so apply every modification again."""
+            new_stats = self._stats
+            for modification in self._modification_list:
+                """Iterate over each change in the modification list."""
+                new_stats = new_stats.apply_modifier(modification[0])
+            self._effective_stats = new_stats
+        return self._effective_stats
 
     def post_round_actions(self) -> None:
         """Update the stat modifiers by decrementing the remaining number of rounds they are in effect for."""
+        if self._journal is not None:
+            self._journal.append((Pokemon._undo_post_round_actions, self, self._modification_list,
+                                  self._health, self._effective_stats))
+        remaining_modifications = []
         for modification in self._modification_list:
             """Iterate over each change in the modification list."""
-            if modification[1] - 1 == 0:
-                """Suppose that the number of rounds in the modification is exhausted after using this round."""
-                self._modification_list.remove(modification)
-            else:
-                new_modification = modification[0], modification[1] - 1
-                self._modification_list.remove(modification)
-                self._modification_list.append(new_modification)
+            if modification[1] - 1 > 0:
+                """Keep the modifications which are still in effect next round."""
+                remaining_modifications.append((modification[0], modification[1] - 1))
+        if len(remaining_modifications) != len(self._modification_list):
+            """A modification expired, so the cached stats are out of date."""
+            self._effective_stats = None
+        self._modification_list = remaining_modifications
         new_max_health = self.get_stats().get_max_health()
         if self._health > new_max_health:
-            self._health  = new_max_health
+            self._set_health(new_max_health)
         else:
             pass
 
+    def _undo_post_round_actions(self, modification_list: List, health: int,
+                                 effective_stats: Optional[PokemonStats]) -> None:
+        """Reverts the end of a round recorded in the undo journal."""
+        self._modification_list = modification_list
+        self._set_health(health)
+        self._effective_stats = effective_stats
+
     def rest(self) -> None:
         """Returns this pokemon to max health, removes any remaining status modifiers, and resets all move uses to their maximums."""
-        self._health = self._stats.get_max_health()
+        self._set_health(self._stats.get_max_health())
         self._modification_list = []
-        new_move_info = []
-        for move in self._move_info:
-            new_move_info.append((move[0], move[0].get_max_uses()))
-        self._move_info = new_move_info
+        self._effective_stats = None
+        for slot in self._sorted_move_slots:
+            self._move_uses[slot] = self._moves[slot].get_max_uses()
+
+    def snapshot(self) -> Tuple:
+        """Returns a snapshot of this pokemon's mutable battle state: health, level,
+        experience, base stats, remaining move uses and stat modifiers.
+
+        Returns:
+            (Tuple): An opaque snapshot to pass to restore.
+        """
+        return (self._health, self._level, self._experience, self._stats.snapshot(),
+                tuple(self._move_uses), tuple(self._modification_list), self._effective_stats)
+
+    def restore(self, snapshot: Tuple) -> None:
+        """Restores this pokemon, in place, to the state of a snapshot.
+
+        Parameters:
+            snapshot(Tuple): A snapshot returned by snapshot.
+        """
+        (health, self._level, self._experience, stats, move_uses,
+         modifications, self._effective_stats) = snapshot
+        self._set_health(health)
+        self._stats.restore(stats)
+        self._move_uses[:] = move_uses
+        self._modification_list = list(modifications)
+
+    def state_key(self) -> Tuple:
+        """Returns a hashable key describing this pokemon's battle state by value.
+
+        Returns:
+            (Tuple): Equal for two pokemon of the same species in the same state.
+        """
+        return (self._health, self._level, self._experience,
+                tuple(self._move_uses[slot] for slot in self._sorted_move_slots),
+                tuple((tuple(modifier), rounds) for modifier, rounds in self._modification_list))
+
+    def clone(self) -> 'Pokemon':
+        """Returns an independent copy of this pokemon which shares its immutable moves.
+
+        Returns:
+            (Pokemon): The copied pokemon.
+        """
+        clone = Pokemon.__new__(Pokemon)
+        clone._name = self._name
+        clone._stats = PokemonStats(self._stats.snapshot())
+        clone._health = self._health
+        clone._faint_counters = []
+        clone._element_type = self._element_type
+        clone._element_type_id = self._element_type_id
+        clone._level = self._level
+        clone._experience = self._experience
+        clone._moves = list(self._moves)
+        clone._move_uses = list(self._move_uses)
+        clone._move_slots = dict(self._move_slots)
+        clone._sorted_move_slots = list(self._sorted_move_slots)
+        clone._modification_list = list(self._modification_list)
+        # Modified stats are never mutated, but unmodified stats are the base stats.
+        clone._effective_stats = None if self._effective_stats is self._stats else self._effective_stats
+        clone._journal = None
+        return clone
 
     def __str__(self) -> str:
         """(str): Returns a simple representation of this pokemons name and level."""
@@ -381,6 +571,8 @@ class Pokemon(object):
 
 class Trainer(object):
     '''A class representing a pokemon trainer. A trainer can have 6 Pokemon at maximum.'''
+    __slots__ = ('_name', '_inventory', '_all_pokemon', 'current_pokemon', '_journal', '_unfainted')
+
     def __init__(self, name: str) -> None:
         """Create an instance of the Trainer class.
         
@@ -391,6 +583,11 @@ class Trainer(object):
         self._inventory: Dict[Item, int] = {}
         self._all_pokemon: List[Pokemon] = []
         self.current_pokemon: Pokemon = None
+        # The undo journal of the battle this trainer is in, if it is journaling.
+        self._journal: Optional[List[Tuple]] = None
+        # The number of pokemon in the roster which have not fainted, in a cell
+        # shared with each of them so that they can update it as their health changes.
+        self._unfainted = [0]
 
     def get_name(self) -> str:
         """Return the trainer's name.
@@ -439,12 +636,7 @@ class Trainer(object):
         Returns:
             (bool): Identify if all the pokemon has fainted.
             """
-        for pokemon in self._all_pokemon:
-            if not pokemon.has_fainted():
-                return False
-            else:
-                pass
-        return True
+        return self._unfainted[0] == 0
 
     def can_add_pokemon(self, pokemon: Pokemon) -> bool:
         """Returns true if the supplied pokemon can be added to this trainer's roster.
@@ -468,11 +660,36 @@ class Trainer(object):
         Parameters:
             pokemon(Pokemon): Enter the pokemon we wang to add in the list.
         """
+        if self._journal is not None:
+            self._journal.append((Trainer._undo_add_pokemon, self, self.current_pokemon))
+            pokemon._journal = self._journal
         self._all_pokemon.append(pokemon)
+        self._attach(pokemon)
         if self.current_pokemon is None:
             """Assume there are no Pokemon currently."""
             self.current_pokemon = self._all_pokemon[0]
 
+    def _undo_add_pokemon(self, current_pokemon: Optional[Pokemon]) -> None:
+        """Reverts adding a pokemon recorded in the undo journal."""
+        self._detach(self._all_pokemon.pop())
+        self.current_pokemon = current_pokemon
+
+    def _attach(self, pokemon: Pokemon) -> None:
+        """Starts counting a pokemon just added to the roster in the unfainted count."""
+        pokemon._faint_counters.append(self._unfainted)
+        if not pokemon.has_fainted():
+            self._unfainted[0] += 1
+
+    def _detach(self, pokemon: Pokemon) -> None:
+        """Stops counting a pokemon just removed from the roster in the unfainted count."""
+        counters = pokemon._faint_counters
+        for index, counter in enumerate(counters):
+            if counter is self._unfainted:
+                del counters[index]
+                break
+        if not pokemon.has_fainted():
+            self._unfainted[0] -= 1
+
     def can_switch_pokemon(self, index: int) -> bool:
         """Determines if the pokemon index would be valid to switch to, and returns true if the switch would be valid.
         
@@ -496,6 +713,8 @@ class Trainer(object):
         Parameters:
             index(int): The index of the pokemon to switch to.
         """
+        if self._journal is not None:
+            self._journal.append((setattr, self, 'current_pokemon', self.current_pokemon))
         self.current_pokemon = self._all_pokemon[index]
 
     def add_item(self, item: 'Item', uses: int) -> None:
@@ -532,15 +751,89 @@ class Trainer(object):
         Parameters:
             item('Item'): The item to use.
         """
+        if self._journal is not None:
+            self._journal.append((Trainer._undo_use_item, self, dict(self._inventory)))
         if item in self._inventory:
             self._inventory[item] -= 1
+            if self._inventory[item] == 0:
+                """Assume that the number of items selected is 0."""
+                del self._inventory[item]
         else:
             pass
-        if self._inventory[item] == 0:
-            """Assume that the number of items selected is 0."""
-            del self._inventory[item]
-        else:
-            pass
+
+    def _undo_use_item(self, inventory: Dict['Item', int]) -> None:
+        """Reverts an item use recorded in the undo journal, keeping the inventory's order."""
+        self._inventory = inventory
+
+    def _set_journal(self, journal: Optional[List[Tuple]]) -> None:
+        """Attaches an undo journal to this trainer and its pokemon, or detaches it if None."""
+        self._journal = journal
+        for pokemon in self._all_pokemon:
+            pokemon._journal = journal
+
+    def snapshot(self) -> Tuple:
+        """Returns a snapshot of this trainer's mutable battle state: roster, current
+        pokemon, inventory counts and the state of every pokemon.
+
+        Returns:
+            (Tuple): An opaque snapshot to pass to restore.
+        """
+        return (tuple(self._all_pokemon), self.current_pokemon, tuple(self._inventory.items()),
+                tuple(pokemon.snapshot() for pokemon in self._all_pokemon))
+
+    def restore(self, snapshot: Tuple) -> None:
+        """Restores this trainer, in place, to the state of a snapshot.
+
+        Parameters:
+            snapshot(Tuple): A snapshot returned by snapshot.
+        """
+        all_pokemon, self.current_pokemon, inventory, pokemon_snapshots = snapshot
+        if len(all_pokemon) != len(self._all_pokemon) or any(
+                pokemon is not current for pokemon, current in zip(all_pokemon, self._all_pokemon)):
+            """The roster has changed since the snapshot, such as by a catch."""
+            for pokemon in self._all_pokemon:
+                self._detach(pokemon)
+            self._all_pokemon[:] = all_pokemon
+            for pokemon in all_pokemon:
+                self._attach(pokemon)
+        self._inventory = dict(inventory)
+        for pokemon, pokemon_snapshot in zip(all_pokemon, pokemon_snapshots):
+            pokemon.restore(pokemon_snapshot)
+
+    def state_key(self) -> Tuple:
+        """Returns a hashable key describing this trainer's battle state by value.
+
+        Returns:
+            (Tuple): The current pokemon's index, inventory counts and each pokemon's state key.
+        """
+        current = -1
+        for index, pokemon in enumerate(self._all_pokemon):
+            if pokemon is self.current_pokemon:
+                current = index
+        return (current, frozenset((item.state_key(), uses) for item, uses in self._inventory.items()),
+                tuple(pokemon.state_key() for pokemon in self._all_pokemon))
+
+    def clone(self, clones: Optional[Dict[int, Pokemon]] = None) -> 'Trainer':
+        """Returns an independent copy of this trainer and its pokemon.
+
+        Parameters:
+            clones(Optional[Dict[int, Pokemon]]): Pokemon already cloned, by id of
+                the original, so that a pokemon shared between trainers is cloned once.
+
+        Returns:
+            (Trainer): The copied trainer.
+        """
+        clones = {} if clones is None else clones
+        clone = Trainer(self._name)
+        for pokemon in self._all_pokemon:
+            if id(pokemon) not in clones:
+                clones[id(pokemon)] = pokemon.clone()
+            clone._all_pokemon.append(clones[id(pokemon)])
+            clone._attach(clones[id(pokemon)])
+        if self.current_pokemon is not None:
+            clone.current_pokemon = clones[id(self.current_pokemon)]
+        clone._inventory = dict(self._inventory)
+        return clone
 
     def __str__(self) -> str:
         """(str): Returns a string representation of a Trainer"""
@@ -550,22 +843,154 @@ class Trainer(object):
         """(str): Returns a string representation of a Trainer"""
         return f"Trainer('{self._name}')"
 
+class ActionScheduler(object):
+    """The actions queued in the current round, and the actors who have already acted in it.
+
+    Queued actions are kept in a binary heap ordered by Action.get_priority, lowest
+    first, with actions of equal priority performed in the order they were queued.
+    Queueing and performing an action take O(log n) time and checking whether an
+    actor has queued or acted takes O(1), so rounds with many actors stay cheap.
+    Actors can be any hashable value, such as whether the player is acting.
+    """
+    __slots__ = ('_heap', '_queued', '_acted', '_sequence')
+
+    def __init__(self) -> None:
+        """Creates an empty ActionScheduler."""
+        # (priority, sequence, action, actor) entries. The sequence number is unique,
+        # so ties are broken by queueing order and actions are never compared.
+        self._heap: List[Tuple[int, int, 'Action', Hashable]] = []
+        self._queued = set()
+        self._acted: List[Hashable] = []
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        """(int): Return the number of queued actions."""
+        return len(self._heap)
+
+    def push(self, action: 'Action', actor: Hashable) -> None:
+        """Queues an action.
+
+        Parameters:
+            action(Action): The action to queue.
+            actor(Hashable): The actor performing the action.
+        """
+        heapq.heappush(self._heap, (action.get_priority(), self._sequence, action, actor))
+        self._sequence += 1
+        self._queued.add(actor)
+
+    def pop(self) -> Tuple['Action', Hashable]:
+        """Removes the next action to perform, recording that its actor has acted.
+
+        Returns:
+            (Tuple[Action, Hashable]): The action and its actor.
+        """
+        _, _, action, actor = heapq.heappop(self._heap)
+        self._queued.discard(actor)
+        self._acted.append(actor)
+        return action, actor
+
+    def has_queued(self, actor: Hashable) -> bool:
+        """Returns true if the actor has an action queued.
+
+        Parameters:
+            actor(Hashable): The actor to check for.
+
+        Returns:
+            (bool): True if the actor has an action queued.
+        """
+        return actor in self._queued
+
+    def get_acted_count(self) -> int:
+        """Returns the number of actions performed this round.
+
+        Returns:
+            (int): The number of actors who have acted this round.
+        """
+        return len(self._acted)
+
+    def get_queued(self) -> List[Tuple['Action', Hashable]]:
+        """Returns the queued actions in the order they will be performed.
+
+        Returns:
+            (List[Tuple[Action, Hashable]]): Each queued action and its actor.
+        """
+        return [(action, actor) for _, _, action, actor in sorted(self._heap)]
+
+    def end_round(self) -> None:
+        """Forgets who has acted, so that every actor can queue an action for the next round."""
+        self._acted = []
+        if not self._heap:
+            self._sequence = 0
+
+    def snapshot(self) -> Tuple[Tuple, Tuple]:
+        """Returns the queued actions, in order, and the actors who have acted.
+
+        Returns:
+            (Tuple[Tuple, Tuple]): The (queued, acted) pair to pass to restore.
+        """
+        return tuple(self.get_queued()), tuple(self._acted)
+
+    def restore(self, queued: Tuple, acted: Tuple) -> None:
+        """Restores the scheduler to a state returned by snapshot.
+
+        Parameters:
+            queued(Tuple): The (action, actor) pairs queued, in the order they will be performed.
+            acted(Tuple): The actors who have acted this round.
+        """
+        # A list sorted by priority and sequence is already a valid heap.
+        self._heap = [(action.get_priority(), sequence, action, actor)
+                      for sequence, (action, actor) in enumerate(queued)]
+        self._queued = {actor for _, actor in queued}
+        self._acted = list(acted)
+        self._sequence = len(queued)
+
+    def copy(self) -> 'ActionScheduler':
+        """Returns an independent copy of this scheduler, sharing its actions.
+
+        Returns:
+            (ActionScheduler): The copied scheduler.
+        """
+        copy = ActionScheduler()
+        copy._heap = list(self._heap)
+        copy._queued = set(self._queued)
+        copy._acted = list(self._acted)
+        copy._sequence = self._sequence
+        return copy
+
+
 class Battle(object):
     """A class which represents a pokemon battle."""
-    def __init__(self, player: Trainer, enemy: Trainer, is_trainer_battle: bool) -> None:
+    __slots__ = ('_player', '_enemy', '_is_trainer_battle', '_scheduler', '_end_early',
+                 '_journal', '_journal_marks', '_random', '_headless', 'observers')
+
+    def __init__(self, player: Trainer, enemy: Trainer, is_trainer_battle: bool,
+                 rng: Optional[BattleRandom] = None, headless: bool = False) -> None:
         """Creates an instance of a trainer battle.
         
         Parameters:
             player(Trainer): The trainer corresponding to the player character.
             enemy(Trainer): The enemy trainer.
             is_trainer_battle(bool): True if the battle takes place between trainers.
+            rng(Optional[BattleRandom]): The stream the battle's rolls are drawn from,
+                which is freshly seeded if not supplied.
+            headless(bool): True if no one reads the summaries of this battle's actions,
+                so that no events are recorded for them.
         """
         self._player = player
         self._enemy = enemy
         self._is_trainer_battle = is_trainer_battle
-        self._action_queue: List[Tuple[Action, bool]] = []
-        self._trainer_queue = []
+        self._random = BattleRandom() if rng is None else rng
+        self._headless = headless
+        # The subscribers to this battle's events, or None while there are none so
+        # that the engine only checks this attribute before building any event.
+        self.observers: Optional[BattleObservers] = None
+        # The actions queued this round, and who has acted, with whether the player queued them as the actor.
+        self._scheduler = ActionScheduler()
         self._end_early = False
+        # The optional undo journal, holding (undo function, *arguments) records, and
+        # the journal length at the start of each undoable step.
+        self._journal: Optional[List[Tuple]] = None
+        self._journal_marks: List[int] = []
 
     def get_turn(self) -> Optional[bool]:
         """Get whose turn it currently is.
@@ -573,13 +998,9 @@ class Battle(object):
         Returns
             (Optional[bool]): Identify whose turn it is now.
         """
-        for action in self._action_queue:
-            """Iterate over each action in the action list."""
-            if action[1] == True:
-                """The trainer that performs the action is Player."""
-                return False
-            else:
-                pass
+        if self._scheduler.has_queued(True):
+            """The player has already queued their action."""
+            return False
         return True
 
     def get_trainer(self, is_player: bool) -> Trainer:
@@ -596,10 +1017,71 @@ class Battle(object):
         else:
             return self._enemy 
 
+    def get_random(self) -> BattleRandom:
+        """Return the random stream this battle's hit and catch rolls are drawn from.
+
+        Returns:
+            (BattleRandom): The battle's random stream.
+        """
+        return self._random
+
+    def is_headless(self) -> bool:
+        """Returns true if the summaries of this battle's actions record no events.
+
+        Returns:
+            (bool): True if this battle is headless.
+        """
+        return self._headless
+
+    def set_headless(self, headless: bool) -> None:
+        """Sets whether the summaries of this battle's actions record events.
+
+        Parameters:
+            headless(bool): True if no events should be recorded.
+        """
+        self._headless = headless
+
+    def subscribe(self, callback: Callable, kinds: Optional[Iterable[int]] = None,
+                  batched: bool = False) -> None:
+        """Subscribes to this battle's events, such as actions being applied, damage
+        being dealt, pokemon fainting or levelling up, switches, items being used and
+        the battle ending.
+
+        Parameters:
+            callback(Callable): Called as callback(battle, event) for each event, or as
+                callback(battle, events) with a list of events if batched.
+            kinds(Optional[Iterable[int]]): The EVENT_ kinds to receive, or None for all.
+            batched(bool): True to receive the events of each round together, at its end.
+        """
+        if self.observers is None:
+            self.observers = BattleObservers()
+        self.observers.subscribe(callback, kinds, batched)
+
+    def unsubscribe(self, callback: Callable) -> None:
+        """Removes every subscription of the supplied callback.
+
+        Parameters:
+            callback(Callable): The callback to remove.
+        """
+        if self.observers is not None:
+            self.observers.unsubscribe(callback)
+            if self.observers.is_empty():
+                self.observers = None
+
+    def set_random(self, rng: BattleRandom) -> None:
+        """Replaces the random stream this battle's rolls are drawn from.
+
+        Parameters:
+            rng(BattleRandom): The new random stream.
+        """
+        self._random = rng
+
     def attempt_end_early(self) -> None:
         """Ends the battle early if it's not a trainer battle."""
         if not self._is_trainer_battle:
             """Suppose it's not a fight between trainers."""
+            if self._journal is not None:
+                self._journal.append((setattr, self, '_end_early', self._end_early))
             self._end_early = True
 
     def is_trainer_battle(self) -> bool:
@@ -616,7 +1098,7 @@ class Battle(object):
         Returns:
             (bool): Identify if there is move from both trainers in the queue.
         """
-        if len(self._action_queue) >= 2:
+        if len(self._scheduler) >= 2:
             """Suppose the action queue is full of actions. Including two actions."""
             return True
         else:
@@ -628,12 +1110,20 @@ class Battle(object):
         Returns：
             (bool): Identify if the queue is empty.
         """
-        if len(self._action_queue) == 0:
+        if len(self._scheduler) == 0:
             """Assume there are no actions in the action queue."""
             return True
         else:
             return False
         
+    def get_queued_actions(self) -> List[Tuple['Action', bool]]:
+        """Returns the queued actions, in the order enact_turn will perform them.
+
+        Returns:
+            (List[Tuple[Action, bool]]): Each queued action and whether the player queued it.
+        """
+        return self._scheduler.get_queued()
+
     def trainer_has_action_queued(self, is_player: bool) -> bool:
         """Returns true if the supplied trainer has an action queued.
         
@@ -643,13 +1133,50 @@ class Battle(object):
         Returns:
             (bool): Idetify if the trainer has move in the queue.
         """
-        for action in self._action_queue:
-            if action[1] == is_player:
-                """Assume that the performer of the action is the Player."""
-                return True
-            else:
-                pass
-        return False
+        return self._scheduler.has_queued(is_player)
+
+    def can_queue_action(self, is_player: bool) -> bool:
+        """Returns true if the supplied trainer may queue an action now: the battle is not
+        over, the round has not started and the trainer has not queued an action yet.
+
+        Parameters:
+            is_player(bool): True if the trainer we want to check for is the player.
+
+        Returns:
+            (bool): True if the trainer may queue an action.
+        """
+        if self.is_over() or self._scheduler.get_acted_count() != 0:
+            """Actions can only be queued between rounds of a battle which is still going."""
+            return False
+        return not self._scheduler.has_queued(is_player)
+
+    def legal_actions(self, is_player: bool) -> Iterator['Action']:
+        """Yields every action the supplied trainer could validly queue now: moves with uses
+        left in get_move_info order, switches by roster index, items in inventory order and
+        then fleeing. Whether the trainer may act at all is only checked once, rather than
+        for each candidate as is_valid does.
+
+        Parameters:
+            is_player(bool): True if the trainer we want the actions of is the player.
+
+        Yields:
+            (Action): Each valid action.
+        """
+        if not self.can_queue_action(is_player):
+            return
+        trainer = self.get_trainer(is_player)
+        for move, uses in trainer.get_current_pokemon().get_move_info():
+            if uses > 0:
+                yield move
+        for index in range(len(trainer.get_all_pokemon())):
+            if trainer.can_switch_pokemon(index):
+                yield SwitchPokemon(index)
+        for item in tuple(trainer.get_inventory()):
+            if item.can_apply(self, is_player):
+                yield item
+        flee = Flee()
+        if flee.can_apply(self, is_player):
+            yield flee
 
     def is_ready(self) -> bool:
         """Returns true if the next action is ready to be performed.
@@ -660,11 +1187,9 @@ class Battle(object):
         if self.is_over():
             """Suppose the battle is over."""
             return False
-        elif len(self._action_queue) == 2 and len(self._trainer_queue) == 0:
-            """There are two actions in the action queue, and no trainers in the trainer queue."""
-            return True
-        elif len(self._action_queue) == 1 and len(self._trainer_queue) == 1:
-            """One of the trainers completes the action and enters the trainer queue."""
+        queued = len(self._scheduler)
+        if queued != 0 and queued + self._scheduler.get_acted_count() == 2:
+            """Both trainers have either queued an action or already acted this round."""
             return True
         else:
             return False
@@ -678,7 +1203,10 @@ class Battle(object):
         """
         if action.is_valid(self, is_player=is_player):
             """The action is valid and is made by the trainer of the turn."""
-            self._action_queue.append((action, is_player))
+            if self._journal is not None:
+                self._journal_marks.append(len(self._journal))
+                self._journal.append((Battle._restore_queues, self) + self._scheduler.snapshot())
+            self._scheduler.push(action, is_player)
         else:
             pass
 
@@ -688,16 +1216,118 @@ class Battle(object):
         Returns:
             (Optional['ActionSummary']): If the move is valid, trying to perform the move.
         """
-        sorted(self._action_queue, key=lambda key: key[0].get_priority())
-        action = self._action_queue.pop(0)
-        action_summary = action[0].apply(self, action[1])
-        if action[1]:
-            """Assume that the initiator of the action is Player."""
-            self._trainer_queue.append(self._player)
-        else:
-            self._trainer_queue.append(self._enemy)
+        if self._journal is not None:
+            self._journal_marks.append(len(self._journal))
+            self._journal.append((Battle._restore_queues, self) + self._scheduler.snapshot())
+        action, is_player = self._scheduler.pop()
+        action_summary = action.apply(self, is_player)
+        if self.observers is not None:
+            self.observers.notify_action(self, action, is_player)
+        if self.is_action_queue_empty():
+            """Both trainers have acted, so the round is over."""
+            self.end_round()
         return action_summary
 
+    def end_round(self) -> None:
+        """Ends the current round, letting both current pokemon update their stat modifiers
+        and allowing both trainers to queue their next action."""
+        for trainer in (self._player, self._enemy):
+            """Iterate over both trainers in the battle."""
+            if len(trainer.get_all_pokemon()) != 0:
+                trainer.get_current_pokemon().post_round_actions()
+        self._scheduler.end_round()
+        if self.observers is not None:
+            self.observers.flush(self)
+
+    def enable_journal(self) -> None:
+        """Starts recording an undo journal, so that every queued and enacted action
+        from now on can be rolled back with undo. Any existing journal is discarded."""
+        self._journal = []
+        self._journal_marks = []
+        self._player._set_journal(self._journal)
+        self._enemy._set_journal(self._journal)
+
+    def disable_journal(self) -> None:
+        """Stops recording the undo journal and discards it."""
+        self._journal = None
+        self._journal_marks = []
+        self._player._set_journal(None)
+        self._enemy._set_journal(None)
+
+    def can_undo(self) -> bool:
+        """Returns true if the undo journal holds a step which can be rolled back.
+
+        Returns:
+            (bool): Identify if there is a step to undo.
+        """
+        return len(self._journal_marks) != 0
+
+    def undo(self) -> None:
+        """Rolls back, in place, the last queue_action or enact_turn recorded in the
+        undo journal, including every pokemon and trainer change the action made."""
+        if not self.can_undo():
+            raise ValueError('There is no journaled action to undo.')
+        mark = self._journal_marks.pop()
+        journal = self._journal
+        while len(journal) > mark:
+            record = journal.pop()
+            record[0](*record[1:])
+
+    def _restore_queues(self, queued: Tuple, acted: Tuple) -> None:
+        """Reverts the scheduler to a state recorded in the undo journal."""
+        self._scheduler.restore(queued, acted)
+
+    def snapshot(self) -> Tuple:
+        """Returns a snapshot of the mutable state of this battle, which can later be
+        passed to restore. Immutable definitions such as moves and items are shared
+        rather than copied, so taking a snapshot is cheap.
+
+        Returns:
+            (Tuple): An opaque snapshot to pass to restore.
+        """
+        return (self._player.snapshot(), self._enemy.snapshot()) + self._scheduler.snapshot() + (self._end_early,)
+
+    def restore(self, snapshot: Tuple) -> None:
+        """Restores this battle, in place, to the state of a snapshot. A snapshot can
+        be restored any number of times.
+
+        Parameters:
+            snapshot(Tuple): A snapshot returned by snapshot.
+        """
+        player, enemy, queued, acted, self._end_early = snapshot
+        self._player.restore(player)
+        self._enemy.restore(enemy)
+        self._scheduler.restore(queued, acted)
+
+    def state_key(self) -> Tuple:
+        """Returns a canonical, hashable key of this battle's state. Two battles between
+        the same rosters have equal keys exactly when they are in the same state, even if
+        one is a clone of the other.
+
+        Returns:
+            (Tuple): The key of this battle's state.
+        """
+        return (self._player.state_key(), self._enemy.state_key(), self._end_early,
+                tuple((action.state_key(), is_player) for action, is_player in self._scheduler.get_queued()),
+                self._scheduler.get_acted_count())
+
+    def clone(self) -> 'Battle':
+        """Returns an independent copy of this battle, its trainers and their pokemon.
+
+        The copy draws its rolls from a new sub-stream of this battle's random stream,
+        so playing on the copy does not change the rolls of this battle.
+
+        Returns:
+            (Battle): The copied battle.
+        """
+        clones = {}
+        player = self._player.clone(clones)
+        enemy = self._enemy.clone(clones)
+        clone = Battle(player, enemy, self._is_trainer_battle, self._random.spawn()[0], self._headless)
+        clone._scheduler = self._scheduler.copy()
+        clone._end_early = self._end_early
+        return clone
+
     def is_over(self) -> bool:
         """Returns true if the battle is over.
         
@@ -713,18 +1343,113 @@ class Battle(object):
             return False
 
 
+class BattleEvent(object):
+    """Something which happened during an action, such as a move being used or a
+    pokemon fainting. Events hold references to the pokemon, trainers, moves and
+    items involved, and are only rendered as a message when one is asked for."""
+    __slots__ = ('_kind', '_actor', '_target', '_move', '_amount', '_text')
+
+    def __init__(self, kind: int, actor=None, target=None, move=None,
+                 amount: Optional[int] = None, text: Optional[str] = None) -> None:
+        """Creates a BattleEvent.
+
+        Parameters:
+            kind(int): The kind of event, one of the EVENT_ constants.
+            actor(Optional[Union[Pokemon, Trainer]]): The pokemon or trainer performing the action.
+            target(Optional[Pokemon]): The pokemon affected by the action.
+            move(Optional[Union[Move, Item]]): The move or item used.
+            amount(Optional[int]): The amount involved, such as the experience gained.
+            text(Optional[str]): The text of a plain message event.
+        """
+        self._kind = kind
+        self._actor = actor
+        self._target = target
+        self._move = move
+        self._amount = amount
+        self._text = text
+
+    def get_kind(self) -> int:
+        """(int): Return the kind of this event, one of the EVENT_ constants."""
+        return self._kind
+
+    def get_actor(self):
+        """(Optional[Union[Pokemon, Trainer]]): Return the pokemon or trainer performing the action."""
+        return self._actor
+
+    def get_target(self) -> Optional['Pokemon']:
+        """(Optional[Pokemon]): Return the pokemon affected by the action."""
+        return self._target
+
+    def get_move(self):
+        """(Optional[Union[Move, Item]]): Return the move or item used."""
+        return self._move
+
+    def get_amount(self) -> Optional[int]:
+        """(Optional[int]): Return the amount involved in this event."""
+        return self._amount
+
+    def get_message(self) -> str:
+        """Renders this event as a message.
+
+        Returns:
+            (str): The message describing this event.
+        """
+        return EVENT_TEMPLATES[self._kind].format(
+            actor=self._describe(self._actor), target=self._describe(self._target),
+            move=self._describe(self._move), amount=self._amount, text=self._text)
+
+    @staticmethod
+    def _describe(value) -> str:
+        """Returns the name of a pokemon, trainer, move or item, or the string of any other action."""
+        if value is None:
+            return ''
+        get_name = getattr(value, 'get_name', None)
+        return str(value) if get_name is None else get_name()
+
+    def __str__(self) -> str:
+        """(str): Return the message describing this event."""
+        return self.get_message()
+
+    def __repr__(self) -> str:
+        """(str): Return a string representation of this event."""
+        return f'{__class__.__name__}({self._kind}, {self._actor!r}, {self._target!r}, {self._move!r}, {self._amount!r})'
+
+
 class ActionSummary():
-    '''A class containing messages about actions and their effects.''' 
-    def __init__(self, message: Optional[str] = None) -> None:
+    '''A class containing the events of actions and their effects.
+
+    Events are stored as BattleEvents and only rendered as messages when get_messages
+    is called. A headless summary records nothing at all.
+    '''
+    __slots__ = ('_events',)
+
+    def __init__(self, message: Optional[str] = None, headless: bool = False) -> None:
         """Constructs a new ActionSummary with an optional message.
 
         Parameters:
             message(Optional[str]): An optional message to be included.
+            headless(bool): True if this summary should record no events.
         """
-        self._message = []
+        self._events: Optional[List[BattleEvent]] = None if headless else []
         if message is not None:
             """Let's say the message is not empty."""
-            self._message.append(message)
+            self.add_message(message)
+
+    def is_headless(self) -> bool:
+        """Returns true if this summary records no events.
+
+        Returns:
+            (bool): True if this summary is headless.
+        """
+        return self._events is None
+
+    def get_events(self) -> List[BattleEvent]:
+        """Returns the events recorded by this summary.
+
+        Returns:
+            (List[BattleEvent]): The recorded events, in the order they happened.
+        """
+        return [] if self._events is None else self._events
 
     def get_messages(self) -> List[str]:
         """Returns a list of the messages contained within this summary.
@@ -732,7 +1457,20 @@ class ActionSummary():
         Returns:
             (list): Get the entered message.
         """
-        return self._message
+        return [event.get_message() for event in self.get_events()]
+
+    def add_event(self, kind: int, actor=None, target=None, move=None, amount: Optional[int] = None) -> None:
+        """Records an event, unless this summary is headless.
+
+        Parameters:
+            kind(int): The kind of event, one of the EVENT_ constants.
+            actor(Optional[Union[Pokemon, Trainer]]): The pokemon or trainer performing the action.
+            target(Optional[Pokemon]): The pokemon affected by the action.
+            move(Optional[Union[Move, Item]]): The move or item used.
+            amount(Optional[int]): The amount involved, such as the experience gained.
+        """
+        if self._events is not None:
+            self._events.append(BattleEvent(kind, actor, target, move, amount))
 
     def add_message(self, message: str) -> None:
         """Adds the supplied message to the ActionSummary instance.
@@ -740,7 +1478,8 @@ class ActionSummary():
         Parameters:
             message(str):The message to add.
         """
-        self._message.append(message)
+        if self._events is not None:
+            self._events.append(BattleEvent(EVENT_MESSAGE, text=message))
 
     def combine(self, summary: 'ActionSummary') -> None:
         """Combines two ActionSummaries.
@@ -748,11 +1487,116 @@ class ActionSummary():
         Parameters:
             summary('ActionSummary'): A summary containing the messages to add.
         """
-        self._message.extend(summary.get_messages())
+        if self._events is not None and summary._events:
+            self._events.extend(summary._events)
+
+
+class BattleObservers(object):
+    """The subscribers to a battle's events, and the events awaiting batched subscribers.
+
+    A battle only holds a BattleObservers while someone is subscribed, so the engine
+    checks a single attribute before building any event.
+    """
+    __slots__ = ('_subscribers', '_batched', '_pending', '_finished')
+
+    def __init__(self) -> None:
+        """Creates an empty BattleObservers."""
+        # (callback, kinds or None for every kind) of each subscriber.
+        self._subscribers: List[Tuple[Callable, Optional[frozenset]]] = []
+        self._batched: List[Tuple[Callable, Optional[frozenset]]] = []
+        self._pending: List[BattleEvent] = []
+        self._finished = False
+
+    def subscribe(self, callback: Callable, kinds: Optional[Iterable[int]] = None,
+                  batched: bool = False) -> None:
+        """Adds a subscriber.
+
+        Parameters:
+            callback(Callable): Called as callback(battle, event) for each event, or as
+                callback(battle, events) with a list of events if batched.
+            kinds(Optional[Iterable[int]]): The EVENT_ kinds to receive, or None for all.
+            batched(bool): True to receive the events of each round together, at its end.
+        """
+        kinds = None if kinds is None else frozenset(kinds)
+        (self._batched if batched else self._subscribers).append((callback, kinds))
+
+    def unsubscribe(self, callback: Callable) -> None:
+        """Removes every subscription of the supplied callback.
+
+        Parameters:
+            callback(Callable): The callback to remove.
+        """
+        self._subscribers = [each for each in self._subscribers if each[0] != callback]
+        self._batched = [each for each in self._batched if each[0] != callback]
+
+    def is_empty(self) -> bool:
+        """Returns true if there are no subscribers.
+
+        Returns:
+            (bool): True if no one is subscribed.
+        """
+        return not self._subscribers and not self._batched
+
+    def notify(self, battle: 'Battle', event: BattleEvent) -> None:
+        """Sends an event to the immediate subscribers, and holds it for the batched ones.
+
+        Parameters:
+            battle(Battle): The battle the event happened in.
+            event(BattleEvent): The event.
+        """
+        kind = event.get_kind()
+        for callback, kinds in self._subscribers:
+            if kinds is None or kind in kinds:
+                callback(battle, event)
+        if self._batched:
+            self._pending.append(event)
+
+    def notify_action(self, battle: 'Battle', action: 'Action', is_player: bool) -> None:
+        """Sends the events which follow an action being applied, ending with the end of
+        the battle if the action ended it.
+
+        Parameters:
+            battle(Battle): The battle the action was applied in.
+            action(Action): The action applied.
+            is_player(bool): True if the player performed the action.
+        """
+        trainer = battle.get_trainer(is_player)
+        self.notify(battle, BattleEvent(EVENT_ACTION_APPLIED, trainer, move=action))
+        if isinstance(action, Item):
+            self.notify(battle, BattleEvent(EVENT_ITEM_USED, trainer, trainer.get_current_pokemon(), action))
+        elif isinstance(action, SwitchPokemon):
+            self.notify(battle, BattleEvent(EVENT_SWITCHED, trainer, trainer.get_current_pokemon(), action))
+        if not self._finished and battle.is_over():
+            """Each battle only ends once."""
+            self._finished = True
+            winner = None
+            if battle.get_trainer(True).all_pokemon_fainted():
+                winner = battle.get_trainer(False)
+            elif battle.get_trainer(False).all_pokemon_fainted():
+                winner = battle.get_trainer(True)
+            self.notify(battle, BattleEvent(EVENT_BATTLE_OVER, winner))
+            self.flush(battle)
+
+    def flush(self, battle: 'Battle') -> None:
+        """Sends the events held since the last flush to the batched subscribers.
+
+        Parameters:
+            battle(Battle): The battle the events happened in.
+        """
+        if not self._pending:
+            return
+        events, self._pending = self._pending, []
+        for callback, kinds in self._batched:
+            """Each subscriber filters the round's events for itself."""
+            selected = events if kinds is None else [event for event in events if event.get_kind() in kinds]
+            if selected:
+                callback(battle, selected)
 
 
 class Action(object):
     '''An abstract class detailing anything which takes up a turn in battle.'''
+    __slots__ = ()
+
     def get_priority(self) -> int:
         """Returns the priority of this action, which is used to determine which action is performed first each round in the battle.
         
@@ -761,6 +1605,15 @@ class Action(object):
         """
         return DEFAULT_ACTION_PRIORITY
 
+    def state_key(self) -> Tuple:
+        """Returns a hashable key identifying this action by value, so that equal actions
+        from different battles, such as clones, have equal keys.
+
+        Returns:
+            (Tuple): The action's class and the arguments it was created with.
+        """
+        return (type(self),)
+
     def is_valid(self, battle: Battle, is_player: bool) -> bool:
         """Determines if the action would be valid for the given trainer and battle state. Returns true if it would be valid.
         
@@ -771,18 +1624,24 @@ class Action(object):
         Returns:
             (bool): Identify if the move is valid.    
         """
-        if battle.is_over(): 
-            """Suppose the battle is over."""
+        if not battle.can_queue_action(is_player):
+            """The battle is over, the round has started or the trainer has already queued an action."""
             return False
-        if len(battle._trainer_queue) != 0:
-            """Assume that the trainer queue is not empty, that is, a trainer has completed the action."""
-            return False
-        for action in battle._action_queue:
-            if action[1] == is_player:
-                """The trainer that performs the action is player."""
-                return False
-            else:
-                pass
+        return self.can_apply(battle, is_player)
+
+    def can_apply(self, battle: Battle, is_player: bool) -> bool:
+        """Determines if the given trainer could perform this action in the battle's state,
+        whether or not they may queue an action right now. Subclasses override this
+        rather than is_valid, so that Battle.legal_actions can check whether the trainer
+        may act only once.
+
+        Parameters:
+            battle(Battle): The ongoing pokemon battle
+            is_player(bool): True if the player is using this action.
+
+        Returns:
+            (bool): True if the trainer could perform this action.
+        """
         return True
 
     def apply(self, battle: Battle, is_player: bool) -> ActionSummary:
@@ -808,7 +1667,9 @@ class Action(object):
 
 class Flee(Action):
     """An action where the trainer attempts to run away from the battle."""
-    def is_valid(self, battle: Battle, is_player: bool) -> bool:
+    __slots__ = ()
+
+    def can_apply(self, battle: Battle, is_player: bool) -> bool:
         """Determines if an attempt to flee would be valid for a given battle state. Returns true if it would be valid.
         
         Parameters:
@@ -818,10 +1679,7 @@ class Flee(Action):
         Returns:
             (bool): Identify if the escape is valid.
         """
-        if not super().is_valid(battle, is_player):
-            """Assume that the action is invalid."""
-            return False
-        elif battle.get_trainer(is_player).get_current_pokemon().has_fainted():
+        if battle.get_trainer(is_player).get_current_pokemon().has_fainted():
             """Player's current Pokemon faints during battle."""
             return False
         else:
@@ -837,14 +1695,14 @@ class Flee(Action):
         Returns:
             (ActionSummary): Return the description of this flee.
         """
-        action_summary = ActionSummary()
+        action_summary = ActionSummary(headless=battle.is_headless())
         if battle.is_trainer_battle():
             """A battle between trainers."""
-            action_summary.add_message(FLEE_INVALID)
+            action_summary.add_event(EVENT_FLEE_INVALID)
             return action_summary
         else:
             battle.attempt_end_early()
-            action_summary.add_message(FLEE_SUCCESS)
+            action_summary.add_event(EVENT_FLEE_SUCCESS)
             return action_summary
 
     def __str__(self) -> str:
@@ -857,6 +1715,8 @@ class Flee(Action):
 
 class SwitchPokemon(Action):
     """An action representing the trainer's intention to switch pokemon."""
+    __slots__ = ('_next_pokemon_index',)
+
     def __init__(self, next_pokemon_index: int) -> None:
         """Creates an instance of the SwitchPokemon class.
         
@@ -865,7 +1725,19 @@ class SwitchPokemon(Action):
         """
         self._next_pokemon_index = next_pokemon_index
 
-    def is_valid(self, battle: Battle, is_player: bool) -> bool:
+    def get_next_pokemon_index(self) -> int:
+        """Return the index of the pokemon the trainer wants to switch to.
+
+        Returns:
+            (int): Return the index of the next pokemon.
+        """
+        return self._next_pokemon_index
+
+    def state_key(self) -> Tuple:
+        """(Tuple): Return the class of this action and the index switched to."""
+        return (type(self), self._next_pokemon_index)
+
+    def can_apply(self, battle: Battle, is_player: bool) -> bool:
         """Determines if switching pokemon would be valid for a given trainer and battle state. Returns true if it would be valid.
         
         Parameters:
@@ -875,10 +1747,7 @@ class SwitchPokemon(Action):
         Returns:
             (bool): Identify if this move is valid.
         """
-        if not super().is_valid(battle, is_player):
-            """Assume that the action is invalid."""
-            return False
-        elif battle.get_trainer(is_player).can_switch_pokemon(self._next_pokemon_index):
+        if battle.get_trainer(is_player).can_switch_pokemon(self._next_pokemon_index):
             """The player can be replaced with a specific location Pokemon."""
             return True
         else:
@@ -895,12 +1764,12 @@ class SwitchPokemon(Action):
             (ActionSummary): Return the description of this move.
         """
         trainer = battle.get_trainer(is_player)
-        action_summary = ActionSummary()
+        action_summary = ActionSummary(headless=battle.is_headless())
         if is_player and not trainer.current_pokemon.has_fainted():
             """Player's turn, and his current Pokemon does not faint."""
-            action_summary.add_message(f'{trainer.current_pokemon.get_name()}, return!')
+            action_summary.add_event(EVENT_RETURNED, trainer.current_pokemon)
         trainer.switch_pokemon(self._next_pokemon_index)
-        action_summary.add_message(f'{trainer.get_name()} switched to {trainer.current_pokemon.get_name()}.')
+        action_summary.add_event(EVENT_SWITCHED, trainer, trainer.current_pokemon)
         return action_summary
         
     def __str__(self) -> str:
@@ -914,6 +1783,8 @@ class SwitchPokemon(Action):
 
 class Item(Action):
     """An abstract class representing an Item, which a trainer may attempt to use to influence the battle."""
+    __slots__ = ('_name',)
+
     def __init__(self, name: str) -> None:
         """Creates an Item.
         
@@ -930,7 +1801,11 @@ class Item(Action):
         """
         return self._name
 
-    def is_valid(self, battle: Battle, is_player: bool) -> bool:
+    def state_key(self) -> Tuple:
+        """(Tuple): Return the class and name of this item."""
+        return (type(self), self._name)
+
+    def can_apply(self, battle: Battle, is_player: bool) -> bool:
         """Determines if using the item would be a valid action for the given trainer and battle state.
         
         Parameters:
@@ -940,10 +1815,7 @@ class Item(Action):
         Returns:
             (bool): Returns true if it would be valid.
         """
-        if not super().is_valid(battle, is_player):
-            """Assume that the action is invalid."""
-            return False
-        elif (not battle.get_trainer(is_player).get_current_pokemon().has_fainted()) and (battle.get_trainer(is_player).has_item(self)):
+        if (not battle.get_trainer(is_player).get_current_pokemon().has_fainted()) and (battle.get_trainer(is_player).has_item(self)):
             """Player's current Pokemon does not faint, and the number of items in the player is not zero."""
             return True
         else:
@@ -968,6 +1840,8 @@ class Item(Action):
 
 class Pokeball(Item):
     """An item which a trainer can use to attempt to catch wild pokemon."""
+    __slots__ = ('_catch_chance',)
+
     def __init__(self, name: str, catch_chance: int) -> None:
         """Creates a pokeball instance, used to catch pokemon in wild battles.
         
@@ -978,8 +1852,21 @@ class Pokeball(Item):
         self._name = name
         self._catch_chance = catch_chance
 
+    def get_catch_chance(self) -> float:
+        """Return the chance this pokeball has of catching a pokemon.
+
+        Returns:
+            (float): Return the catch chance of this pokeball.
+        """
+        return self._catch_chance
+
+    def state_key(self) -> Tuple:
+        """(Tuple): Return the class, name and catch chance of this pokeball."""
+        return (type(self), self._name, self._catch_chance)
+
     def apply(self, battle: Battle, is_player: bool) -> ActionSummary:
         """Attempt to catch the enemy pokemon and returns an ActionSummary containing information about the catch attempt.
+        The pokeball is used up whether or not the catch succeeds, even when it is thrown in a trainer battle.
         
         Parameters:
             battle(Battle): The ongoing pokemon battle
@@ -988,23 +1875,24 @@ class Pokeball(Item):
         Returns:
             (ActionSummary): Return the description of this process.
         """
-        action_summary = ActionSummary()
+        action_summary = ActionSummary(headless=battle.is_headless())
+        self.decrement_item_count(battle.get_trainer(is_player))
         enemy_pokemon = battle.get_trainer(not is_player).get_current_pokemon()
         if battle.is_trainer_battle():
             """A battle between trainers."""
-            action_summary.add_message(POKEBALL_INVALID_BATTLE_TYPE)
+            action_summary.add_event(EVENT_POKEBALL_INVALID)
         else:
-            if did_succeed(self._catch_chance):
+            if battle.get_random().did_succeed(self._catch_chance):
                 """Catch a Pokemon."""
                 if battle.get_trainer(is_player).can_add_pokemon(enemy_pokemon):
                     """Assume that the player has enough room for new Pokemon."""
-                    action_summary.add_message(POKEBALL_SUCCESSFUL_CATCH.format(enemy_pokemon.get_name()))
+                    action_summary.add_event(EVENT_CAUGHT, target=enemy_pokemon, move=self)
                     battle.get_trainer(is_player).add_pokemon(enemy_pokemon)
                     battle.attempt_end_early()
                 else:
-                    action_summary.add_message(POKEBALL_FULL_TEAM.format(enemy_pokemon.get_name()))
+                    action_summary.add_event(EVENT_CAUGHT_FULL_TEAM, target=enemy_pokemon, move=self)
             else:
-                action_summary.add_message(POKEBALL_UNSUCCESSFUL_CATCH.format(enemy_pokemon.get_name()))
+                action_summary.add_event(EVENT_ESCAPED, target=enemy_pokemon, move=self)
         return action_summary
             
     def __str__(self) -> str:
@@ -1018,6 +1906,8 @@ class Pokeball(Item):
 
 class Food(Item):
     """An Item which restores HP to the pokemon whose trainer uses it."""
+    __slots__ = ('_health_restored',)
+
     def __init__(self, name: str, health_restored: int) -> None:
         """Creates a pokeball instance, used to catch pokemon in wild battles
         
@@ -1028,19 +1918,43 @@ class Food(Item):
         self._name = name
         self._health_restored = health_restored
 
+    def get_health_restored(self) -> int:
+        """Return the health this food restores.
+
+        Returns:
+            (int): Return the health restored by this food.
+        """
+        return self._health_restored
+
+    def state_key(self) -> Tuple:
+        """(Tuple): Return the class, name and health restored of this food."""
+        return (type(self), self._name, self._health_restored)
+
     def apply(self, battle: Battle, is_player: bool) -> ActionSummary:
-        """The trainer's current pokemon eats the food.
+        """The trainer's current pokemon eats the food, using it up.
         
         Parameters:
             battle: The ongoing pokemon battle
             is_player: True if the player is using this item.
         """
-        action_summary = ActionSummary()
-        pokemon = battle.get_trainer(is_player).get_current_pokemon()
-        pokemon.modify_health(self._health_restored)
-        action_summary.add_message(f"{pokemon.get_name()} ate {self._name}.")
+        action_summary = ActionSummary(headless=battle.is_headless())
+        trainer = battle.get_trainer(is_player)
+        self.feed(trainer, trainer.get_current_pokemon(), action_summary)
         return action_summary
 
+    def feed(self, trainer: Trainer, pokemon: Pokemon, action_summary: ActionSummary) -> None:
+        """Uses up one of the trainer's food to restore the health of one of its pokemon.
+        Every battle format feeds pokemon this way, so that food works the same in each.
+
+        Parameters:
+            trainer(Trainer): The trainer using the food.
+            pokemon(Pokemon): The pokemon which eats the food.
+            action_summary(ActionSummary): The summary the meal is recorded in.
+        """
+        self.decrement_item_count(trainer)
+        pokemon.modify_health(self._health_restored)
+        action_summary.add_event(EVENT_ATE, pokemon, move=self)
+
     def __str__(self) -> str:
         """(str): Return a string representation of this class."""
         return f"{__class__.__name__}('{self._name}')"
@@ -1051,7 +1965,50 @@ class Food(Item):
 
 
 class Move(Action):
-    """An abstract class representing all learnable pokemon moves."""
+    """An abstract class representing all learnable pokemon moves.
+
+    Moves are interned: constructing a move with the same class and arguments as
+    an existing one returns that same instance. Moves are therefore compared and
+    hashed by identity, and each distinct move has a small integer id.
+    """
+    __slots__ = ('_id', '_definition', '_name', '_element_type', '_element_type_id', '_max_uses', '_speed')
+
+    _moves: Dict[Tuple, 'Move'] = {}
+    _moves_by_id: List['Move'] = []
+
+    def __new__(cls, *args, **kwargs) -> 'Move':
+        """Returns the interned move for the supplied definition, creating it if it doesn't yet exist."""
+        definition = Move._make_definition(cls, args, kwargs)
+        move = Move._moves.get(definition)
+        if move is None:
+            """This is the first move with this definition."""
+            move = super().__new__(cls)
+            move._id = len(Move._moves_by_id)
+            move._definition = definition
+            Move._moves[definition] = move
+            Move._moves_by_id.append(move)
+        return move
+
+    @staticmethod
+    def _make_definition(cls: type, args: Tuple, kwargs: Dict) -> Tuple:
+        """Returns the hashable registry key for a move class and its constructor arguments."""
+        arguments = inspect.signature(cls.__init__).bind(None, *args, **kwargs)
+        arguments.apply_defaults()
+        values = list(arguments.arguments.values())[1:]
+        return (cls,) + tuple(tuple(value) if isinstance(value, list) else value for value in values)
+
+    @staticmethod
+    def from_id(move_id: int) -> 'Move':
+        """A static method which returns the interned move with the supplied id.
+
+        Parameters:
+            move_id(int): The id of the move.
+
+        Returns:
+            (Move): The move with the given id.
+        """
+        return Move._moves_by_id[move_id]
+
     def __init__(self, name: str, element_type: str, max_uses: int, speed: int) -> None:
         """Creates an instance of the Move class.
         
@@ -1063,9 +2020,30 @@ class Move(Action):
         """
         self._name = name 
         self._element_type = element_type
+        self._element_type_id = ElementType.id_of(element_type)
         self._max_uses = max_uses
         self._speed = speed
 
+    def get_definition(self) -> Tuple:
+        """Return the class and constructor arguments this move was interned by.
+
+        Returns:
+            (Tuple): The move's class followed by its constructor arguments.
+        """
+        return self._definition
+
+    def get_id(self) -> int:
+        """Return the id of this move in the move registry.
+
+        Returns:
+            (int): Return the id of this move.
+        """
+        return self._id
+
+    def state_key(self) -> Tuple:
+        """(Tuple): Return the id of this move, which is unique to its definition."""
+        return (Move, self._id)
+
     def get_name(self) -> str:
         """Return the name of this move.
 
@@ -1082,6 +2060,14 @@ class Move(Action):
         """
         return self._element_type
 
+    def get_element_type_id(self) -> int:
+        """Return the id of the type of this move.
+
+        Returns:
+            (int): Return the id of the type of this move.
+        """
+        return self._element_type_id
+
     def get_max_uses(self) -> int:
         """Return the maximum times this move can be used.
         
@@ -1098,7 +2084,7 @@ class Move(Action):
         """
         return self._speed + SPEED_BASED_ACTION_PRIORITY
 
-    def is_valid(self, battle: Battle, is_player: bool) -> bool:
+    def can_apply(self, battle: Battle, is_player: bool) -> bool:
         """Determines if the move would be valid for the given trainer and battle state.
         
         Parameters:
@@ -1108,16 +2094,7 @@ class Move(Action):
         Returns:
             (bool): Returns true if the move would be valid.
         """
-        if super().is_valid(battle, is_player):
-            """Assume that the action is invalid."""
-            for move in battle.get_trainer(is_player).get_current_pokemon().get_move_info():
-                """Iterate over each move in the move information list."""
-                if move[0] == self and move[1] >= 1:
-                    """Make sure the move is used, and that the move has enough times to use."""
-                    return True
-            return False
-        else:
-            return False
+        return battle.get_trainer(is_player).get_current_pokemon().get_remaining_move_uses(self) >= 1
 
     def apply(self, battle: Battle, is_player: bool) -> ActionSummary:
         """Applies the Move to the game state.
@@ -1162,27 +2139,23 @@ class Move(Action):
         """(repr): Return a string representation of this class."""
         return f'{self.__class__.__name__}(\'{self._name}\', \'{self._element_type}\', {self._max_uses})'
 
-    def __eq__(self, other: 'Move') -> bool:
-        """Identify two moves that are truly the same.
-        
-        Paramteters：
-            other('Move'): Another move for comparison.
+    def __reduce__(self) -> Tuple:
+        """Pickles this move by its definition, so that it is interned again when unpickled."""
+        return self._definition[0], self._definition[1:]
 
-        Returns：
-            (bool): Identify whether two moves are the same.
-        """
-        if self._name == other.get_name() and \
-            self._element_type == other.get_element_type() and \
-            self._max_uses == other.get_max_uses() and \
-            self.get_priority() == other.get_priority():
-            """Identify two moves that are truly the same."""
-            return True
-        else:
-            return False
+    def __copy__(self) -> 'Move':
+        """(Move): Moves are immutable flyweights, so copies share the same instance."""
+        return self
+
+    def __deepcopy__(self, memo: Dict) -> 'Move':
+        """(Move): Moves are immutable flyweights, so copies share the same instance."""
+        return self
 
 
 class Attack(Move):
     """A class representing damaging pokemon moves, that may be used against an enemy pokemon."""
+    __slots__ = ('_base_damage', '_hit_chance')
+
     def __init__(self, name: str, element_type: str, max_uses: int, speed: int, base_damage: int, hit_chance: float) -> None:
         """Creates an instance of an attacking move.
         
@@ -1198,16 +2171,35 @@ class Attack(Move):
         self._base_damage = base_damage
         self._hit_chance = hit_chance
 
-    def did_hit(self, pokemon: Pokemon) -> bool:
+    def get_base_damage(self) -> int:
+        """Return the base damage of this move.
+
+        Returns:
+            (int): Return the base damage of this move.
+        """
+        return self._base_damage
+
+    def get_hit_chance(self) -> float:
+        """Return the base hit chance of this move.
+
+        Returns:
+            (float): Return the base hit chance of this move.
+        """
+        return self._hit_chance
+
+    def did_hit(self, pokemon: Pokemon, rng: Optional[BattleRandom] = None) -> bool:
         """Determine if the move hit, based on the product of the pokemon's current hit chance, and the move's hit chance.
 
         Paramaters：
             pokemon(Pokemon): The attacking pokemon.
+            rng(Optional[BattleRandom]): The battle's random stream. If not supplied,
+                the roll uses the global random generator.
 
         Returns：
             (bool)：Returns True if it hits.
         """
-        if did_succeed(self._hit_chance * pokemon.get_stats().get_hit_chance()):
+        chance = self._hit_chance * pokemon.get_stats().get_hit_chance()
+        if did_succeed(chance) if rng is None else rng.did_succeed(chance):
             """The move hit successfully."""
             return True
         else:
@@ -1224,7 +2216,8 @@ class Attack(Move):
         Returns:
             (int): Returns the number of damage.
         """
-        effectiveness = ElementType.of(self._element_type).get_effectiveness(enemy_pokemon.get_element_type())
+        effectiveness = ElementType.get_effectiveness_by_id(self._element_type_id,
+                                                            enemy_pokemon.get_element_type_id())
         damage = int(
             self._base_damage * effectiveness * 
             pokemon.get_stats().get_attack()/
@@ -1233,24 +2226,54 @@ class Attack(Move):
         return damage
 
     def apply(self, battle: Battle, is_player: bool) -> ActionSummary:
-        action_summary = ActionSummary()
+        action_summary = ActionSummary(headless=battle.is_headless())
         pokemon = battle.get_trainer(is_player).get_current_pokemon()
         enemy_pokemon = battle.get_trainer(not is_player).get_current_pokemon()
+        pokemon.reduce_move_count(self)
+        action_summary.add_event(EVENT_USED_MOVE, pokemon, enemy_pokemon, self)
+        self.strike(pokemon, enemy_pokemon, battle.get_random(), action_summary, battle)
+        return action_summary
+
+    def strike(self, pokemon: Pokemon, enemy_pokemon: Pokemon, rng: BattleRandom,
+               action_summary: ActionSummary, battle: Optional[Battle] = None) -> None:
+        """Rolls whether this attack hits the enemy pokemon and, if it does, deals its damage
+        and gives the attacker experience for a faint. Every battle format resolves attacks
+        this way, so that their damage and experience rules are the same in each.
+
+        Parameters:
+            pokemon(Pokemon): The attacking pokemon.
+            enemy_pokemon(Pokemon): The pokemon being attacked.
+            rng(BattleRandom): The battle's random stream.
+            action_summary(ActionSummary): The summary the outcome is recorded in.
+            battle(Optional[Battle]): The battle whose observers are notified, if any.
+        """
+        if not self.did_hit(pokemon, rng):
+            """The move missed, so the enemy pokemon takes no damage."""
+            action_summary.add_event(EVENT_MISSED, pokemon, enemy_pokemon, self)
+            return
         damage = self.calculate_damage(pokemon, enemy_pokemon)
         enemy_pokemon.modify_health(-damage)
-        pokemon.reduce_move_count(self)
-        action_summary.add_message(f'{pokemon.get_name()} used {self._name}.')
+        observers = None if battle is None else battle.observers
+        if observers is not None:
+            observers.notify(battle, BattleEvent(EVENT_DAMAGE_DEALT, pokemon, enemy_pokemon, self, damage))
         if enemy_pokemon.has_fainted():
             """Suppose the opponent's Pokemon passes out."""
             exp = enemy_pokemon.experience_on_death()
+            level = pokemon.get_level()
             pokemon.gain_experience(exp)
-            action_summary.add_message(f"{enemy_pokemon.get_name()} has fainted.")
-            action_summary.add_message(f"{pokemon.get_name()} gained {exp} exp.")
-        return action_summary
+            if observers is not None:
+                observers.notify(battle, BattleEvent(EVENT_FAINTED, pokemon, enemy_pokemon, self))
+                if pokemon.get_level() != level:
+                    observers.notify(battle, BattleEvent(EVENT_LEVEL_UP, pokemon, move=self,
+                                                         amount=pokemon.get_level()))
+            action_summary.add_event(EVENT_FAINTED, pokemon, enemy_pokemon, self)
+            action_summary.add_event(EVENT_GAINED_EXP, pokemon, enemy_pokemon, self, exp)
 
 
 class StatusModifier(Move):
     """"An abstract class to group commonalities between buffs and debuffs."""
+    __slots__ = ('_modification', '_rounds')
+
     def __init__(self, name: str, element_type: str, max_uses: int, speed: int,
                 modification: Tuple[float, int, int, int], rounds: int) -> None:
         """Creates an instance of this class
@@ -1264,26 +2287,89 @@ class StatusModifier(Move):
                                                     to be applied for the duration of the supplied number of rounds.
             rounds(int): The number of rounds for the modification to be in effect.
         """
-        self._name = name 
-        self._element_type = element_type
-        self._max_uses = max_uses
-        self._speed = speed
+        super().__init__(name, element_type, max_uses, speed)
         self._modification = modification
         self._rounds = rounds
 
+    def get_modification(self) -> Tuple[float, int, int, int]:
+        """Return the stat modification applied by this move.
+
+        Returns:
+            (Tuple[float, int, int, int]): Return the stat modification of this move.
+        """
+        return self._modification
+
+    def get_rounds(self) -> int:
+        """Return the number of rounds the modification is in effect for.
+
+        Returns:
+            (int): Return the number of rounds of this move's modification.
+        """
+        return self._rounds
+
+    def apply(self, battle: Battle, is_player: bool) -> ActionSummary:
+        """Applies the stat modification to the pokemon targeted by this move.
+
+        Parameters:
+            battle(Battle): The ongoing pokemon battle
+            is_player(bool): True if the player is using this action.
+
+        Returns:
+            (ActionSummary): Return the description of this move.
+        """
+        action_summary = ActionSummary(headless=battle.is_headless())
+        trainer = battle.get_trainer(is_player)
+        enemy = battle.get_trainer(not is_player)
+        pokemon = trainer.get_current_pokemon()
+        pokemon.reduce_move_count(self)
+        action_summary.add_event(EVENT_USED_MOVE, pokemon, enemy.get_current_pokemon(), self)
+        for effects in (self.apply_ally_effects(trainer), self.apply_enemy_effects(trainer, enemy)):
+            """Collect the messages of the effects this move has."""
+            if effects is not None:
+                action_summary.combine(effects)
+        return action_summary
+
+
 class Buff(StatusModifier):
     """Moves which buff the trainer's selected pokemon."""
-    pass
+    __slots__ = ()
+
+    def apply_ally_effects(self, trainer: Trainer) -> ActionSummary:
+        """Apply this buff to the trainer's current pokemon.
+
+        Parameters:
+            trainer(Trainer): The trainer whose pokemon is using the move.
+
+        Returns:
+            (ActionSummary): Return the description of this move effects.
+        """
+        trainer.get_current_pokemon().add_stat_modifier(self._modification, self._rounds)
+        return ActionSummary()
 
 
 class Debuff(StatusModifier):
     """Moves which debuff the enemy trainer's selected pokemon."""
-    pass
+    __slots__ = ()
+
+    def apply_enemy_effects(self, trainer: Trainer, enemy: Trainer) -> ActionSummary:
+        """Apply this debuff to the enemy trainer's current pokemon.
+
+        Parameters:
+            trainer(trainer): The trainer whose pokemon is using the move.
+            enemy(trainer): The trainer whose pokemon is the target of the move.
+
+        Returns:
+            (ActionSummary): Return the description of enemy effects.
+        """
+        enemy.get_current_pokemon().add_stat_modifier(self._modification, self._rounds)
+        return ActionSummary()
 
 
 # Below are the classes and functions which pertain only to masters students.
 class Strategy(object):
     """An abstract class providing behaviour to determine a next action given a battle state."""
+    __slots__ = ()
+
     def get_next_action(self, battle: Battle, is_player: bool) -> Action:
         """Determines and returns the next action for this strategy, given the battle state and trainer.
         
@@ -1296,15 +2382,48 @@ class Strategy(object):
         """
         raise NotImplementedError()
 
+    def reseed(self, rng: BattleRandom) -> None:
+        """Reseeds any choices this strategy makes at random from the supplied stream, so
+        that its play can be reproduced. A strategy without random choices ignores it.
+
+        Parameters:
+            rng(BattleRandom): The stream to seed this strategy's choices from.
+        """
+        pass
+
+
+class DefaultAIStrategy(Strategy):
+    """A class, used by the enemy AI to determine which actions
+    to take given a battle state."""
+    __slots__ = ()
+
+    def get_next_action(self, battle: Battle, is_player: bool) -> Action:
+        trainer = battle.get_trainer(is_player)
+        pokemon = trainer.get_current_pokemon()
+
+        # If the current pokemon is dead, choose first non-dead.
+        if pokemon.has_fainted():
+            all_pokemon = trainer.get_all_pokemon()
+            for index, next_pokemon in enumerate(all_pokemon):
+                if not next_pokemon.has_fainted():
+                    return SwitchPokemon(index)
+
+        # Otherwise, choose first move with uses
+        for move, uses in pokemon.get_move_info():
+            if uses > 0:
+                return move
+
+        return Flee()
+
 
 class ScaredyCat(Strategy):
     """A strategy where the trainer always attempts to flee."""
-    pass
+    __slots__ = ()
 
 
 class TeamRocket(Strategy):
     """A tough strategy used by Pokemon Trainers that are members of Team Rocket."""
-    pass
+    __slots__ = ()
 
 
 def create_encounter(trainer: Trainer, wild_pokemon: Pokemon) -> Battle:
@@ -1,5 +1,14 @@
-from random import random
-from typing import Tuple
+import hashlib
+import os
+from bisect import bisect_right
+from itertools import islice
+from random import Random, random
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as _numpy
+except ImportError:
+    _numpy = None
 
 SUPPLIED_VERSION = 1.0
 
@@ -11,6 +20,12 @@ STAT_DEFENSE = 3
 
 LEVEL_UP_STAT_GROWTH = 1.05
 
+# Levels whose experience thresholds are precomputed; the table grows past this when needed.
+LEVEL_TABLE_SIZE = 128
+
+# Starting stat values whose growth is tabulated at once; the table is cleared once it holds more.
+STAT_GROWTH_CACHE_SIZE = 4096
+
 # Action Priorities
 DEFAULT_ACTION_PRIORITY = 0
 SPEED_BASED_ACTION_PRIORITY = 1
@@ -25,6 +40,52 @@ POKEBALL_FULL_TEAM = "{} was caught, but there was no more room."
 FLEE_SUCCESS = "Got away safely!"
 FLEE_INVALID = "Unable to escape a trainer battle."
 
+# Battle events, recorded by an ActionSummary and only rendered as messages when read.
+EVENT_MESSAGE = 0
+EVENT_USED_MOVE = 1
+EVENT_MISSED = 2
+EVENT_FAINTED = 3
+EVENT_GAINED_EXP = 4
+EVENT_RETURNED = 5
+EVENT_SWITCHED = 6
+EVENT_ATE = 7
+EVENT_FLEE_INVALID = 8
+EVENT_FLEE_SUCCESS = 9
+EVENT_POKEBALL_INVALID = 10
+EVENT_CAUGHT = 11
+EVENT_CAUGHT_FULL_TEAM = 12
+EVENT_ESCAPED = 13
+# Events only sent to a battle's observers.
+EVENT_ACTION_APPLIED = 14
+EVENT_DAMAGE_DEALT = 15
+EVENT_LEVEL_UP = 16
+EVENT_ITEM_USED = 17
+EVENT_BATTLE_OVER = 18
+EVENT_TEMPLATES = {
+    EVENT_MESSAGE: "{text}",
+    EVENT_USED_MOVE: "{actor} used {move}.",
+    EVENT_MISSED: "{actor} missed!",
+    EVENT_FAINTED: "{target} has fainted.",
+    EVENT_GAINED_EXP: "{actor} gained {amount} exp.",
+    EVENT_RETURNED: "{actor}, return!",
+    EVENT_SWITCHED: "{actor} switched to {target}.",
+    EVENT_ATE: "{actor} ate {move}.",
+    EVENT_FLEE_INVALID: FLEE_INVALID,
+    EVENT_FLEE_SUCCESS: FLEE_SUCCESS,
+    EVENT_POKEBALL_INVALID: POKEBALL_INVALID_BATTLE_TYPE,
+    EVENT_CAUGHT: POKEBALL_SUCCESSFUL_CATCH.format("{target}"),
+    EVENT_CAUGHT_FULL_TEAM: POKEBALL_FULL_TEAM.format("{target}"),
+    EVENT_ESCAPED: POKEBALL_UNSUCCESSFUL_CATCH.format("{target}"),
+    EVENT_ACTION_APPLIED: "{actor} took an action.",
+    EVENT_DAMAGE_DEALT: "{target} took {amount} damage.",
+    EVENT_LEVEL_UP: "{actor} grew to level {amount}.",
+    EVENT_ITEM_USED: "{actor} used {move}.",
+    EVENT_BATTLE_OVER: "The battle is over.",
+}
+
+# Uniforms drawn from NumPy at a time by a BattleRandom.
+DEFAULT_RANDOM_BLOCK_SIZE = 1024
+
 MAXIMUM_MOVE_SLOTS = 4
 MAXIMUM_POKEMON_ROSTER = 6
 
@@ -37,8 +98,15 @@ Stats = Tuple[float, int, int, int]
 
 class ElementType(object):
     """A class which represents elemental types of pokemon and their moves."""
+    __slots__ = ('_name', '_effectiveness', '_id')
 
     _elements = {}
+    # Every registered type in id order, and the compiled effectiveness tables
+    # indexed by [attacking type id][defending type id]. The tables are built by
+    # freeze() and dropped whenever the registry changes.
+    _elements_by_id = []
+    _effectiveness_table = None
+    _effectiveness_matrix = None
 
     @staticmethod
     def of(name: str) -> 'ElementType':
@@ -55,6 +123,75 @@ class ElementType(object):
             return ElementType._elements[name]
         return ElementType(name)
 
+    @staticmethod
+    def id_of(name: str) -> int:
+        """A static method which returns the dense integer id of the named type,
+        creating the type if it doesn't yet exist.
+
+        Parameters:
+            name (str): The unique name of the elemental type.
+
+        Returns:
+            (int): The id of the element type corresponding to the given name.
+        """
+        return ElementType.of(name)._id
+
+    @staticmethod
+    def freeze() -> None:
+        """Compiles the registry into dense effectiveness tables indexed by type id.
+
+        Types which only appear as a defending type of another type's
+        effectiveness are registered first, so every known type has an id.
+        The tables are rebuilt automatically if the registry changes afterwards.
+        """
+        for element in list(ElementType._elements_by_id):
+            for name in element._effectiveness:
+                ElementType.of(name)
+        elements = ElementType._elements_by_id
+        table = tuple(tuple(attacking.get_effectiveness(defending._name) for defending in elements)
+                      for attacking in elements)
+        ElementType._effectiveness_table = table
+        if _numpy is not None:
+            ElementType._effectiveness_matrix = _numpy.array(
+                table, dtype=_numpy.float64).reshape(len(elements), len(elements))
+
+    @staticmethod
+    def _thaw() -> None:
+        """Drops the compiled effectiveness tables after the registry changes."""
+        ElementType._effectiveness_table = None
+        ElementType._effectiveness_matrix = None
+
+    @staticmethod
+    def get_effectiveness_by_id(attacking_id: int, defending_id: int) -> float:
+        """Get the effectiveness of the attacking type against the defending type,
+        both given by id, freezing the registry if needed.
+
+        Parameters:
+            attacking_id (int): The id of the attacking type
+            defending_id (int): The id of the defending type
+
+        Returns:
+            (float): The damage multiplier of a move against the defending type
+        """
+        table = ElementType._effectiveness_table
+        if table is None:
+            ElementType.freeze()
+            table = ElementType._effectiveness_table
+        return table[attacking_id][defending_id]
+
+    @staticmethod
+    def get_effectiveness_matrix() -> Optional['_numpy.ndarray']:
+        """Get the effectiveness of every type against every other type as a NumPy
+        array indexed by [attacking id, defending id], freezing the registry if needed.
+
+        Returns:
+            (Optional[numpy.ndarray]): The effectiveness matrix, or None if NumPy
+            is not installed.
+        """
+        if ElementType._effectiveness_table is None:
+            ElementType.freeze()
+        return ElementType._effectiveness_matrix
+
     def __init__(self, name: str) -> None:
         """ Creates an ElementType instance and adds it to the class-wide
         dictionary.
@@ -64,7 +201,10 @@ class ElementType(object):
         """
         self._name = name
         self._effectiveness = {}
+        self._id = len(ElementType._elements_by_id)
         ElementType._elements[name] = self
+        ElementType._elements_by_id.append(self)
+        ElementType._thaw()
 
     def add_type_effectiveness(self, type: str, effectiveness: float) -> None:
         """Associates a type and effectiveness for this instance.
@@ -76,6 +216,7 @@ class ElementType(object):
         
         """
         self._effectiveness[type] = effectiveness
+        ElementType._thaw()
 
     def get_effectiveness(self, defending_type: str) -> float:
         """Get the effectiveness of this instance's type against the supplied
@@ -89,6 +230,10 @@ class ElementType(object):
         """
         return self._effectiveness.get(defending_type, 1.0)
 
+    def get_id(self) -> int:
+        """(int): Return the dense integer id of this type."""
+        return self._id
+
     def __str__(self) -> str:
         """(str): Return a string representation of this class"""
         return self._name
@@ -112,5 +257,200 @@ def did_succeed(chance: float) -> bool:
     return random() < chance
 
 
+# The total experience needed to reach each level, which is the cube of the level.
+_level_thresholds: List[int] = [level ** 3 for level in range(LEVEL_TABLE_SIZE)]
+
+
+def level_for_experience(experience: int) -> int:
+    """Returns the level reached with the supplied total experience: the highest level
+    whose cube is at most the experience. The thresholds are exact integers, unlike
+    a floating point cube root, which falls just short of some cubes.
+
+    Parameters:
+        experience(int): The total experience, which must not be negative.
+
+    Returns:
+        (int): The level reached.
+    """
+    thresholds = _level_thresholds
+    while thresholds[-1] <= experience:
+        thresholds.extend(level ** 3 for level in range(len(thresholds), 2 * len(thresholds)))
+    return bisect_right(thresholds, experience) - 1
+
+
+# The values a stat takes as it grows one level at a time, by starting value.
+_growth_chains: Dict[float, List[int]] = {}
+
+
+def grow_stat(value: int, levels: int) -> int:
+    """Returns a stat after growing by LEVEL_UP_STAT_GROWTH for each of several levels,
+    truncating after every level exactly as levelling up one level at a time does.
+    The growth from each starting value is tabulated, so a jump of many levels is
+    usually a single lookup.
+
+    Parameters:
+        value(int): The stat before levelling up.
+        levels(int): The number of levels gained.
+
+    Returns:
+        (int): The stat after levelling up.
+    """
+    if levels <= 0:
+        return value
+    chain = _growth_chains.get(value)
+    if chain is None:
+        if len(_growth_chains) >= STAT_GROWTH_CACHE_SIZE:
+            _growth_chains.clear()
+        chain = _growth_chains[value] = [value]
+    while len(chain) <= levels:
+        chain.append(int(chain[-1] * LEVEL_UP_STAT_GROWTH))
+    return chain[levels]
+
+
+class BattleRandom(object):
+    """A seedable stream of random rolls, owned by a battle.
+
+    A stream is identified by a seed and a spawn key, a tuple of child indices, so
+    the sub-streams spawned for parallel workers are independent of each other and
+    of their parent, and are the same in every run with the same seed.
+
+    When NumPy is available, uniforms are drawn from a PCG64 generator a block at
+    a time, so each roll only steps an iterator over the block rather than calling
+    the generator. Otherwise the standard library's generator is used. The two
+    produce different streams for the same seed.
+    """
+    __slots__ = ('_seed', '_spawn_key', '_children', '_generator', '_block_size', '_next')
+
+    def __init__(self, seed: Optional[int] = None, spawn_key: Tuple[int, ...] = (),
+                 block_size: int = DEFAULT_RANDOM_BLOCK_SIZE) -> None:
+        """Creates a BattleRandom.
+
+        Parameters:
+            seed(Optional[int]): The seed of the stream, or None to seed from the
+                operating system's entropy.
+            spawn_key(Tuple[int, ...]): The path of child indices from the seed's root
+                stream to this sub-stream.
+            block_size(int): The number of uniforms to draw from NumPy at a time.
+        """
+        if seed is None:
+            seed = int.from_bytes(os.urandom(16), 'little')
+        self._seed = seed
+        self._spawn_key = tuple(spawn_key)
+        self._children = 0
+        self._block_size = block_size
+        # The generator is only created on the first roll, so spawning a stream is cheap.
+        self._generator = None
+        self._next = iter(()).__next__
+
+    def get_seed(self) -> int:
+        """(int): Return the seed of this stream, which is generated if none was supplied."""
+        return self._seed
+
+    def get_spawn_key(self) -> Tuple[int, ...]:
+        """(Tuple[int, ...]): Return the path of child indices to this sub-stream."""
+        return self._spawn_key
+
+    def spawn(self, count: int = 1) -> List['BattleRandom']:
+        """Returns new independent sub-streams of this stream.
+
+        The n-th sub-stream spawned from a stream is always the same, whatever has
+        been drawn from the stream itself.
+
+        Parameters:
+            count(int): The number of sub-streams to create.
+
+        Returns:
+            (List[BattleRandom]): The sub-streams.
+        """
+        children = [BattleRandom(self._seed, self._spawn_key + (self._children + index,), self._block_size)
+                    for index in range(count)]
+        self._children += count
+        return children
+
+    def _next_block(self, count: int) -> List[float]:
+        """Draws whole blocks covering at least count uniforms, returning the first count
+        and leaving the rest of the last block to be rolled next."""
+        if self._generator is None:
+            if _numpy is not None:
+                sequence = _numpy.random.SeedSequence(self._seed, spawn_key=self._spawn_key)
+                self._generator = _numpy.random.Generator(_numpy.random.PCG64(sequence))
+            else:
+                key = hashlib.sha256(repr((self._seed, self._spawn_key)).encode()).digest()
+                self._generator = Random(int.from_bytes(key, 'little'))
+        if _numpy is None:
+            """Without NumPy, every roll calls the generator."""
+            self._next = self._generator.random
+            return [self._next() for _ in range(count)]
+        blocks = -(-count // self._block_size)
+        drawn = self._generator.random(blocks * self._block_size).tolist()
+        self._next = iter(drawn[count:]).__next__
+        return drawn[:count]
+
+    def random(self) -> float:
+        """Returns the next uniform in [0, 1) from this stream.
+
+        Returns:
+            (float): The uniform.
+        """
+        try:
+            return self._next()
+        except StopIteration:
+            return self._next_block(1)[0]
+
+    def draw(self, count: int) -> List[float]:
+        """Returns the next uniforms from this stream, as calling random count times would.
+
+        Parameters:
+            count(int): The number of uniforms.
+
+        Returns:
+            (List[float]): The uniforms.
+        """
+        if _numpy is None:
+            return [self.random() for _ in range(count)]
+        uniforms = list(islice(self._next.__self__, count))
+        if len(uniforms) < count:
+            uniforms.extend(self._next_block(count - len(uniforms)))
+        return uniforms
+
+    def did_succeed(self, chance: float) -> bool:
+        """Performs a 'roll' from this stream based on the supplied chance, and returns
+        true iff the roll succeeded.
+
+        Parameters:
+            chance (float): The probability in the range [0, 1] that the roll
+            succeeded.
+
+        Returns:
+            (bool): True iff the roll succeeded
+        """
+        try:
+            return self._next() < chance
+        except StopIteration:
+            return self._next_block(1)[0] < chance
+
+    def __getstate__(self) -> Tuple:
+        """(Tuple): Returns the state of this stream for pickling, including the uniforms
+        drawn but not yet rolled."""
+        remaining = None
+        if _numpy is not None or self._generator is None:
+            remaining = list(self._next.__self__)
+            self._next = iter(remaining).__next__
+        return (self._seed, self._spawn_key, self._children, self._generator, self._block_size, remaining)
+
+    def __setstate__(self, state: Tuple) -> None:
+        """Restores the state of an unpickled stream.
+
+        Parameters:
+            state(Tuple): A state returned by __getstate__.
+        """
+        (self._seed, self._spawn_key, self._children, self._generator, self._block_size,
+         remaining) = state
+        if remaining is None:
+            self._next = self._generator.random
+        else:
+            self._next = iter(remaining).__next__
+
+
 class NoPokemonException(Exception):
     pass
@@ -0,0 +1,332 @@
+"""Benchmarks for the battle engine.
+
+Run `python benchmarks.py memory` to report the memory used by the engine's
+core objects, `python benchmarks.py micro` to time its hot paths, and
+`python benchmarks.py macro` to time whole battles. Several suites can be run
+at once. Every benchmark uses fixed seeds, so runs play the same battles.
+
+Add --json for machine-readable output, --save PATH to store the results as a
+baseline, and --compare PATH to report regressions against a saved baseline;
+the exit status is 1 if any benchmark regressed by more than --threshold.
+"""
+import argparse
+import copy
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import data
+from a2 import *
+from formats import choose_default_action, create_raid_battle
+from rosters import RosterFactory, species_of
+from simulation import play_battle, run_simulations
+
+# Objects allocated per measurement.
+MEMORY_SAMPLE_SIZE = 2000
+
+# The seed of every battle played by the benchmarks.
+BENCHMARK_SEED = 0
+
+# Times each timed benchmark is repeated; the fastest repeat is reported.
+BENCHMARK_REPEATS = 5
+
+# Battles played by the batch macro-benchmark.
+BATCH_SIZE = 10000
+
+# Slots in the raid played by the raid macro-benchmark: the raiders and the boss.
+RAID_SIZE = 40
+
+# The relative slowdown above which a benchmark counts as a regression.
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+def measure_allocation(factory: Callable[[int], object], count: int = MEMORY_SAMPLE_SIZE) -> float:
+    """Returns the mean number of bytes still allocated for each object built by factory.
+
+    The measurement covers everything the object owns, such as the stats and
+    move slots of a Pokemon, but not objects shared between instances, such
+    as interned moves and element types.
+
+    Parameters:
+        factory(Callable[[int], object]): Builds one object from its index.
+        count(int): The number of objects to build.
+
+    Returns:
+        (float): The mean number of bytes per object.
+    """
+    kept = [None] * count
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for index in range(count):
+            kept[index] = factory(index)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) / count
+
+
+def make_pokemon(index: int) -> Pokemon:
+    """Builds a pokemon like those in data.py."""
+    return data.make_basic_pokemon(f'Pokemon{index}', 'normal', data.DEFAULT_MOVES, 5)
+
+
+def make_trainer(index: int) -> Trainer:
+    """Builds a full trainer with a roster and inventory like data.ash."""
+    trainer = Trainer(f'Trainer{index}')
+    for slot in range(MAXIMUM_POKEMON_ROSTER):
+        trainer.add_pokemon(make_pokemon(slot))
+    for item, uses in data.ash.get_inventory().items():
+        trainer.add_item(item, uses)
+    return trainer
+
+
+def measure_footprint(objects: Iterable[object]) -> float:
+    """Returns the mean number of bytes used by each of some objects which already exist.
+
+    Interned moves and registered element types cannot be built afresh for
+    measure_allocation without adding to their registries for good, so the ones
+    already registered are measured instead. Each object is counted along with
+    the tuples, lists and dicts it holds, but not the strings, numbers, types and
+    other objects it shares.
+
+    Parameters:
+        objects(Iterable[object]): The objects to measure.
+
+    Returns:
+        (float): The mean number of bytes per object.
+    """
+    sizes = [_footprint(each) for each in objects]
+    return sum(sizes) / len(sizes)
+
+
+def _footprint(value: object) -> int:
+    """Returns the bytes used by an object and the containers it holds."""
+    if isinstance(value, (tuple, list)):
+        children = value
+    elif isinstance(value, dict):
+        children = list(value.values())
+    else:
+        children = []
+        for cls in type(value).__mro__:
+            slots = getattr(cls, '__slots__', ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if hasattr(value, name):
+                    children.append(getattr(value, name))
+    return sys.getsizeof(value) + sum(_footprint(child) for child in children
+                                      if isinstance(child, (tuple, list, dict)))
+
+
+def memory_report() -> Dict[str, float]:
+    """Returns the mean bytes allocated per instance of each core engine object.
+
+    Returns:
+        (Dict[str, float]): A mapping from object name to bytes per object.
+    """
+    stats = data.DEFAULT_STATS
+    trainers = RosterFactory(species_of(data.ash, data.brock)).generate_trainers(
+        seed=BENCHMARK_SEED, levels=(5, 5), inventory=data.ash.get_inventory())
+    next(trainers)
+    element_types = {move.get_element_type() for move in data.moves.values()}
+    element_types.update(pokemon.get_element_type() for pokemon in data.ash.get_all_pokemon())
+    return {
+        'PokemonStats': measure_allocation(lambda index: PokemonStats(stats)),
+        'Pokemon': measure_allocation(make_pokemon),
+        'ActionSummary': measure_allocation(lambda index: ActionSummary('Benchmark')),
+        'Move': measure_footprint(data.moves.values()),
+        'ElementType': measure_footprint(ElementType.of(name) for name in sorted(element_types)),
+        'Trainer': measure_allocation(make_trainer, MEMORY_SAMPLE_SIZE // 10),
+        'Trainer (RosterFactory)': measure_allocation(lambda index: next(trainers), MEMORY_SAMPLE_SIZE // 10),
+    }
+
+
+def measure_time(operation: Callable[[], None], number: int, repeats: int = BENCHMARK_REPEATS) -> float:
+    """Returns the time one call of operation takes, from the fastest of several repeats.
+
+    Parameters:
+        operation(Callable[[], None]): The operation to time.
+        number(int): The calls of operation timed together in each repeat.
+        repeats(int): The number of repeats.
+
+    Returns:
+        (float): The seconds per call.
+    """
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / number
+
+
+def make_battle(seed: int = BENCHMARK_SEED) -> Battle:
+    """Builds a headless battle between copies of data.ash and data.brock, drawing its rolls from seed."""
+    player, enemy = copy.deepcopy((data.ash, data.brock))
+    return Battle(player, enemy, True, BattleRandom(seed), headless=True)
+
+
+def micro_report() -> Dict[str, float]:
+    """Returns the seconds per call of each of the engine's hot paths.
+
+    Returns:
+        (Dict[str, float]): A mapping from method name to seconds per call.
+    """
+    battle = make_battle()
+    player = battle.get_trainer(True)
+    enemy = battle.get_trainer(False)
+    pokemon = player.get_current_pokemon()
+    enemy_pokemon = enemy.get_current_pokemon()
+    pokemon.add_stat_modifier((0.0, 0, 10, 0), 2)
+    moves = [move for move, _ in pokemon.get_move_info()]
+    attack = next(move for move in moves if isinstance(move, Attack))
+
+    # A round of both trainers' first moves, timed with and without enacting it.
+    strategy = DefaultAIStrategy()
+    actions = (strategy.get_next_action(battle, True), strategy.get_next_action(battle, False))
+    snapshot = battle.snapshot()
+
+    def queue_round() -> None:
+        battle.restore(snapshot)
+        battle.queue_action(actions[0], True)
+        battle.queue_action(actions[1], False)
+
+    def play_round() -> None:
+        queue_round()
+        battle.enact_turn()
+        battle.enact_turn()
+
+    queued = measure_time(queue_round, 2000)
+    results = {
+        'Pokemon.get_stats': measure_time(pokemon.get_stats, 20000),
+        'Attack.calculate_damage': measure_time(lambda: attack.calculate_damage(pokemon, enemy_pokemon), 20000),
+        'Move.is_valid': measure_time(lambda: moves[0].is_valid(battle, True), 20000),
+        'Pokemon.get_move_info': measure_time(pokemon.get_move_info, 20000),
+        'Trainer.all_pokemon_fainted': measure_time(enemy.all_pokemon_fainted, 20000),
+        'Battle.enact_turn': max(0.0, measure_time(play_round, 2000) - queued) / 2,
+    }
+    return results
+
+
+def macro_report() -> Dict[str, float]:
+    """Returns the seconds taken by whole battles between data.ash and data.brock.
+
+    Returns:
+        (Dict[str, float]): The seconds per battle, for a batch of BATCH_SIZE battles,
+            and per round of a RAID_SIZE slot raid.
+    """
+    strategy = DefaultAIStrategy()
+    template = make_battle()
+    snapshot = template.snapshot()
+
+    def battle() -> None:
+        template.restore(snapshot)
+        template.set_random(BattleRandom(BENCHMARK_SEED))
+        play_battle(template, strategy, strategy)
+
+    # A boss which outlasts every round timed, so that each round is played in full.
+    boss = Trainer('Boss')
+    boss.add_pokemon(Pokemon('Boss', PokemonStats((1.0, 10 ** 9, 100, 100)), 'normal', data.DEFAULT_MOVES, 50))
+    raid = create_raid_battle([make_trainer(index) for index in range(RAID_SIZE - 1)], boss,
+                              BattleRandom(BENCHMARK_SEED), headless=True)
+    slots = range(len(raid.get_slots()))
+
+    def raid_round() -> None:
+        for index in slots:
+            choice = choose_default_action(raid, index) if raid.can_queue_action(index) else None
+            if choice is not None:
+                raid.queue_action(choice[0], index, choice[1])
+        while raid.is_ready():
+            raid.enact_turn()
+
+    return {
+        'battle': measure_time(battle, 200),
+        'batch': measure_time(lambda: run_simulations(data.ash, data.brock, strategy, strategy, BATCH_SIZE,
+                                                      processes=1, seed=BENCHMARK_SEED), 1, 1),
+        'raid_round': measure_time(raid_round, 5),
+    }
+
+
+# The function running each suite, and the unit of its results.
+SUITES: Dict[str, Tuple[Callable[[], Dict[str, float]], str]] = {
+    'memory': (memory_report, 'bytes'),
+    'micro': (micro_report, 'seconds'),
+    'macro': (macro_report, 'seconds'),
+}
+
+
+def format_value(value: float, unit: str) -> str:
+    """Returns a benchmark result in a readable unit."""
+    if unit == 'bytes':
+        return f'{value:.0f} bytes'
+    elif value < 1e-6:
+        return f'{value * 1e9:.1f} ns'
+    elif value < 1e-3:
+        return f'{value * 1e6:.2f} us'
+    elif value < 1:
+        return f'{value * 1e3:.2f} ms'
+    return f'{value:.2f} s'
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> List[str]:
+    """Compares results against a baseline, where larger values are worse.
+
+    Parameters:
+        results(Dict[str, Dict[str, float]]): The results of each suite, by benchmark name.
+        baseline(Dict[str, Dict[str, float]]): Earlier results in the same format.
+        threshold(float): The relative increase above which a benchmark has regressed.
+
+    Returns:
+        (List[str]): The names, as suite.benchmark, of the benchmarks which regressed.
+    """
+    regressions = []
+    for suite, suite_results in results.items():
+        unit = SUITES[suite][1]
+        for name, value in suite_results.items():
+            old = baseline.get(suite, {}).get(name)
+            if old is None:
+                print(f'{suite}.{name:<32}{format_value(value, unit):>14}   (no baseline)')
+                continue
+            change = value / old - 1 if old else 0.0
+            regressed = change > threshold
+            if regressed:
+                regressions.append(f'{suite}.{name}')
+            print(f'{suite}.{name:<32}{format_value(value, unit):>14}{format_value(old, unit):>14}'
+                  f'{change:>+9.1%}{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('suites', nargs='+', choices=list(SUITES), help='the benchmarks to run')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--save', metavar='PATH', help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='report regressions against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='the relative slowdown counted as a regression')
+    args = parser.parse_args()
+
+    results = {suite: SUITES[suite][0]() for suite in dict.fromkeys(args.suites)}
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regressions: {", ".join(regressions)}')
+            sys.exit(1)
+    elif args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        for suite, suite_results in results.items():
+            for name, value in suite_results.items():
+                print(f'{suite}.{name:<32}{format_value(value, SUITES[suite][1]):>14}')
+
+
+if __name__ == "__main__":
+    main()
@@ -57,4 +57,6 @@ brock = Trainer("Brock")
 for name, type in [('Geodude', 'rock'), ('Pikachu', 'electric'), ('Tepig', 'fire')]:
     brock.add_pokemon(make_basic_pokemon(name, type, DEFAULT_MOVES, 12))
 
-brock.add_item(Pokeball("Great Ball", 0.6), 4)
\ No newline at end of file
+brock.add_item(Pokeball("Great Ball", 0.6), 4)
+
+ElementType.freeze()
@@ -0,0 +1,608 @@
+"""Battles with several combatants on each side, such as doubles, triples and raids.
+
+A MultiBattle is fought between two sides, each made up of any number of
+trainers, and every trainer fights with several active pokemon at once. Each
+active pokemon occupies a numbered slot, which queues its own action each
+round; attacks and debuffs are aimed at a slot on the other side.
+
+Turns are resolved by the same ActionScheduler as Battle, with slot indices as
+the actors, so actions are performed in priority order. Slots, active pokemon,
+standing pokemon and defeated trainers are all indexed and kept up to date as
+each action is applied, so an action costs the same however many slots there
+are: a round of a 40 slot raid costs about as much as 40 single battle actions.
+A slot with nothing it can do, such as a pokemon out of moves with no pokemon to
+switch in, passes, and each round goes ahead with the slots which can act.
+
+Attacks and food are resolved by Attack.strike and Food.feed, exactly as in a
+single Battle, except that an attack on a pokemon which fainted earlier in the
+round misses.
+
+Pokeballs and fleeing are not allowed, as every format is a trainer battle.
+
+    battle = create_raid_battle(raiders, boss)
+    winning_side = play_multi_battle(battle)
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from a2 import *
+from simulation import DEFAULT_MAX_TURNS
+
+# The index of each side of a battle.
+PLAYER_SIDE = 0
+ENEMY_SIDE = 1
+
+# Active pokemon per trainer in each format.
+SINGLES_ACTIVE_POKEMON = 1
+DOUBLES_ACTIVE_POKEMON = 2
+TRIPLES_ACTIVE_POKEMON = 3
+
+
+class BattleSlot(object):
+    """A place on one side of a MultiBattle, occupied by one of its trainer's pokemon."""
+    __slots__ = ('_index', '_side', '_trainer', '_pokemon')
+
+    def __init__(self, index: int, side: int, trainer: Trainer, pokemon: Pokemon) -> None:
+        """Creates a BattleSlot.
+
+        Parameters:
+            index(int): The index of the slot in its battle.
+            side(int): The side the slot is on, PLAYER_SIDE or ENEMY_SIDE.
+            trainer(Trainer): The trainer whose pokemon occupy the slot.
+            pokemon(Pokemon): The pokemon first occupying the slot.
+        """
+        self._index = index
+        self._side = side
+        self._trainer = trainer
+        self._pokemon = pokemon
+
+    def get_index(self) -> int:
+        """(int): Return the index of this slot in its battle."""
+        return self._index
+
+    def get_side(self) -> int:
+        """(int): Return the side this slot is on."""
+        return self._side
+
+    def get_trainer(self) -> Trainer:
+        """(Trainer): Return the trainer whose pokemon occupy this slot."""
+        return self._trainer
+
+    def get_pokemon(self) -> Pokemon:
+        """(Pokemon): Return the pokemon currently in this slot."""
+        return self._pokemon
+
+    def __str__(self) -> str:
+        """(str): Returns a string representation of a BattleSlot"""
+        return f'BattleSlot({self._index}, {self._side}, {self._trainer.get_name()!r}, {self._pokemon.get_name()!r})'
+
+    def __repr__(self) -> str:
+        """(str): Returns a string representation of a BattleSlot"""
+        return str(self)
+
+
+class MultiBattle(object):
+    """A trainer battle between two sides of any number of trainers, each with
+    several active pokemon."""
+    __slots__ = ('_slots', '_side_slots', '_positions', '_active', '_standing', '_trainers',
+                 '_defeated', '_remaining', '_scheduler', '_targets', '_expected', '_random',
+                 '_headless')
+
+    def __init__(self, sides: Sequence[Sequence[Trainer]], active_per_trainer: int = SINGLES_ACTIVE_POKEMON,
+                 rng: Optional[BattleRandom] = None, headless: bool = False) -> None:
+        """Creates a MultiBattle. Each trainer sends out the first of its pokemon which
+        have not fainted, up to active_per_trainer of them, into slots numbered in
+        order of side and then trainer.
+
+        Parameters:
+            sides(Sequence[Sequence[Trainer]]): The trainers of the player's side and then the enemy's.
+            active_per_trainer(int): The number of pokemon each trainer fights with at once.
+            rng(Optional[BattleRandom]): The stream the battle's rolls are drawn from,
+                which is freshly seeded if not supplied.
+            headless(bool): True if no one reads the summaries of this battle's actions,
+                so that no events are recorded for them.
+        """
+        if len(sides) != 2:
+            raise ValueError('A battle has exactly two sides.')
+        if active_per_trainer < 1:
+            raise ValueError('Each trainer needs at least one active pokemon.')
+        self._slots: List[BattleSlot] = []
+        self._side_slots: Tuple[List[BattleSlot], List[BattleSlot]] = ([], [])
+        # The position of each slot within its side, by slot index.
+        self._positions: List[int] = []
+        # The slot index of each active pokemon, by id of the pokemon.
+        self._active: Dict[int, int] = {}
+        # The indices of the slots whose pokemon have not fainted, on each side. Dicts
+        # keep the slots in order, and add or remove one in constant time.
+        self._standing: Tuple[Dict[int, None], Dict[int, None]] = ({}, {})
+        # The side of each trainer, the ids of the trainers whose pokemon have all
+        # fainted, and the number of trainers left on each side.
+        self._trainers: Dict[int, int] = {}
+        self._defeated = set()
+        self._remaining = [0, 0]
+        for side, trainers in enumerate(sides):
+            for trainer in trainers:
+                if id(trainer) in self._trainers:
+                    raise ValueError(f'{trainer} cannot join a battle twice.')
+                self._trainers[id(trainer)] = side
+                if trainer.all_pokemon_fainted():
+                    self._defeated.add(id(trainer))
+                else:
+                    self._remaining[side] += 1
+                active = [pokemon for pokemon in trainer.get_all_pokemon() if not pokemon.has_fainted()]
+                for pokemon in active[:active_per_trainer]:
+                    self._add_slot(side, trainer, pokemon)
+        self._scheduler = ActionScheduler()
+        # The target slot of each queued action which has one, by slot index.
+        self._targets: Dict[int, int] = {}
+        # The number of slots expected to act this round.
+        self._expected = self._count_able_slots()
+        self._random = BattleRandom() if rng is None else rng
+        self._headless = headless
+
+    def _add_slot(self, side: int, trainer: Trainer, pokemon: Pokemon) -> None:
+        """Adds a slot for a pokemon sent out at the start of the battle."""
+        slot = BattleSlot(len(self._slots), side, trainer, pokemon)
+        if not self._side_slots[side] or self._side_slots[side][-1].get_trainer() is not trainer:
+            """A trainer's current pokemon is the one in its first slot."""
+            trainer.current_pokemon = pokemon
+        self._positions.append(len(self._side_slots[side]))
+        self._slots.append(slot)
+        self._side_slots[side].append(slot)
+        self._active[id(pokemon)] = slot.get_index()
+        self._standing[side][slot.get_index()] = None
+
+    def get_slots(self) -> List[BattleSlot]:
+        """Returns every slot in the battle, in index order.
+
+        Returns:
+            (List[BattleSlot]): The slots of both sides.
+        """
+        return self._slots
+
+    def get_slot(self, index: int) -> BattleSlot:
+        """Returns the slot with the supplied index.
+
+        Parameters:
+            index(int): The index of the slot.
+
+        Returns:
+            (BattleSlot): The slot.
+        """
+        return self._slots[index]
+
+    def get_side_slots(self, side: int) -> List[BattleSlot]:
+        """Returns the slots on one side, in index order.
+
+        Parameters:
+            side(int): PLAYER_SIDE or ENEMY_SIDE.
+
+        Returns:
+            (List[BattleSlot]): The slots on that side.
+        """
+        return self._side_slots[side]
+
+    def get_standing_slots(self, side: int) -> List[int]:
+        """Returns the indices of the slots on one side whose pokemon have not fainted.
+
+        Parameters:
+            side(int): PLAYER_SIDE or ENEMY_SIDE.
+
+        Returns:
+            (List[int]): The slot indices, in the order their pokemon were sent out.
+        """
+        return list(self._standing[side])
+
+    def get_random(self) -> BattleRandom:
+        """Return the random stream this battle's rolls are drawn from.
+
+        Returns:
+            (BattleRandom): The battle's random stream.
+        """
+        return self._random
+
+    def is_headless(self) -> bool:
+        """Returns true if the summaries of this battle's actions record no events.
+
+        Returns:
+            (bool): True if this battle is headless.
+        """
+        return self._headless
+
+    def _can_act(self, slot: BattleSlot) -> bool:
+        """Returns true if the slot's pokemon is standing, or its trainer has a pokemon to switch in."""
+        if not slot.get_pokemon().has_fainted():
+            return True
+        return self.get_replacement(slot.get_index()) is not None
+
+    def get_replacement(self, index: int) -> Optional[int]:
+        """Returns the roster index of the first pokemon the slot's trainer could switch
+        into the slot: one which has not fainted and is not already active.
+
+        Parameters:
+            index(int): The index of the slot.
+
+        Returns:
+            (Optional[int]): The roster index, or None if there is no such pokemon.
+        """
+        for roster_index, pokemon in enumerate(self._slots[index].get_trainer().get_all_pokemon()):
+            if not pokemon.has_fainted() and id(pokemon) not in self._active:
+                return roster_index
+        return None
+
+    def _has_action(self, slot: BattleSlot) -> bool:
+        """Returns true if the slot has anything it could do this round: a move with uses
+        left, a switch or an item. A slot with nothing to do passes, and the round goes
+        ahead without it."""
+        if not self._can_act(slot):
+            return False
+        pokemon = slot.get_pokemon()
+        if pokemon.has_fainted():
+            """The slot's trainer has a pokemon to switch in."""
+            return True
+        for _, uses in pokemon.get_move_info():
+            if uses >= 1:
+                return True
+        if self.get_replacement(slot.get_index()) is not None:
+            return True
+        return any(self.can_apply(item, slot.get_index()) for item in slot.get_trainer().get_inventory())
+
+    def _count_able_slots(self) -> int:
+        """Returns the number of slots which have something to do this round."""
+        return sum(1 for slot in self._slots if self._has_action(slot))
+
+    def get_default_target(self, index: int) -> Optional[int]:
+        """Returns the slot an action from the supplied slot aims at by default: the slot
+        facing it on the other side if its pokemon is standing, or else the first
+        standing slot on the other side. If no pokemon on the other side is standing,
+        the facing slot is aimed at anyway, as its trainer will switch a pokemon in
+        before any move is performed.
+
+        Parameters:
+            index(int): The index of the acting slot.
+
+        Returns:
+            (Optional[int]): The index of the target slot, or None if the other side has no slots.
+        """
+        other = 1 - self._slots[index].get_side()
+        opponents = self._side_slots[other]
+        if not opponents:
+            return None
+        facing = opponents[self._positions[index] % len(opponents)].get_index()
+        if facing in self._standing[other]:
+            return facing
+        return next(iter(self._standing[other]), facing)
+
+    def can_apply(self, action: Action, index: int, target: Optional[int] = None) -> bool:
+        """Returns true if the slot's trainer could perform the action from the slot now,
+        aimed at the supplied target if the action needs one.
+
+        Parameters:
+            action(Action): The action.
+            index(int): The index of the acting slot.
+            target(Optional[int]): The index of the target slot, if the action needs one.
+
+        Returns:
+            (bool): True if the action could be applied.
+        """
+        slot = self._slots[index]
+        pokemon = slot.get_pokemon()
+        if isinstance(action, Move):
+            if pokemon.has_fainted() or pokemon.get_remaining_move_uses(action) < 1:
+                return False
+            if isinstance(action, (Attack, Debuff)):
+                """Attacks and debuffs must be aimed at a slot on the other side."""
+                return (target is not None and 0 <= target < len(self._slots)
+                        and self._slots[target].get_side() != slot.get_side())
+            return True
+        elif isinstance(action, SwitchPokemon):
+            roster = slot.get_trainer().get_all_pokemon()
+            next_index = action.get_next_pokemon_index()
+            if not 0 <= next_index < len(roster):
+                return False
+            return not roster[next_index].has_fainted() and id(roster[next_index]) not in self._active
+        elif isinstance(action, Food):
+            return slot.get_trainer().has_item(action)
+        else:
+            """Pokeballs and fleeing are only allowed in wild battles."""
+            return False
+
+    def can_queue_action(self, index: int) -> bool:
+        """Returns true if the slot may queue an action now: the battle is not over, the
+        round has not started, the slot has not queued an action yet and it has
+        something to do.
+
+        Parameters:
+            index(int): The index of the slot.
+
+        Returns:
+            (bool): True if the slot may queue an action.
+        """
+        if self.is_over() or self._scheduler.get_acted_count() != 0:
+            """Actions can only be queued between rounds of a battle which is still going."""
+            return False
+        return not self._scheduler.has_queued(index) and self._has_action(self._slots[index])
+
+    def legal_actions(self, index: int) -> Iterator[Tuple[Action, Optional[int]]]:
+        """Yields every (action, target) pair the slot could validly queue now: moves with
+        uses left, each aimed at every slot on the other side which can act if it needs
+        a target, then switches by roster index and then items.
+
+        Parameters:
+            index(int): The index of the slot.
+
+        Yields:
+            (Tuple[Action, Optional[int]]): Each valid action and its target slot, or None.
+        """
+        if not self.can_queue_action(index):
+            return
+        slot = self._slots[index]
+        pokemon = slot.get_pokemon()
+        if not pokemon.has_fainted():
+            targets = [other.get_index() for other in self._side_slots[1 - slot.get_side()]
+                       if self._can_act(other)]
+            for move, uses in pokemon.get_move_info():
+                if uses < 1:
+                    continue
+                if isinstance(move, (Attack, Debuff)):
+                    for target in targets:
+                        yield move, target
+                else:
+                    yield move, None
+        for next_index in range(len(slot.get_trainer().get_all_pokemon())):
+            switch = SwitchPokemon(next_index)
+            if self.can_apply(switch, index):
+                yield switch, None
+        for item in tuple(slot.get_trainer().get_inventory()):
+            if self.can_apply(item, index):
+                yield item, None
+
+    def queue_action(self, action: Action, index: int, target: Optional[int] = None) -> None:
+        """Attempts to queue the supplied action for a slot, if it is valid given the battle state.
+
+        Parameters:
+            action(Action): The action to queue.
+            index(int): The index of the acting slot.
+            target(Optional[int]): The index of the slot the action is aimed at. Attacks
+                and debuffs aim at get_default_target if it is not supplied.
+        """
+        if target is None and isinstance(action, (Attack, Debuff)):
+            target = self.get_default_target(index)
+        if self.can_queue_action(index) and self.can_apply(action, index, target):
+            """The action is valid and the slot has not acted yet."""
+            self._scheduler.push(action, index)
+            if target is not None:
+                self._targets[index] = target
+
+    def is_ready(self) -> bool:
+        """Returns true if the next action is ready to be performed.
+
+        Returns:
+            (bool): True if every slot with something to do has queued an action or already acted this round.
+        """
+        if self.is_over():
+            return False
+        queued = len(self._scheduler)
+        return queued != 0 and queued + self._scheduler.get_acted_count() == self._expected
+
+    def get_queued_actions(self) -> List[Tuple[Action, int]]:
+        """Returns the queued actions, in the order enact_turn will perform them.
+
+        Returns:
+            (List[Tuple[Action, int]]): Each queued action and the index of its slot.
+        """
+        return self._scheduler.get_queued()
+
+    def enact_turn(self) -> Optional[ActionSummary]:
+        """Performs the next action in the queue, and returns a summary of its effects.
+        An action which is no longer possible, such as a move from a pokemon which has
+        fainted earlier in the round, is skipped.
+
+        Returns:
+            (Optional[ActionSummary]): The summary of the action, or None if it was skipped.
+        """
+        action, index = self._scheduler.pop()
+        target = self._targets.pop(index, None)
+        summary = None
+        if self.can_apply(action, index, target):
+            summary = self._apply(action, self._slots[index], target)
+        if len(self._scheduler) == 0:
+            """Every slot has acted, so the round is over."""
+            self.end_round()
+        return summary
+
+    def _apply(self, action: Action, slot: BattleSlot, target: Optional[int]) -> ActionSummary:
+        """Applies a valid action from the slot, and updates the indices of the slots it affected."""
+        summary = ActionSummary(headless=self._headless)
+        pokemon = slot.get_pokemon()
+        trainer = slot.get_trainer()
+        target_slot = None if target is None else self._slots[target]
+        if isinstance(action, Move):
+            pokemon.reduce_move_count(action)
+            target_pokemon = pokemon if target_slot is None else target_slot.get_pokemon()
+            summary.add_event(EVENT_USED_MOVE, pokemon, target_pokemon, action)
+            if isinstance(action, Attack):
+                if target_pokemon.has_fainted():
+                    """The target fainted earlier in the round, so the attack misses."""
+                    summary.add_event(EVENT_MISSED, pokemon, target_pokemon, action)
+                else:
+                    action.strike(pokemon, target_pokemon, self._random, summary)
+            elif isinstance(action, Buff):
+                pokemon.add_stat_modifier(action.get_modification(), action.get_rounds())
+            elif isinstance(action, Debuff) and not target_pokemon.has_fainted():
+                target_pokemon.add_stat_modifier(action.get_modification(), action.get_rounds())
+        elif isinstance(action, SwitchPokemon):
+            if not pokemon.has_fainted():
+                summary.add_event(EVENT_RETURNED, pokemon)
+            next_index = action.get_next_pokemon_index()
+            del self._active[id(pokemon)]
+            slot._pokemon = pokemon = trainer.get_all_pokemon()[next_index]
+            self._active[id(pokemon)] = slot.get_index()
+            if self._is_first_slot(slot):
+                trainer.switch_pokemon(next_index)
+            summary.add_event(EVENT_SWITCHED, trainer, pokemon)
+        elif isinstance(action, Food):
+            action.feed(trainer, pokemon, summary)
+        self._update(slot)
+        if target_slot is not None:
+            self._update(target_slot)
+        return summary
+
+    def _is_first_slot(self, slot: BattleSlot) -> bool:
+        """Returns true if the slot is the first its trainer occupies."""
+        position = self._positions[slot.get_index()]
+        return position == 0 or self._side_slots[slot.get_side()][position - 1].get_trainer() is not slot.get_trainer()
+
+    def _update(self, slot: BattleSlot) -> None:
+        """Brings the standing slots and defeated trainers up to date with the slot's pokemon."""
+        side = slot.get_side()
+        standing = self._standing[side]
+        index = slot.get_index()
+        if slot.get_pokemon().has_fainted():
+            standing.pop(index, None)
+        elif index not in standing:
+            standing[index] = None
+        trainer = slot.get_trainer()
+        defeated = trainer.all_pokemon_fainted()
+        if defeated != (id(trainer) in self._defeated):
+            """The trainer's last pokemon has fainted, or one has been revived."""
+            if defeated:
+                self._defeated.add(id(trainer))
+                self._remaining[side] -= 1
+            else:
+                self._defeated.discard(id(trainer))
+                self._remaining[side] += 1
+
+    def end_round(self) -> None:
+        """Ends the current round, letting every active pokemon update its stat modifiers
+        and allowing every slot to queue its next action."""
+        for slot in self._slots:
+            slot.get_pokemon().post_round_actions()
+        self._scheduler.end_round()
+        self._targets.clear()
+        self._expected = self._count_able_slots()
+
+    def is_over(self) -> bool:
+        """Returns true if the battle is over, because every trainer on a side has no
+        pokemon left which have not fainted.
+
+        Returns:
+            (bool): True if the battle is over.
+        """
+        return self._remaining[PLAYER_SIDE] == 0 or self._remaining[ENEMY_SIDE] == 0
+
+    def get_winning_side(self) -> Optional[int]:
+        """Returns the side which won the battle, if it is over and one side is left.
+
+        Returns:
+            (Optional[int]): PLAYER_SIDE or ENEMY_SIDE, or None if there is no winner yet.
+        """
+        if self._remaining[ENEMY_SIDE] == 0 and self._remaining[PLAYER_SIDE] != 0:
+            return PLAYER_SIDE
+        if self._remaining[PLAYER_SIDE] == 0 and self._remaining[ENEMY_SIDE] != 0:
+            return ENEMY_SIDE
+        return None
+
+
+def create_doubles_battle(player: Trainer, enemy: Trainer, rng: Optional[BattleRandom] = None,
+                          headless: bool = False) -> MultiBattle:
+    """Creates a battle between two trainers with two active pokemon each.
+
+    Parameters:
+        player(Trainer): The trainer corresponding to the player character.
+        enemy(Trainer): The enemy trainer.
+        rng(Optional[BattleRandom]): The stream the battle's rolls are drawn from.
+        headless(bool): True if no events should be recorded.
+
+    Returns:
+        (MultiBattle): The new battle.
+    """
+    return MultiBattle([[player], [enemy]], DOUBLES_ACTIVE_POKEMON, rng, headless)
+
+
+def create_triples_battle(player: Trainer, enemy: Trainer, rng: Optional[BattleRandom] = None,
+                          headless: bool = False) -> MultiBattle:
+    """Creates a battle between two trainers with three active pokemon each.
+
+    Parameters:
+        player(Trainer): The trainer corresponding to the player character.
+        enemy(Trainer): The enemy trainer.
+        rng(Optional[BattleRandom]): The stream the battle's rolls are drawn from.
+        headless(bool): True if no events should be recorded.
+
+    Returns:
+        (MultiBattle): The new battle.
+    """
+    return MultiBattle([[player], [enemy]], TRIPLES_ACTIVE_POKEMON, rng, headless)
+
+
+def create_raid_battle(raiders: Sequence[Trainer], boss: Trainer, rng: Optional[BattleRandom] = None,
+                       headless: bool = False) -> MultiBattle:
+    """Creates a raid, in which any number of trainers with one active pokemon each
+    take on a single boss trainer.
+
+    Parameters:
+        raiders(Sequence[Trainer]): The trainers on the player's side.
+        boss(Trainer): The trainer on the enemy's side.
+        rng(Optional[BattleRandom]): The stream the battle's rolls are drawn from.
+        headless(bool): True if no events should be recorded.
+
+    Returns:
+        (MultiBattle): The new battle.
+    """
+    return MultiBattle([list(raiders), [boss]], SINGLES_ACTIVE_POKEMON, rng, headless)
+
+
+def choose_default_action(battle: MultiBattle, index: int) -> Optional[Tuple[Action, Optional[int]]]:
+    """Chooses a slot's action as DefaultAIStrategy does: switching to the first pokemon
+    which can be sent out if the slot's pokemon has fainted, or else using its first
+    move with uses left, aimed at the slot's default target. A pokemon out of moves
+    takes the first of its legal actions instead.
+
+    Parameters:
+        battle(MultiBattle): The ongoing battle.
+        index(int): The index of the slot.
+
+    Returns:
+        (Optional[Tuple[Action, Optional[int]]]): The action and its target slot, or None
+            if the slot has nothing it can do.
+    """
+    slot = battle.get_slot(index)
+    pokemon = slot.get_pokemon()
+    if pokemon.has_fainted():
+        next_index = battle.get_replacement(index)
+        return None if next_index is None else (SwitchPokemon(next_index), None)
+    for move, uses in pokemon.get_move_info():
+        if uses > 0:
+            if isinstance(move, (Attack, Debuff)):
+                return move, battle.get_default_target(index)
+            return move, None
+    return next(battle.legal_actions(index), None)
+
+
+def play_multi_battle(battle: MultiBattle, max_turns: int = DEFAULT_MAX_TURNS) -> Optional[int]:
+    """Plays the supplied battle to completion with every slot choosing its actions
+    by choose_default_action.
+
+    Parameters:
+        battle(MultiBattle): The battle to play. It is mutated in place.
+        max_turns(int): The maximum number of rounds to play.
+
+    Returns:
+        (Optional[int]): The winning side, or None if the battle was not won in time
+            or no slot had anything it could do.
+    """
+    slots = range(len(battle.get_slots()))
+    turns = 0
+    while not battle.is_over() and turns < max_turns:
+        for index in slots:
+            if battle.can_queue_action(index):
+                choice = choose_default_action(battle, index)
+                if choice is not None:
+                    battle.queue_action(choice[0], index, choice[1])
+        if not battle.is_ready():
+            """No slot has anything it can do, so the battle cannot progress."""
+            break
+        while battle.is_ready():
+            battle.enact_turn()
+        turns += 1
+    return battle.get_winning_side()
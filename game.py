@@ -75,29 +75,6 @@ class PokemonBattle(object):
         self._battle.queue_action(self._enemy_strategy.get_next_action(self._battle, False), False)
 
 
-class DefaultAIStrategy(Strategy):
-    """A class, used by the enemy AI to determine which actions
-    to take given a battle state."""
-    
-    def get_next_action(self, battle: Battle, is_player: bool) -> Action:
-        trainer = battle.get_trainer(is_player)
-        pokemon = trainer.get_current_pokemon()
-        
-        # If the current pokemon is dead, choose first non-dead.
-        if pokemon.has_fainted():
-            all_pokemon = trainer.get_all_pokemon()
-            for index, next_pokemon in enumerate(all_pokemon):
-                if not next_pokemon.has_fainted():
-                    return SwitchPokemon(index)
-
-        # Otherwise, choose first move with uses
-        for move, uses in pokemon.get_move_info():
-            if uses > 0:
-                return move
-
-        return Flee()
-
-
 def main():
     battle = Battle(data.ash, data.brock, True)
     # battle = create_encounter(data.ash, data.rattata) # Test wild battle.
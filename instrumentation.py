@@ -0,0 +1,261 @@
+"""Opt-in timing instrumentation for the battle engine.
+
+enable_timing replaces the engine's hot methods with timed wrappers which
+count calls and record how long each took; disable_timing puts the original
+methods back, so the engine pays nothing while timing is off. Each class
+which defines one of the timed methods itself is timed separately, so for
+example Attack.apply and Pokeball.apply are reported apart, including
+subclasses defined outside a2.py that exist when timing is enabled.
+
+Times are inclusive: a method's time includes the timed methods it calls.
+Only calls made in the current process are recorded.
+
+    enable_timing()
+    play_battle(battle, DefaultAIStrategy(), DefaultAIStrategy())
+    disable_timing()
+    print(get_timing_report())
+"""
+import functools
+import json
+import math
+import random
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from a2 import Action, Attack, Battle, Pokemon, Strategy
+
+# The (base class, method name) pairs timed by default. Every subclass of the
+# base class which defines the method itself is timed too.
+DEFAULT_TIMED_METHODS = (
+    (Action, 'is_valid'),
+    (Action, 'apply'),
+    (Pokemon, 'get_stats'),
+    (Attack, 'calculate_damage'),
+    (Battle, 'is_over'),
+    (Strategy, 'get_next_action'),
+)
+
+# Durations kept per method for estimating percentiles.
+TIMING_SAMPLE_SIZE = 10000
+
+# Percentiles reported for each method.
+TIMING_PERCENTILES = (50, 90, 99)
+
+
+class MethodTimings(object):
+    """The call count and durations recorded for one method."""
+    __slots__ = ('_name', '_calls', '_total', '_samples', '_random')
+
+    def __init__(self, name: str) -> None:
+        """Creates an empty MethodTimings.
+
+        Parameters:
+            name(str): The qualified name of the method, such as 'Attack.apply'.
+        """
+        self._name = name
+        self._calls = 0
+        self._total = 0
+        # A uniform sample of the recorded durations, in nanoseconds.
+        self._samples: List[int] = []
+        self._random = random.Random(name)
+
+    def add(self, duration: int) -> None:
+        """Records one call.
+
+        Parameters:
+            duration(int): How long the call took, in nanoseconds.
+        """
+        self._calls += 1
+        self._total += duration
+        if len(self._samples) < TIMING_SAMPLE_SIZE:
+            self._samples.append(duration)
+        else:
+            """Reservoir sampling keeps every call equally likely to be in the sample."""
+            index = self._random.randrange(self._calls)
+            if index < TIMING_SAMPLE_SIZE:
+                self._samples[index] = duration
+
+    def get_name(self) -> str:
+        """(str): Return the qualified name of the method."""
+        return self._name
+
+    def get_calls(self) -> int:
+        """(int): Return the number of calls recorded."""
+        return self._calls
+
+    def get_total(self) -> float:
+        """(float): Return the total time spent in the method, in seconds."""
+        return self._total / 1e9
+
+    def get_mean(self) -> float:
+        """(float): Return the mean time per call, in seconds."""
+        return self._total / self._calls / 1e9 if self._calls else 0.0
+
+    def get_percentile(self, percentile: float) -> float:
+        """Returns a percentile of the time per call, estimated from the sampled calls.
+
+        Parameters:
+            percentile(float): The percentile, from 0 to 100.
+
+        Returns:
+            (float): The time per call at that percentile, in seconds.
+        """
+        if not self._samples:
+            return 0.0
+        samples = sorted(self._samples)
+        index = min(len(samples) - 1, max(0, math.ceil(percentile / 100 * len(samples)) - 1))
+        return samples[index] / 1e9
+
+    def to_dict(self) -> Dict[str, float]:
+        """Returns the timings as a dictionary of plain numbers, with times in seconds.
+
+        Returns:
+            (Dict[str, float]): The calls, total, mean and percentile times.
+        """
+        timings = {'calls': self._calls, 'total': self.get_total(), 'mean': self.get_mean()}
+        for percentile in TIMING_PERCENTILES:
+            timings[f'p{percentile}'] = self.get_percentile(percentile)
+        return timings
+
+
+class TimingReport(object):
+    """The timings recorded for every instrumented method."""
+    def __init__(self, timings: Sequence[MethodTimings]) -> None:
+        """Creates a TimingReport.
+
+        Parameters:
+            timings(Sequence[MethodTimings]): The timings of each method.
+        """
+        self._timings = sorted(timings, key=lambda each: each.get_total(), reverse=True)
+
+    def get_timings(self) -> List[MethodTimings]:
+        """(List[MethodTimings]): Return the timings of each method called, slowest total first."""
+        return [each for each in self._timings if each.get_calls()]
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """(Dict[str, Dict[str, float]]): Return the timings of each method called, by name."""
+        return {each.get_name(): each.to_dict() for each in self.get_timings()}
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """Returns the timings of each method called as JSON, with times in seconds.
+
+        Parameters:
+            indent(Optional[int]): The indentation of the JSON, or None for one line.
+
+        Returns:
+            (str): The JSON document.
+        """
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def __str__(self) -> str:
+        """(str): Return a table of the timings, slowest total first, with times per call in microseconds."""
+        columns = ['calls', 'total ms', 'mean us'] + [f'p{each} us' for each in TIMING_PERCENTILES]
+        timings = self.get_timings()
+        width = max([len('method')] + [len(each.get_name()) for each in timings])
+        lines = ['method'.ljust(width) + ''.join(column.rjust(11) for column in columns)]
+        for each in timings:
+            values = [f'{each.get_calls()}', f'{each.get_total() * 1e3:.2f}', f'{each.get_mean() * 1e6:.2f}']
+            values += [f'{each.get_percentile(percentile) * 1e6:.2f}' for percentile in TIMING_PERCENTILES]
+            lines.append(each.get_name().ljust(width) + ''.join(value.rjust(11) for value in values))
+        return '\n'.join(lines)
+
+
+# The timings of each method by qualified name, kept across enable_timing calls
+# until reset_timings.
+_timings: Dict[str, MethodTimings] = {}
+
+# The (class, method name, original function) of each method currently replaced.
+_originals: List[Tuple[type, str, Callable]] = []
+
+
+def _subclasses(cls: type) -> Iterator[type]:
+    """Yields the supplied class and all of its subclasses, each once."""
+    seen = set()
+    pending = [cls]
+    while pending:
+        each = pending.pop()
+        if each not in seen:
+            seen.add(each)
+            yield each
+            pending.extend(each.__subclasses__())
+
+
+def _timed(function: Callable, timings: MethodTimings) -> Callable:
+    """Returns a wrapper around function which records each call in timings."""
+    clock = time.perf_counter_ns
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings.add(clock() - start)
+    return timed
+
+
+def enable_timing(methods: Sequence[Tuple[type, str]] = DEFAULT_TIMED_METHODS) -> None:
+    """Starts timing the supplied methods. Timings add to those already recorded.
+
+    Parameters:
+        methods(Sequence[Tuple[type, str]]): The (base class, method name) pairs to time.
+            Every subclass which defines the method itself is timed separately.
+    """
+    if _originals:
+        disable_timing()
+    for base, name in methods:
+        for cls in _subclasses(base):
+            function = cls.__dict__.get(name)
+            if function is None:
+                continue
+            qualified = f'{cls.__name__}.{name}'
+            timings = _timings.get(qualified)
+            if timings is None:
+                timings = _timings[qualified] = MethodTimings(qualified)
+            _originals.append((cls, name, function))
+            setattr(cls, name, _timed(function, timings))
+
+
+def disable_timing() -> None:
+    """Stops timing, putting every original method back. Recorded timings are kept."""
+    while _originals:
+        cls, name, function = _originals.pop()
+        setattr(cls, name, function)
+
+
+def is_timing_enabled() -> bool:
+    """Returns true if methods are currently being timed.
+
+    Returns:
+        (bool): True if timing is enabled.
+    """
+    return bool(_originals)
+
+
+def reset_timings() -> None:
+    """Discards every recorded timing."""
+    _timings.clear()
+
+
+@contextmanager
+def timing(methods: Sequence[Tuple[type, str]] = DEFAULT_TIMED_METHODS) -> Iterator[None]:
+    """A context manager which times the supplied methods while it is entered.
+
+    Parameters:
+        methods(Sequence[Tuple[type, str]]): The (base class, method name) pairs to time.
+    """
+    enable_timing(methods)
+    try:
+        yield
+    finally:
+        disable_timing()
+
+
+def get_timing_report() -> TimingReport:
+    """Returns a report of the timings recorded so far.
+
+    Returns:
+        (TimingReport): The timings of every method timed.
+    """
+    return TimingReport(list(_timings.values()))
@@ -0,0 +1,673 @@
+"""Compact binary battle replays.
+
+A BattleRecorder writes battles to a binary stream as they are played, and
+read_replays reads them back one at a time, rebuilding each battle's exact
+state without running any strategy.
+
+A replay stream starts with REPLAY_MAGIC and a version byte, followed by any
+number of battles. Each battle is a header holding its initial rosters and
+inventories, followed by one record per enacted turn and an end record. Moves
+and items are written once in the header, and a turn record refers to them by
+index, so most turns take two or three bytes:
+
+    flags       kind (3 bits), is_player, ends round, pending, rolls (2 bits)
+    argument    varint: the move's index in get_move_info, the switch index, or
+                the item's index in the header; absent for Flee
+    outcomes    one byte of roll outcomes, if the action made any rolls
+
+A turn record ends the round if enact_turn emptied the queue. Pending records
+are actions still queued when recording finished, which were never enacted.
+
+Every few rounds the recorder also writes a keyframe, holding the full state of
+every trainer and pokemon. When the recorder is closed it writes a footer
+indexing each battle's header and keyframes, followed by the footer's offset
+and INDEX_MAGIC. ReplayIndex reads the footer to seek to any turn by restoring
+the last keyframe before it and replaying only the turns since. Sequential
+readers skip keyframes and stop at the footer.
+"""
+import bisect
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import a2
+from a2 import (Action, ActionSummary, Battle, BattleRandom, Flee, Food, Item, Move, Pokeball,
+                Pokemon, PokemonStats, SwitchPokemon, Trainer)
+
+REPLAY_MAGIC = b'PKRP'
+INDEX_MAGIC = b'PKIX'
+REPLAY_VERSION = 2
+
+# Rounds end with a keyframe once at least this many turns have been enacted since the
+# last one, so seeking replays fewer turns than this.
+DEFAULT_KEYFRAME_INTERVAL = 64
+
+# Turn record kinds.
+RECORD_MOVE = 0
+RECORD_SWITCH = 1
+RECORD_ITEM = 2
+RECORD_FLEE = 3
+RECORD_KEYFRAME = 6
+RECORD_END = 7
+
+# Marks the footer, where the next battle's header would otherwise start.
+FOOTER_MARKER = 0xff
+
+# The footer's offset, followed by INDEX_MAGIC, ends an indexed replay stream.
+_TRAILER = struct.Struct('<Q4s')
+
+# Turn record flag bits, above the 3 bits of the kind.
+FLAG_PLAYER = 0x08
+FLAG_ROUND_END = 0x10
+FLAG_PENDING = 0x20
+ROLLS_SHIFT = 6
+MAXIMUM_RECORDED_ROLLS = 3
+
+# Tags of the values written in battle headers.
+_VALUE_NONE = 0
+_VALUE_FALSE = 1
+_VALUE_TRUE = 2
+_VALUE_INT = 3
+_VALUE_FLOAT = 4
+_VALUE_STR = 5
+_VALUE_TUPLE = 6
+
+_ITEM_CLASSES = {'Food': Food, 'Pokeball': Pokeball}
+
+
+class ReplayFormatError(Exception):
+    """Raised when a replay stream is malformed or cannot be written."""
+    pass
+
+
+def write_varint(stream: BinaryIO, value: int) -> None:
+    """Writes a non-negative integer to the stream in 7-bit groups, low group first."""
+    while value >= 0x80:
+        stream.write(bytes((value & 0x7f | 0x80,)))
+        value >>= 7
+    stream.write(bytes((value,)))
+
+
+def read_varint(stream: BinaryIO) -> int:
+    """Reads a non-negative integer written by write_varint."""
+    value = shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            raise ReplayFormatError('The replay ended in the middle of a record.')
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def write_value(stream: BinaryIO, value: object) -> None:
+    """Writes a None, bool, int, float, str, or a tuple or list of such values, to the stream."""
+    if value is None:
+        stream.write(bytes((_VALUE_NONE,)))
+    elif isinstance(value, bool):
+        stream.write(bytes((_VALUE_TRUE if value else _VALUE_FALSE,)))
+    elif isinstance(value, int):
+        stream.write(bytes((_VALUE_INT,)))
+        write_varint(stream, value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        stream.write(bytes((_VALUE_FLOAT,)) + struct.pack('<d', value))
+    elif isinstance(value, str):
+        encoded = value.encode('utf-8')
+        stream.write(bytes((_VALUE_STR,)))
+        write_varint(stream, len(encoded))
+        stream.write(encoded)
+    elif isinstance(value, (tuple, list)):
+        stream.write(bytes((_VALUE_TUPLE,)))
+        write_varint(stream, len(value))
+        for element in value:
+            write_value(stream, element)
+    else:
+        raise ReplayFormatError(f'Cannot write a value of type {type(value).__name__}.')
+
+
+def read_value(stream: BinaryIO, tag: Optional[int] = None) -> object:
+    """Reads a value written by write_value. Lists are read back as tuples.
+
+    The value's tag is read from the stream unless it has already been read and supplied.
+    """
+    if tag is None:
+        tag = _read_exactly(stream, 1)[0]
+    if tag == _VALUE_NONE:
+        return None
+    elif tag == _VALUE_FALSE or tag == _VALUE_TRUE:
+        return tag == _VALUE_TRUE
+    elif tag == _VALUE_INT:
+        encoded = read_varint(stream)
+        return encoded >> 1 if encoded % 2 == 0 else -(encoded + 1 >> 1)
+    elif tag == _VALUE_FLOAT:
+        return struct.unpack('<d', _read_exactly(stream, 8))[0]
+    elif tag == _VALUE_STR:
+        return _read_exactly(stream, read_varint(stream)).decode('utf-8')
+    elif tag == _VALUE_TUPLE:
+        return tuple(read_value(stream) for _ in range(read_varint(stream)))
+    raise ReplayFormatError(f'Unknown value tag {tag}.')
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    """Reads exactly size bytes from the stream."""
+    data = stream.read(size)
+    if len(data) != size:
+        raise ReplayFormatError('The replay ended in the middle of a record.')
+    return data
+
+
+class _CountingWriter(object):
+    """Wraps a binary stream, counting the bytes written so that offsets can be
+    recorded without the stream supporting tell."""
+    __slots__ = ('_stream', 'position')
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self._stream = stream
+        self.position = 0
+
+    def write(self, data: bytes) -> None:
+        self._stream.write(data)
+        self.position += len(data)
+
+
+class _RecordingRandom(BattleRandom):
+    """A random stream which rolls from another stream and records each roll's outcome."""
+    __slots__ = ('_source', '_outcomes')
+
+    def __init__(self, source: BattleRandom) -> None:
+        super().__init__(source.get_seed(), source.get_spawn_key())
+        self._source = source
+        self._outcomes: List[bool] = []
+
+    def spawn(self, count: int = 1) -> List[BattleRandom]:
+        return self._source.spawn(count)
+
+    def random(self) -> float:
+        return self._source.random()
+
+    def did_succeed(self, chance: float) -> bool:
+        outcome = self._source.did_succeed(chance)
+        self._outcomes.append(outcome)
+        return outcome
+
+
+class _ScriptedRandom(BattleRandom):
+    """A random stream whose rolls return recorded outcomes."""
+    __slots__ = ('_outcomes',)
+
+    def __init__(self) -> None:
+        super().__init__(0)
+        self._outcomes: List[bool] = []
+
+    def did_succeed(self, chance: float) -> bool:
+        if not self._outcomes:
+            raise ReplayFormatError('The replay has fewer recorded rolls than the battle makes.')
+        return self._outcomes.pop()
+
+
+class _BattleTables(object):
+    """The moves, items and pokemon of a battle, indexed in the order of its header."""
+    __slots__ = ('moves', 'move_index', 'items', 'item_index', 'pokemon', 'pokemon_index')
+
+    def __init__(self) -> None:
+        self.moves: List[Move] = []
+        self.move_index: Dict[Move, int] = {}
+        self.items: List[Item] = []
+        self.item_index: Dict[int, int] = {}
+        self.pokemon: List[Pokemon] = []
+        self.pokemon_index: Dict[int, int] = {}
+
+    def add_move(self, move: Move) -> int:
+        if move not in self.move_index:
+            self.move_index[move] = len(self.moves)
+            self.moves.append(move)
+        return self.move_index[move]
+
+    def add_item(self, item: Item) -> int:
+        if id(item) not in self.item_index:
+            self.item_index[id(item)] = len(self.items)
+            self.items.append(item)
+        return self.item_index[id(item)]
+
+    def add_pokemon(self, pokemon: Pokemon) -> int:
+        if id(pokemon) not in self.pokemon_index:
+            self.pokemon_index[id(pokemon)] = len(self.pokemon)
+            self.pokemon.append(pokemon)
+        return self.pokemon_index[id(pokemon)]
+
+
+def _item_definition(item: Item) -> Tuple:
+    """Returns the class name and constructor arguments of an item."""
+    if isinstance(item, Food):
+        return 'Food', item.get_name(), item.get_health_restored()
+    elif isinstance(item, Pokeball):
+        return 'Pokeball', item.get_name(), item.get_catch_chance()
+    raise ReplayFormatError(f'Cannot record the item {item}.')
+
+
+def _encode_state(battle: Battle, tables: _BattleTables) -> Tuple:
+    """Returns the state of every trainer and pokemon of a battle between rounds."""
+    trainers = []
+    for is_player in (True, False):
+        trainer = battle.get_trainer(is_player)
+        current = trainer.get_current_pokemon()
+        trainers.append((
+            tuple(tables.pokemon_index[id(pokemon)] for pokemon in trainer.get_all_pokemon()),
+            -1 if current is None else tables.pokemon_index[id(current)],
+            tuple((tables.item_index[id(item)], uses) for item, uses in trainer.get_inventory().items())
+        ))
+    pokemon = []
+    for each in tables.pokemon:
+        health, level, experience, stats, _, modifications, _ = each.snapshot()
+        uses = tuple(uses for _, uses in each.get_move_info())
+        pokemon.append((health, level, experience, stats, uses, modifications))
+    end_early = battle.snapshot()[-1]
+    return tuple(trainers), tuple(pokemon), end_early
+
+
+def _decode_state(state: Tuple, battle: Battle, tables: _BattleTables) -> None:
+    """Restores a battle, in place, to a state returned by _encode_state."""
+    trainers, pokemon, end_early = state
+    for each, (health, level, experience, stats, uses, modifications) in zip(tables.pokemon, pokemon):
+        move_uses = uses + (0,) * (len(each.snapshot()[4]) - len(uses))
+        each.restore((health, level, experience, stats, move_uses, modifications, None))
+    trainer_snapshots = []
+    for roster, current, inventory in trainers:
+        trainer_snapshots.append((tuple(tables.pokemon[index] for index in roster),
+                                  None if current == -1 else tables.pokemon[current],
+                                  tuple((tables.items[index], uses) for index, uses in inventory),
+                                  tuple(tables.pokemon[index].snapshot() for index in roster)))
+    battle.restore((trainer_snapshots[0], trainer_snapshots[1], (), (), end_early))
+
+
+def _write_header(stream: BinaryIO, battle: Battle) -> _BattleTables:
+    """Writes the initial state of a battle, returning the tables its turns are indexed by."""
+    tables = _BattleTables()
+    for is_player in (True, False):
+        trainer = battle.get_trainer(is_player)
+        for pokemon in trainer.get_all_pokemon():
+            tables.add_pokemon(pokemon)
+        for item in trainer.get_inventory():
+            tables.add_item(item)
+    pokemon = []
+    for each in tables.pokemon:
+        moves = tuple(tables.add_move(move) for move, _ in each.get_move_info())
+        pokemon.append((each.get_name(), each.get_element_type(), moves))
+    moves = []
+    for move in tables.moves:
+        definition = move.get_definition()
+        moves.append((definition[0].__name__,) + definition[1:])
+    items = tuple(_item_definition(item) for item in tables.items)
+    names = tuple(battle.get_trainer(is_player).get_name() for is_player in (True, False))
+    write_value(stream, (battle.is_trainer_battle(), tuple(moves), items, tuple(pokemon), names,
+                         _encode_state(battle, tables)))
+    return tables
+
+
+def _read_header(stream: BinaryIO, tag: Optional[int] = None) -> Tuple[Battle, _BattleTables]:
+    """Reads a battle header, returning the battle in its initial state and its tables."""
+    is_trainer_battle, moves, items, pokemon, names, state = read_value(stream, tag)
+    tables = _BattleTables()
+    for name, *arguments in moves:
+        move_class = getattr(a2, name, None)
+        if not (isinstance(move_class, type) and issubclass(move_class, Move)):
+            raise ReplayFormatError(f'Unknown move class {name}.')
+        tables.add_move(move_class(*arguments))
+    for name, *arguments in items:
+        if name not in _ITEM_CLASSES:
+            raise ReplayFormatError(f'Unknown item class {name}.')
+        tables.items.append(_ITEM_CLASSES[name](*arguments))
+    for (name, element_type, move_indices), (_, level, _, stats, _, _) in zip(pokemon, state[1]):
+        tables.pokemon.append(Pokemon(name, PokemonStats(stats), element_type,
+                                      [tables.moves[index] for index in move_indices], level))
+    battle = Battle(Trainer(names[0]), Trainer(names[1]), is_trainer_battle, _ScriptedRandom())
+    _decode_state(state, battle, tables)
+    return battle, tables
+
+
+class BattleRecorder(object):
+    """Writes battles to a binary replay stream as they are played.
+
+    Call start with a battle whose action queue is empty, enact each of its
+    turns through enact_turn rather than Battle.enact_turn, and call finish at
+    the end. Several battles may be recorded to one stream, one after another.
+    Call close once every battle is recorded to write the index used for seeking.
+    """
+    __slots__ = ('_stream', '_interval', '_battle', '_tables', '_random', '_source', '_turns',
+                 '_keyframe_turn', '_keyframes', '_index')
+
+    def __init__(self, stream: BinaryIO,
+                 keyframe_interval: Optional[int] = DEFAULT_KEYFRAME_INTERVAL) -> None:
+        """Creates a BattleRecorder, writing the replay stream's header.
+
+        Parameters:
+            stream(BinaryIO): The binary stream to write to.
+            keyframe_interval(Optional[int]): The most turns replayed when seeking, or
+                None to write no keyframes.
+        """
+        self._stream = _CountingWriter(stream)
+        self._interval = keyframe_interval
+        self._battle: Optional[Battle] = None
+        self._tables: Optional[_BattleTables] = None
+        self._random: Optional[_RecordingRandom] = None
+        self._source: Optional[BattleRandom] = None
+        self._turns = 0
+        self._keyframe_turn = 0
+        # The (turn, offset) of each keyframe of the current battle, and the
+        # (header offset, turns, keyframes) of every finished battle.
+        self._keyframes: List[Tuple[int, int]] = []
+        self._index: List[Tuple[int, int, Tuple[Tuple[int, int], ...]]] = []
+        self._stream.write(REPLAY_MAGIC + bytes((REPLAY_VERSION,)))
+
+    def start(self, battle: Battle) -> None:
+        """Starts recording a battle from its current state.
+
+        Parameters:
+            battle(Battle): The battle to record. Its rolls are recorded until finish.
+        """
+        if self._battle is not None:
+            raise ReplayFormatError('The previous battle has not been finished.')
+        if battle.get_queued_actions():
+            raise ReplayFormatError('Recording must start between rounds.')
+        self._battle = battle
+        self._index.append((self._stream.position, 0, ()))
+        self._tables = _write_header(self._stream, battle)
+        self._source = battle.get_random()
+        self._random = _RecordingRandom(self._source)
+        battle.set_random(self._random)
+        self._turns = self._keyframe_turn = 0
+        self._keyframes = []
+
+    def enact_turn(self) -> Optional[ActionSummary]:
+        """Enacts the next turn of the battle being recorded, and records it.
+
+        Returns:
+            (Optional[ActionSummary]): The summary returned by Battle.enact_turn.
+        """
+        action, is_player = self._battle.get_queued_actions()[0]
+        flags, argument = self._encode_action(action, is_player)
+        summary = self._battle.enact_turn()
+        self._turns += 1
+        outcomes = self._random._outcomes
+        if len(outcomes) > MAXIMUM_RECORDED_ROLLS:
+            raise ReplayFormatError(f'{action} made more than {MAXIMUM_RECORDED_ROLLS} rolls.')
+        round_end = self._battle.is_action_queue_empty()
+        if round_end:
+            flags |= FLAG_ROUND_END
+        self._write_record(flags | len(outcomes) << ROLLS_SHIFT, argument)
+        if outcomes:
+            self._stream.write(bytes((sum(outcome << bit for bit, outcome in enumerate(outcomes)),)))
+            outcomes.clear()
+        if (round_end and self._interval is not None
+                and self._turns - self._keyframe_turn >= self._interval - 1):
+            """Rounds are two turns, so a keyframe is due one turn early to stay within the interval."""
+            self._write_keyframe()
+        return summary
+
+    def _write_keyframe(self) -> None:
+        """Writes the full state of the battle at the end of a round."""
+        self._keyframes.append((self._turns, self._stream.position))
+        self._keyframe_turn = self._turns
+        self._stream.write(bytes((RECORD_KEYFRAME,)))
+        write_value(self._stream, (self._turns, _encode_state(self._battle, self._tables)))
+
+    def finish(self) -> None:
+        """Finishes recording the battle, recording any actions still queued as pending."""
+        for action, is_player in self._battle.get_queued_actions():
+            flags, argument = self._encode_action(action, is_player)
+            self._write_record(flags | FLAG_PENDING, argument)
+        self._stream.write(bytes((RECORD_END,)))
+        self._battle.set_random(self._source)
+        self._index[-1] = (self._index[-1][0], self._turns, tuple(self._keyframes))
+        self._battle = self._tables = self._random = self._source = None
+
+    def close(self) -> None:
+        """Writes the footer indexing every recorded battle. No more battles can be recorded."""
+        if self._battle is not None:
+            raise ReplayFormatError('The last battle has not been finished.')
+        footer = self._stream.position
+        self._stream.write(bytes((FOOTER_MARKER,)))
+        write_value(self._stream, tuple(self._index))
+        self._stream.write(_TRAILER.pack(footer, INDEX_MAGIC))
+
+    def _encode_action(self, action: Action, is_player: bool) -> Tuple[int, Optional[int]]:
+        """Returns the flags and argument of an action's record."""
+        flags = FLAG_PLAYER if is_player else 0
+        if isinstance(action, Move):
+            moves = [move for move, _ in self._battle.get_trainer(is_player).get_current_pokemon().get_move_info()]
+            return flags | RECORD_MOVE, moves.index(action)
+        elif isinstance(action, SwitchPokemon):
+            return flags | RECORD_SWITCH, action.get_next_pokemon_index()
+        elif isinstance(action, Item):
+            if id(action) not in self._tables.item_index:
+                raise ReplayFormatError(f'{action} was not in an inventory when recording started.')
+            return flags | RECORD_ITEM, self._tables.item_index[id(action)]
+        elif isinstance(action, Flee):
+            return flags | RECORD_FLEE, None
+        raise ReplayFormatError(f'Cannot record the action {action}.')
+
+    def _write_record(self, flags: int, argument: Optional[int]) -> None:
+        """Writes the flags and argument of a turn record."""
+        self._stream.write(bytes((flags,)))
+        if argument is not None:
+            write_varint(self._stream, argument)
+
+
+class BattleReplay(object):
+    """A recorded battle, read from a replay stream and rebuilt turn by turn."""
+    __slots__ = ('_stream', '_battle', '_tables', '_random', '_turns', '_round', '_finished')
+
+    def __init__(self, stream: BinaryIO, tag: Optional[int] = None) -> None:
+        """Reads a battle's header from the stream.
+
+        Parameters:
+            stream(BinaryIO): The replay stream, positioned at the start of a battle.
+            tag(Optional[int]): The first byte of the header, if it has already been read.
+        """
+        self._stream = stream
+        self._battle, self._tables = _read_header(stream, tag)
+        self._random = self._battle.get_random()
+        self._turns = 0
+        # The actions of the current round which are yet to be enacted.
+        self._round: List[Tuple[Action, bool, List[bool]]] = []
+        self._finished = False
+
+    def get_battle(self) -> Battle:
+        """Return the battle, in the state after the turns replayed so far.
+
+        Returns:
+            (Battle): The rebuilt battle.
+        """
+        return self._battle
+
+    def get_turns(self) -> int:
+        """(int): Return the number of turns replayed so far."""
+        return self._turns
+
+    def is_finished(self) -> bool:
+        """(bool): Return true once every recorded turn has been replayed."""
+        return self._finished and not self._round
+
+    def turns(self) -> Iterator[ActionSummary]:
+        """Replays the remaining turns of the battle, reading them from the stream as needed.
+        Replaying can be stopped between any two turns and resumed with another call.
+
+        Yields:
+            (ActionSummary): The summary of each turn, after it is enacted.
+        """
+        while self._round or not self._finished:
+            if not self._round:
+                """Queue the next round's actions, including any pending ones, as they were recorded."""
+                records = self._read_round()
+                for action, is_player, _ in records:
+                    self._battle.queue_action(action, is_player)
+                self._round = [record for record in records if record[2] is not None]
+                continue
+            action, is_player, outcomes = self._round.pop(0)
+            self._random._outcomes = outcomes[::-1]
+            summary = self._battle.enact_turn()
+            self._turns += 1
+            yield summary
+
+    def replay(self, turns: Optional[int] = None) -> Battle:
+        """Replays the remaining turns, or up to the supplied turn, and returns the battle.
+
+        Parameters:
+            turns(Optional[int]): If supplied, stop once this many turns have been replayed.
+
+        Returns:
+            (Battle): The rebuilt battle.
+        """
+        if turns is None or self._turns < turns:
+            for _ in self.turns():
+                if self._turns == turns:
+                    break
+        return self._battle
+
+    def skip(self) -> None:
+        """Reads past the remaining turns without replaying them."""
+        while not self._finished:
+            self._read_round()
+        self._round = []
+
+    def _load_keyframe(self) -> None:
+        """Restores the battle to the keyframe at the stream's position."""
+        if _read_exactly(self._stream, 1)[0] != RECORD_KEYFRAME:
+            raise ReplayFormatError('The index does not point to a keyframe.')
+        self._turns, state = read_value(self._stream)
+        _decode_state(state, self._battle, self._tables)
+        self._round = []
+
+    def _read_round(self) -> List[Tuple[Action, bool, Optional[List[bool]]]]:
+        """Reads the records of the next round, up to the end of the round or the battle.
+
+        Returns each action, whether the player acted, and its roll outcomes, or None for
+        pending actions.
+        """
+        records = []
+        while True:
+            flags = _read_exactly(self._stream, 1)[0]
+            kind = flags & 0x07
+            if kind == RECORD_END:
+                self._finished = True
+                return records
+            elif kind == RECORD_KEYFRAME:
+                """Replaying sequentially already reaches the keyframe's state."""
+                read_value(self._stream)
+                continue
+            is_player = bool(flags & FLAG_PLAYER)
+            action = self._decode_action(kind, is_player)
+            rolls = flags >> ROLLS_SHIFT
+            outcomes = None
+            if not flags & FLAG_PENDING:
+                bits = _read_exactly(self._stream, 1)[0] if rolls else 0
+                outcomes = [bool(bits >> bit & 1) for bit in range(rolls)]
+            records.append((action, is_player, outcomes))
+            if flags & FLAG_ROUND_END:
+                return records
+
+    def _decode_action(self, kind: int, is_player: bool) -> Action:
+        """Reads a record's argument and returns its action."""
+        if kind == RECORD_FLEE:
+            return Flee()
+        argument = read_varint(self._stream)
+        if kind == RECORD_MOVE:
+            pokemon = self._battle.get_trainer(is_player).get_current_pokemon()
+            return pokemon.get_move_info()[argument][0]
+        elif kind == RECORD_SWITCH:
+            return SwitchPokemon(argument)
+        elif kind == RECORD_ITEM:
+            return self._tables.items[argument]
+        raise ReplayFormatError(f'Unknown record kind {kind}.')
+
+
+def _read_stream_header(stream: BinaryIO) -> None:
+    """Reads and checks the magic and version at the start of a replay stream."""
+    header = stream.read(len(REPLAY_MAGIC) + 1)
+    if header[:len(REPLAY_MAGIC)] != REPLAY_MAGIC:
+        raise ReplayFormatError('This is not a replay stream.')
+    if header[len(REPLAY_MAGIC):] != bytes((REPLAY_VERSION,)):
+        raise ReplayFormatError(f'Unsupported replay version {header[len(REPLAY_MAGIC):]!r}.')
+
+
+def read_replays(stream: BinaryIO) -> Iterator[BattleReplay]:
+    """Reads the battles of a replay stream one at a time.
+
+    Each battle is read lazily as it is replayed. Any turns of a battle left
+    unreplayed are skipped when the next battle is read.
+
+    Parameters:
+        stream(BinaryIO): The binary stream to read from.
+
+    Yields:
+        (BattleReplay): Each recorded battle, in its initial state.
+    """
+    _read_stream_header(stream)
+    while True:
+        tag = stream.read(1)
+        if not tag or tag[0] == FOOTER_MARKER:
+            return
+        replay = BattleReplay(stream, tag[0])
+        yield replay
+        replay.skip()
+
+
+class ReplayIndex(object):
+    """The footer index of a closed replay stream, for seeking to any turn of any battle."""
+    __slots__ = ('_stream', '_base', '_battles')
+
+    def __init__(self, stream: BinaryIO) -> None:
+        """Reads the index of a seekable replay stream.
+
+        Parameters:
+            stream(BinaryIO): The replay stream, positioned at its start.
+        """
+        self._stream = stream
+        self._base = stream.tell()
+        _read_stream_header(stream)
+        stream.seek(-_TRAILER.size, 2)
+        footer, magic = _TRAILER.unpack(_read_exactly(stream, _TRAILER.size))
+        if magic != INDEX_MAGIC:
+            raise ReplayFormatError('The replay stream has no index; was the recorder closed?')
+        stream.seek(self._base + footer)
+        if _read_exactly(stream, 1)[0] != FOOTER_MARKER:
+            raise ReplayFormatError('The replay index does not point to a footer.')
+        self._battles = read_value(stream)
+
+    def get_battle_count(self) -> int:
+        """(int): Return the number of battles in the replay stream."""
+        return len(self._battles)
+
+    def get_turns(self, battle_index: int) -> int:
+        """Return the number of turns recorded for a battle.
+
+        Parameters:
+            battle_index(int): The index of the battle in the stream.
+
+        Returns:
+            (int): The number of turns.
+        """
+        return self._battles[battle_index][1]
+
+    def seek(self, battle_index: int, turn: int = 0) -> BattleReplay:
+        """Rebuilds a battle as it was after the supplied number of turns, by restoring
+        the last keyframe at or before the turn and replaying the turns after it.
+
+        Parameters:
+            battle_index(int): The index of the battle in the stream.
+            turn(int): The number of turns to have replayed.
+
+        Returns:
+            (BattleReplay): The battle's replay, which can be continued from the turn.
+        """
+        header, turns, keyframes = self._battles[battle_index]
+        if not 0 <= turn <= turns:
+            raise ValueError(f'Battle {battle_index} has {turns} turns, so turn {turn} does not exist.')
+        self._stream.seek(self._base + header)
+        replay = BattleReplay(self._stream)
+        keyframe = bisect.bisect_right(keyframes, (turn, float('inf'))) - 1
+        if keyframe >= 0:
+            self._stream.seek(self._base + keyframes[keyframe][1])
+            replay._load_keyframe()
+        replay.replay(turn)
+        return replay
@@ -0,0 +1,225 @@
+"""Bulk generation of trainers from species definitions.
+
+A RosterFactory builds pokemon from shared, immutable Species templates. The
+stats, experience and move slots of a species at a level are worked out once,
+the first time a pokemon of that species and level is needed, and every such
+pokemon is then a clone of the result which shares its moves. A species' stats
+are its stats at level 1; a pokemon made at a higher level has the stats it
+would have after levelling up to it.
+
+Trainers can be built from explicit specs with make_trainers, or drawn at
+random with generate_trainers. Both are generators, so a population of a
+million trainers can be streamed through a ladder without ever being held in
+memory at once.
+
+    factory = RosterFactory(species_of(data.ash, data.brock))
+    for trainer in factory.generate_trainers(1000000, seed=0):
+        ...
+"""
+import random
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from a2 import MAXIMUM_MOVE_SLOTS, MAXIMUM_POKEMON_ROSTER, Item, Move, Pokemon, PokemonStats, Trainer
+
+# The levels of generated pokemon, inclusive.
+DEFAULT_GENERATED_LEVELS = (50, 100)
+
+# Trainers whose rosters are drawn at once by generate_trainers.
+GENERATION_BATCH_SIZE = 1024
+
+
+class Species(object):
+    """An immutable template for one kind of pokemon: its name, type, level 1 stats and moves."""
+    __slots__ = ('_name', '_element_type', '_stats', '_moves')
+
+    def __init__(self, name: str, element_type: str, stats: Sequence[float], moves: Sequence[Move]) -> None:
+        """Creates a Species.
+
+        Parameters:
+            name(str): The name of the species, given to each of its pokemon.
+            element_type(str): The name of the species' type.
+            stats(Sequence[float]): The stats of a level 1 pokemon of the species, in PokemonStats order.
+            moves(Sequence[Move]): The moves each pokemon of the species knows.
+        """
+        if len(moves) > MAXIMUM_MOVE_SLOTS:
+            raise ValueError(f'A pokemon can know at most {MAXIMUM_MOVE_SLOTS} moves.')
+        self._name = name
+        self._element_type = element_type
+        self._stats = tuple(stats)
+        self._moves = tuple(moves)
+
+    @staticmethod
+    def from_pokemon(pokemon: Pokemon) -> 'Species':
+        """Returns the species of an existing pokemon, taking its base stats as its level 1 stats.
+
+        Parameters:
+            pokemon(Pokemon): The pokemon.
+
+        Returns:
+            (Species): A species with the pokemon's name, type, base stats and moves.
+        """
+        return Species(pokemon.get_name(), pokemon.get_element_type(), pokemon.get_base_stats().snapshot(),
+                       [move for move, _ in pokemon.get_move_info()])
+
+    def get_name(self) -> str:
+        """(str): Return the name of this species."""
+        return self._name
+
+    def get_element_type(self) -> str:
+        """(str): Return the name of this species' type."""
+        return self._element_type
+
+    def get_stats(self) -> Tuple[float, int, int, int]:
+        """(Tuple[float, int, int, int]): Return the stats of a level 1 pokemon of this species."""
+        return self._stats
+
+    def get_moves(self) -> Tuple[Move, ...]:
+        """(Tuple[Move, ...]): Return the moves each pokemon of this species knows."""
+        return self._moves
+
+    def __str__(self) -> str:
+        """(str): Returns a string representation of a Species"""
+        return f"Species('{self._name}')"
+
+    def __repr__(self) -> str:
+        """(str): Returns a string representation of a Species"""
+        return str(self)
+
+
+def species_of(*trainers: Trainer) -> List[Species]:
+    """Returns the species of every pokemon in the supplied trainers' rosters, once per name.
+
+    Parameters:
+        trainers(Trainer): The trainers, such as those in data.py.
+
+    Returns:
+        (List[Species]): The species, in roster order.
+    """
+    species = {}
+    for trainer in trainers:
+        for pokemon in trainer.get_all_pokemon():
+            if pokemon.get_name() not in species:
+                species[pokemon.get_name()] = Species.from_pokemon(pokemon)
+    return list(species.values())
+
+
+class RosterFactory(object):
+    """Builds pokemon and trainers in bulk from a set of species."""
+    __slots__ = ('_species', '_names', '_prototypes')
+
+    def __init__(self, species: Iterable[Species]) -> None:
+        """Creates a RosterFactory.
+
+        Parameters:
+            species(Iterable[Species]): The species pokemon can be made from, with distinct names.
+        """
+        self._species: Dict[str, Species] = {}
+        for each in species:
+            if each.get_name() in self._species:
+                raise ValueError(f'There are two species named {each.get_name()}.')
+            self._species[each.get_name()] = each
+        self._names = list(self._species)
+        # A pokemon of each species and level made so far, which new ones are cloned from.
+        self._prototypes: Dict[Tuple[str, int], Pokemon] = {}
+
+    def get_species(self) -> List[Species]:
+        """(List[Species]): Return the species this factory makes pokemon from."""
+        return list(self._species.values())
+
+    def make_pokemon(self, species: str, level: int) -> Pokemon:
+        """Makes a pokemon of a species, at full health with every move's uses.
+
+        Parameters:
+            species(str): The name of the species.
+            level(int): The level of the pokemon, at least 1.
+
+        Returns:
+            (Pokemon): The new pokemon.
+        """
+        prototype = self._prototypes.get((species, level))
+        if prototype is None:
+            if species not in self._species:
+                raise ValueError(f'There is no species named {species}.')
+            if level < 1:
+                raise ValueError('A pokemon must be at least level 1.')
+            template = self._species[species]
+            stats = PokemonStats(template.get_stats())
+            stats.level_up(level - 1)
+            prototype = Pokemon(species, stats, template.get_element_type(), list(template.get_moves()), level)
+            self._prototypes[(species, level)] = prototype
+        return prototype.clone()
+
+    def make_trainer(self, name: str, roster: Sequence[Tuple[str, int]],
+                     inventory: Optional[Dict[Item, int]] = None) -> Trainer:
+        """Makes a trainer with a roster of new pokemon.
+
+        Parameters:
+            name(str): The name of the trainer.
+            roster(Sequence[Tuple[str, int]]): The (species name, level) of each pokemon, in roster order.
+            inventory(Optional[Dict[Item, int]]): The uses of each item the trainer carries.
+
+        Returns:
+            (Trainer): The new trainer.
+        """
+        if len(roster) > MAXIMUM_POKEMON_ROSTER:
+            raise ValueError(f'A trainer can have at most {MAXIMUM_POKEMON_ROSTER} pokemon.')
+        trainer = Trainer(name)
+        for species, level in roster:
+            trainer.add_pokemon(self.make_pokemon(species, level))
+        if inventory:
+            for item, uses in inventory.items():
+                trainer.add_item(item, uses)
+        return trainer
+
+    def make_trainers(self, specs: Iterable[Tuple]) -> Iterator[Trainer]:
+        """Yields a new trainer for each spec, making each only when it is needed.
+
+        Parameters:
+            specs(Iterable[Tuple]): The arguments of make_trainer for each trainer:
+                (name, roster) or (name, roster, inventory).
+
+        Yields:
+            (Trainer): Each new trainer, in the order of the specs.
+        """
+        for spec in specs:
+            yield self.make_trainer(*spec)
+
+    def generate_trainers(self, count: Optional[int] = None, seed: int = 0,
+                          levels: Tuple[int, int] = DEFAULT_GENERATED_LEVELS,
+                          roster_size: int = MAXIMUM_POKEMON_ROSTER,
+                          inventory: Optional[Dict[Item, int]] = None,
+                          name_format: str = 'Trainer{}') -> Iterator[Trainer]:
+        """Yields trainers with rosters of random species at random levels. The same
+        arguments always yield the same trainers, and a smaller count yields the first
+        of the same trainers.
+
+        Parameters:
+            count(Optional[int]): The number of trainers, or None to keep going forever.
+            seed(int): The seed the rosters are drawn from.
+            levels(Tuple[int, int]): The lowest and highest level of each pokemon.
+            roster_size(int): The number of pokemon each trainer has.
+            inventory(Optional[Dict[Item, int]]): The uses of each item every trainer carries.
+            name_format(str): The name of each trainer, formatted with its index.
+
+        Yields:
+            (Trainer): Each new trainer.
+        """
+        if not self._names:
+            raise ValueError('There are no species to generate pokemon from.')
+        if not 1 <= roster_size <= MAXIMUM_POKEMON_ROSTER:
+            raise ValueError(f'A trainer must have from 1 to {MAXIMUM_POKEMON_ROSTER} pokemon.')
+        rng = random.Random(seed)
+        level_range = range(levels[0], levels[1] + 1)
+        index = 0
+        draws = GENERATION_BATCH_SIZE * roster_size
+        while True:
+            """Draw the rosters of a whole batch of trainers at once. Whole batches are
+            always drawn, so fewer trainers are the start of the same sequence."""
+            species = rng.choices(self._names, k=draws)
+            species_levels = rng.choices(level_range, k=draws)
+            for start in range(0, draws, roster_size):
+                if count is not None and index >= count:
+                    return
+                roster = zip(species[start:start + roster_size], species_levels[start:start + roster_size])
+                yield self.make_trainer(name_format.format(index), list(roster), inventory)
+                index += 1
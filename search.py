@@ -0,0 +1,570 @@
+"""Search-based strategies.
+
+MCTSStrategy chooses actions with a time-budgeted Monte Carlo Tree Search over
+round-start states of the battle. Both trainers choose their actions for a
+round simultaneously, so each node keeps separate statistics for the player's
+and the enemy's actions (decoupled UCT). The hit and catch rolls made by
+did_succeed while a round is enacted are modelled as chance nodes: the
+outcomes of a joint action are told apart by the state they lead to, and are
+visited as often as the engine's own rolls produce them.
+
+Nodes live in a transposition table keyed on Battle.state_key, so paths which
+reach the same state share statistics, and the table is kept between turns so
+that the next decision starts from the subtree already searched.
+
+ParallelMCTSStrategy runs independent searches with different seeds in a
+persistent pool of worker processes and sums their visit counts at the root.
+Each worker is sent the battle once, and afterwards only a compact encoding of
+its state for each decision.
+"""
+import atexit
+import itertools
+import math
+import os
+import pickle
+import random
+import time
+from collections import OrderedDict
+from multiprocessing import Pool
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from a2 import (Action, Battle, BattleRandom, Flee, Food, Item, Pokeball, Pokemon, Strategy, SwitchPokemon,
+                MAXIMUM_POKEMON_ROSTER)
+
+# The time budget of each decision, in seconds.
+DEFAULT_TIME_BUDGET = 0.05
+
+# The UCB1 exploration constant, for rewards in [0, 1].
+DEFAULT_EXPLORATION = 1.0
+
+# Rounds played by the random rollout from a new node before the state is evaluated.
+DEFAULT_ROLLOUT_ROUNDS = 30
+
+# Rounds played down the tree in one iteration before the state is evaluated with a rollout.
+DEFAULT_MAX_DEPTH = 50
+
+# The number of nodes kept in the transposition table between decisions.
+DEFAULT_MAX_TABLE_SIZE = 200000
+
+# Time reserved from each parallel decision for shipping states and merging results, in seconds.
+DEFAULT_MERGE_MARGIN = 0.005
+
+# Battles each worker process keeps a template and search tree for.
+WORKER_BATTLE_CACHE_SIZE = 4
+
+PLAYER_SIDE = 0
+ENEMY_SIDE = 1
+
+
+class _SearchNode(object):
+    """A round-start state in the search, with decoupled action statistics for each side."""
+    __slots__ = ('actions', 'visits', 'action_visits', 'action_values', 'outcomes')
+
+    def __init__(self, player_actions: List[Optional[Action]],
+                 enemy_actions: List[Optional[Action]]) -> None:
+        self.actions = (player_actions, enemy_actions)
+        self.visits = 0
+        # Per side, the visits and total reward (from the player's point of view) of each action.
+        self.action_visits = ([0] * len(player_actions), [0] * len(enemy_actions))
+        self.action_values = ([0.0] * len(player_actions), [0.0] * len(enemy_actions))
+        # Chance nodes: for each joint action, the nodes of the states it has led to.
+        self.outcomes: Dict[Tuple[int, int], Dict[Hashable, '_SearchNode']] = {}
+
+
+class MCTSStrategy(Strategy):
+    """A strategy which searches for its next action with Monte Carlo Tree Search."""
+    __slots__ = ('_time_budget', '_max_iterations', '_exploration', '_rollout_rounds',
+                 '_max_depth', '_max_table_size', '_random', '_table', '_battle', '_switches',
+                 '_flee', '_last_iterations')
+
+    def __init__(self, time_budget: float = DEFAULT_TIME_BUDGET,
+                 max_iterations: Optional[int] = None,
+                 exploration: float = DEFAULT_EXPLORATION,
+                 rollout_rounds: int = DEFAULT_ROLLOUT_ROUNDS,
+                 max_table_size: int = DEFAULT_MAX_TABLE_SIZE,
+                 seed: Optional[int] = None,
+                 max_depth: int = DEFAULT_MAX_DEPTH) -> None:
+        """Creates an MCTSStrategy.
+
+        Parameters:
+            time_budget(float): The wall-clock time to search for each decision, in seconds.
+            max_iterations(Optional[int]): If supplied, also stop after this many iterations.
+            exploration(float): The UCB1 exploration constant.
+            rollout_rounds(int): The rounds of random play used to evaluate a new node.
+            max_table_size(int): The transposition table is cleared when it grows past this.
+            seed(Optional[int]): Seeds the strategy's own choices. The hit and catch
+                rolls in the search come from a sub-stream of the battle's random stream.
+            max_depth(int): The rounds played down the tree in one iteration before
+                the state is evaluated with a rollout.
+        """
+        self._time_budget = time_budget
+        self._max_iterations = max_iterations
+        self._exploration = exploration
+        self._rollout_rounds = rollout_rounds
+        self._max_depth = max_depth
+        self._max_table_size = max_table_size
+        self._random = random.Random(seed)
+        self._table: Dict[Hashable, _SearchNode] = {}
+        self._battle: Optional[Battle] = None
+        self._switches = [SwitchPokemon(index) for index in range(MAXIMUM_POKEMON_ROSTER)]
+        self._flee = Flee()
+        self._last_iterations = 0
+
+    def reseed(self, rng: BattleRandom) -> None:
+        """Reseeds the strategy's own choices from the supplied stream.
+
+        Parameters:
+            rng(BattleRandom): The stream to seed this strategy's choices from.
+        """
+        self._random = random.Random(int(rng.random() * 2 ** 53))
+
+    def get_last_iterations(self) -> int:
+        """(int): Return the number of search iterations run for the last decision."""
+        return self._last_iterations
+
+    def get_next_action(self, battle: Battle, is_player: bool) -> Action:
+        """Searches from the supplied battle state and returns the action visited most often.
+
+        Parameters:
+            battle(Battle): The ongoing pokemon battle
+            is_player(bool): True if the player is using this action.
+
+        Returns:
+            (Action): Action taken in battle.
+        """
+        actions, visits = self._search(battle, is_player, time.perf_counter() + self._time_budget)
+        return actions[max(range(len(visits)), key=visits.__getitem__)]
+
+    def _search(self, battle: Battle, is_player: bool,
+                deadline: float) -> Tuple[List[Action], List[int]]:
+        """Searches from the supplied battle state until the deadline.
+
+        Parameters:
+            battle(Battle): The battle state to search from. It is not modified.
+            is_player(bool): True if searching for the player's action.
+            deadline(float): The time.perf_counter value at which to stop.
+
+        Returns:
+            (Tuple[List[Action], List[int]]): The searching trainer's actions at the
+                root and the number of times each was visited.
+        """
+        side = PLAYER_SIDE if is_player else ENEMY_SIDE
+        if battle is not self._battle or len(self._table) > self._max_table_size:
+            """Statistics only carry over between decisions in the same battle."""
+            self._table = {}
+            self._battle = battle
+
+        search_battle = battle.clone()
+        search_battle.set_headless(True)
+        search_battle.enable_journal()
+        root = self._get_root(search_battle)
+        iterations = 0
+        if len(root.actions[side]) > 1:
+            """Otherwise there is nothing to decide."""
+            while time.perf_counter() < deadline:
+                if self._max_iterations is not None and iterations >= self._max_iterations:
+                    break
+                self._iterate(search_battle, root, deadline)
+                while search_battle.can_undo():
+                    search_battle.undo()
+                iterations += 1
+        self._last_iterations = iterations
+        return root.actions[side], root.action_visits[side]
+
+    def _get_root(self, battle: Battle) -> _SearchNode:
+        """Returns the node of the supplied battle's state, reusing it if it was searched before.
+
+        A trainer which already has an action queued is given that queued action as
+        its only choice, marked by None.
+        """
+        key = battle.state_key()
+        root = self._table.get(key)
+        if root is None:
+            actions = []
+            for is_player in (True, False):
+                if battle.trainer_has_action_queued(is_player):
+                    actions.append([None])
+                else:
+                    actions.append(self._legal_actions(battle, is_player))
+            root = _SearchNode(actions[PLAYER_SIDE], actions[ENEMY_SIDE])
+            self._table[key] = root
+        return root
+
+    def _legal_actions(self, battle: Battle, is_player: bool) -> List[Action]:
+        """Returns the useful, valid actions of a trainer at the start of a round.
+
+        A trainer whose pokemon has fainted may only switch. Fleeing has no effect and
+        pokeballs are wasted in trainer battles, and food is wasted at full health, so
+        those are only offered if nothing else is valid.
+        """
+        pokemon = battle.get_trainer(is_player).get_current_pokemon()
+        fainted = pokemon.has_fainted()
+        actions: List[Action] = []
+        for action in battle.legal_actions(is_player):
+            if isinstance(action, SwitchPokemon):
+                actions.append(self._switches[action.get_next_pokemon_index()])
+            elif fainted:
+                continue
+            elif isinstance(action, Flee):
+                if not battle.is_trainer_battle():
+                    actions.append(self._flee)
+            elif isinstance(action, Pokeball) and battle.is_trainer_battle():
+                continue
+            elif isinstance(action, Food) and pokemon.get_health() >= pokemon.get_stats().get_max_health():
+                continue
+            else:
+                actions.append(action)
+        return actions if actions else [self._flee]
+
+    def _select(self, node: _SearchNode, side: int) -> int:
+        """Selects the index of a side's action at the node with UCB1."""
+        visits = node.action_visits[side]
+        unvisited = [index for index, count in enumerate(visits) if count == 0]
+        if unvisited:
+            return self._random.choice(unvisited)
+        values = node.action_values[side]
+        log_visits = math.log(node.visits)
+        best_index, best_score = 0, -math.inf
+        for index, count in enumerate(visits):
+            mean = values[index] / count
+            if side == ENEMY_SIDE:
+                mean = 1.0 - mean
+            score = mean + self._exploration * math.sqrt(log_visits / count)
+            if score > best_score:
+                best_index, best_score = index, score
+        return best_index
+
+    @staticmethod
+    def _play_round(battle: Battle, player_action: Optional[Action],
+                    enemy_action: Optional[Action]) -> None:
+        """Queues both actions, skipping None for an action already queued, and enacts the round."""
+        if player_action is not None:
+            battle.queue_action(player_action, True)
+        if enemy_action is not None:
+            battle.queue_action(enemy_action, False)
+        while battle.is_ready():
+            battle.enact_turn()
+
+    def _iterate(self, battle: Battle, root: _SearchNode, deadline: float) -> None:
+        """Runs one selection, expansion, rollout and backpropagation pass from the root.
+
+        A round can leave the state unchanged, and rounds can cycle back to an earlier
+        state, so the descent stops at a node already on its path, after max_depth
+        rounds, or at the deadline.
+        """
+        path = []
+        visited = set()
+        node = root
+        while True:
+            if battle.is_over():
+                value = self._evaluate(battle)
+                break
+            if time.perf_counter() >= deadline:
+                """There is no time left for a rollout, so the state is evaluated as it is."""
+                value = self._evaluate(battle)
+                break
+            if node in visited or len(path) >= self._max_depth:
+                """The descent would not end here, so the node is treated as a leaf."""
+                value = self._rollout(battle)
+                break
+            visited.add(node)
+            player_index = self._select(node, PLAYER_SIDE)
+            enemy_index = self._select(node, ENEMY_SIDE)
+            path.append((node, player_index, enemy_index))
+            self._play_round(battle, node.actions[PLAYER_SIDE][player_index],
+                             node.actions[ENEMY_SIDE][enemy_index])
+
+            outcomes = node.outcomes.setdefault((player_index, enemy_index), {})
+            key = battle.state_key()
+            child = outcomes.get(key)
+            if child is None:
+                child = self._table.get(key)
+                expanded = child is None
+                if expanded:
+                    child = _SearchNode(self._legal_actions(battle, True) if not battle.is_over() else [],
+                                        self._legal_actions(battle, False) if not battle.is_over() else [])
+                    self._table[key] = child
+                outcomes[key] = child
+                if expanded:
+                    value = self._rollout(battle)
+                    break
+            node = child
+
+        for node, player_index, enemy_index in path:
+            node.visits += 1
+            node.action_visits[PLAYER_SIDE][player_index] += 1
+            node.action_values[PLAYER_SIDE][player_index] += value
+            node.action_visits[ENEMY_SIDE][enemy_index] += 1
+            node.action_values[ENEMY_SIDE][enemy_index] += value
+
+    def _rollout_action(self, battle: Battle, is_player: bool) -> Action:
+        """Chooses a cheap random action: a random move with uses, or a switch if fainted."""
+        trainer = battle.get_trainer(is_player)
+        pokemon = trainer.get_current_pokemon()
+        if pokemon.has_fainted():
+            for index, next_pokemon in enumerate(trainer.get_all_pokemon()):
+                if not next_pokemon.has_fainted():
+                    return self._switches[index]
+        moves = [move for move, uses in pokemon.get_move_info() if uses > 0]
+        return self._random.choice(moves) if moves else self._flee
+
+    def _rollout(self, battle: Battle) -> float:
+        """Plays random rounds from the battle's state and returns the resulting value."""
+        for _ in range(self._rollout_rounds):
+            if battle.is_over():
+                break
+            self._play_round(battle, self._rollout_action(battle, True),
+                             self._rollout_action(battle, False))
+        return self._evaluate(battle)
+
+    @staticmethod
+    def _evaluate(battle: Battle) -> float:
+        """Returns the value of the battle's state for the player, in [0, 1].
+
+        A win is worth 1 and a loss 0. Otherwise the value grows with the player's
+        share of remaining health, relative to each team's maximum health.
+        """
+        player = battle.get_trainer(True)
+        enemy = battle.get_trainer(False)
+        if player.all_pokemon_fainted():
+            return 0.0
+        if enemy.all_pokemon_fainted():
+            return 1.0
+        fractions = []
+        for trainer in (player, enemy):
+            health = sum(pokemon.get_health() for pokemon in trainer.get_all_pokemon())
+            max_health = sum(pokemon.get_max_health() for pokemon in trainer.get_all_pokemon())
+            fractions.append(health / max_health if max_health else 0.0)
+        return 0.5 + 0.5 * (fractions[PLAYER_SIDE] - fractions[ENEMY_SIDE])
+
+
+class BattleCodec(object):
+    """Encodes a battle's state compactly for sending between processes.
+
+    A codec is built from a template battle. Pokemon and items are encoded by
+    their index in the template's rosters and inventories, and everything else
+    by value, so a state encoded from one battle can be decoded onto any copy of
+    its template, such as one unpickled in another process.
+    """
+    __slots__ = ('_pokemon', '_pokemon_index', '_items', '_item_index')
+
+    def __init__(self, template: Battle) -> None:
+        """Creates a BattleCodec for copies of the supplied battle.
+
+        Parameters:
+            template(Battle): The battle whose pokemon and items are indexed.
+        """
+        self._pokemon: List[Pokemon] = []
+        self._items: List[Item] = []
+        for is_player in (True, False):
+            trainer = template.get_trainer(is_player)
+            self._pokemon.extend(trainer.get_all_pokemon())
+            self._items.extend(trainer.get_inventory())
+        self._pokemon_index = {id(pokemon): index for index, pokemon in enumerate(self._pokemon)}
+        self._item_index = {id(item): index for index, item in enumerate(self._items)}
+
+    def encode(self, battle: Battle) -> Tuple:
+        """Returns the state of a battle between the template's pokemon as a compact tuple.
+
+        Parameters:
+            battle(Battle): The template battle, or the battle it was cloned from.
+
+        Returns:
+            (Tuple): Plain values which can be passed to decode.
+        """
+        trainers = []
+        for is_player in (True, False):
+            trainer = battle.get_trainer(is_player)
+            current = trainer.get_current_pokemon()
+            trainers.append((
+                tuple(self._pokemon_index[id(pokemon)] for pokemon in trainer.get_all_pokemon()),
+                -1 if current is None else self._pokemon_index[id(current)],
+                tuple((self._item_index[id(item)], uses) for item, uses in trainer.get_inventory().items())
+            ))
+        """The cached effective stats are dropped from each pokemon's snapshot, and rebuilt when needed."""
+        pokemon_states = tuple(pokemon.snapshot()[:-1] + (None,) for pokemon in self._pokemon)
+        _, _, action_queue, acted, end_early = battle.snapshot()
+        actions = tuple((self._encode_action(action), is_player) for action, is_player in action_queue)
+        return tuple(trainers), pokemon_states, actions, acted, end_early
+
+    def _encode_action(self, action: Action) -> object:
+        """Returns an item as its index and any other action, which pickles by value, unchanged."""
+        if isinstance(action, Item):
+            return self._item_index[id(action)]
+        return action
+
+    def decode(self, state: Tuple, battle: Battle) -> None:
+        """Restores the template battle, in place, to an encoded state.
+
+        Parameters:
+            state(Tuple): A state returned by encode.
+            battle(Battle): The template battle of this codec.
+        """
+        trainers, pokemon_states, actions, acted, end_early = state
+        trainer_snapshots = []
+        for (roster, current, inventory) in trainers:
+            all_pokemon = tuple(self._pokemon[index] for index in roster)
+            trainer_snapshots.append((
+                all_pokemon,
+                None if current == -1 else self._pokemon[current],
+                tuple((self._items[index], uses) for index, uses in inventory),
+                tuple(pokemon_states[index] for index in roster)
+            ))
+        for pokemon, pokemon_state in zip(self._pokemon, pokemon_states):
+            pokemon.restore(pokemon_state)
+        action_queue = tuple((self._items[action] if isinstance(action, int) else action, is_player)
+                             for action, is_player in actions)
+        battle.restore((trainer_snapshots[0], trainer_snapshots[1], action_queue, acted, end_early))
+
+
+# Persistent search pools, by number of processes, shared by every ParallelMCTSStrategy.
+_pools: Dict[int, Pool] = {}
+
+
+def get_search_pool(processes: int) -> Pool:
+    """Returns the persistent search pool with the supplied number of processes, starting it if needed.
+
+    Parameters:
+        processes(int): The number of worker processes.
+
+    Returns:
+        (Pool): The process pool.
+    """
+    pool = _pools.get(processes)
+    if pool is None:
+        pool = _pools[processes] = Pool(processes)
+    return pool
+
+
+def close_search_pools() -> None:
+    """Shuts down every persistent search pool. Called automatically at exit."""
+    while _pools:
+        _, pool = _pools.popitem()
+        pool.terminate()
+        pool.join()
+
+
+atexit.register(close_search_pools)
+
+
+# The battles each worker process has been sent, by token, with the codec and search
+# strategy used for them, so that search trees are reused across decisions.
+_worker_battles: 'OrderedDict[str, Tuple[Battle, BattleCodec, MCTSStrategy]]' = OrderedDict()
+
+
+def _worker_search(task: Tuple) -> Optional[List[int]]:
+    """Searches one battle state in a worker process.
+
+    Returns the visit counts of the searching trainer's root actions, or None if this
+    worker has not been sent the battle's template.
+    """
+    token, template, state, is_player, duration, seed, options = task
+    entry = _worker_battles.get(token)
+    if entry is None:
+        if template is None:
+            return None
+        battle = pickle.loads(template)
+        """Each worker rolls its own outcomes in the search."""
+        battle.set_random(BattleRandom(seed))
+        entry = (battle, BattleCodec(battle), MCTSStrategy(duration, seed=seed, **options))
+        _worker_battles[token] = entry
+        while len(_worker_battles) > WORKER_BATTLE_CACHE_SIZE:
+            _worker_battles.popitem(last=False)
+    _worker_battles.move_to_end(token)
+    battle, codec, strategy = entry
+    codec.decode(state, battle)
+    _, visits = strategy._search(battle, is_player, time.perf_counter() + duration)
+    return list(visits)
+
+
+# Distinguishes the battles sent by each process.
+_battle_tokens = itertools.count()
+
+
+class ParallelMCTSStrategy(MCTSStrategy):
+    """An MCTSStrategy which runs independent searches across a pool of worker processes.
+
+    Each worker searches the same state with its own seed, keeping its own
+    search tree between decisions, and the root visit counts of every worker
+    are summed to choose the action. The pool persists between decisions and is
+    shared by every ParallelMCTSStrategy with the same number of processes.
+
+    Worker processes cannot start pools of their own, so this strategy must be
+    used from the main process, e.g. with run_simulations(..., processes=1).
+    """
+    __slots__ = ('_processes', '_options', '_token', '_codec', '_template', '_shipped')
+
+    def __init__(self, time_budget: float = DEFAULT_TIME_BUDGET,
+                 processes: Optional[int] = None,
+                 exploration: float = DEFAULT_EXPLORATION,
+                 rollout_rounds: int = DEFAULT_ROLLOUT_ROUNDS,
+                 max_table_size: int = DEFAULT_MAX_TABLE_SIZE,
+                 seed: Optional[int] = None,
+                 max_depth: int = DEFAULT_MAX_DEPTH) -> None:
+        """Creates a ParallelMCTSStrategy.
+
+        Parameters:
+            time_budget(float): The wall-clock time to search for each decision, in seconds.
+            processes(Optional[int]): The number of worker processes, defaulting to
+                the number of CPUs.
+            exploration(float): The UCB1 exploration constant.
+            rollout_rounds(int): The rounds of random play used to evaluate a new node.
+            max_table_size(int): Each worker's transposition table is cleared when it grows past this.
+            seed(Optional[int]): Seeds the workers' choices.
+            max_depth(int): The rounds played down the tree in one iteration before
+                the state is evaluated with a rollout.
+        """
+        super().__init__(time_budget, None, exploration, rollout_rounds, max_table_size, seed, max_depth)
+        self._processes = processes or os.cpu_count() or 1
+        self._options = {'exploration': exploration, 'rollout_rounds': rollout_rounds,
+                         'max_table_size': max_table_size, 'max_depth': max_depth}
+        self._token: Optional[str] = None
+        self._codec: Optional[BattleCodec] = None
+        self._template: Optional[bytes] = None
+        self._shipped = False
+
+    def get_next_action(self, battle: Battle, is_player: bool) -> Action:
+        """Searches from the supplied battle state in every worker and returns the action
+        visited most often across all of them.
+
+        Parameters:
+            battle(Battle): The ongoing pokemon battle
+            is_player(bool): True if the player is using this action.
+
+        Returns:
+            (Action): Action taken in battle.
+        """
+        deadline = time.perf_counter() + self._time_budget
+        actions = self._legal_actions(battle, is_player)
+        if len(actions) == 1:
+            return actions[0]
+
+        if battle is not self._battle:
+            """Workers are sent a new template for each battle, along with the first decision."""
+            self._battle = battle
+            self._token = f'{os.getpid()}-{next(_battle_tokens)}'
+            self._codec = BattleCodec(battle)
+            template = battle.clone()
+            template.set_headless(True)
+            self._template = pickle.dumps(template)
+            self._shipped = False
+        template = None if self._shipped else self._template
+        duration = max(0.0, self._time_budget - DEFAULT_MERGE_MARGIN)
+        state = self._codec.encode(battle)
+        tasks = [(self._token, template, state, is_player, duration,
+                  self._random.getrandbits(32), self._options) for _ in range(self._processes)]
+        results = get_search_pool(self._processes).map(_worker_search, tasks, chunksize=1)
+
+        visits = [0] * len(actions)
+        searched = False
+        for result in results:
+            if result is not None and len(result) == len(actions):
+                searched = True
+                for index, count in enumerate(result):
+                    visits[index] += count
+        """Later decisions only send the state, unless a worker has not been sent the template."""
+        self._shipped = None not in results
+        if not searched:
+            """No worker had the template, so search here with what is left of the budget."""
+            actions, visits = self._search(battle, is_player, deadline)
+        return actions[max(range(len(visits)), key=visits.__getitem__)]
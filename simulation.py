@@ -0,0 +1,298 @@
+"""Headless battle simulation.
+
+Plays battles to completion without the Tk-bound controller in game.py, and
+fans batches of independent battles out across a process pool.
+"""
+import copy
+from multiprocessing import Pool
+from typing import Iterable, Optional, Tuple
+
+from a2 import Battle, BattleRandom, DefaultAIStrategy, Strategy, Trainer
+from replay import BattleRecorder
+
+# A battle that has not finished after this many turns is recorded as a draw.
+DEFAULT_MAX_TURNS = 1000
+
+# Runs handed to a worker process at a time.
+SIMULATION_CHUNK_SIZE = 64
+
+
+class BattleResult(object):
+    """The outcome of a single simulated battle."""
+    def __init__(self, winner: Optional[bool], turns: int,
+                 player_faints: int, enemy_faints: int) -> None:
+        """Creates a BattleResult.
+
+        Parameters:
+            winner(Optional[bool]): True if the player won, False if the enemy
+                won, or None if the battle ended without a winner.
+            turns(int): The number of turns played, where a turn is one action
+                from each trainer.
+            player_faints(int): The number of the player's pokemon that fainted.
+            enemy_faints(int): The number of the enemy's pokemon that fainted.
+        """
+        self._winner = winner
+        self._turns = turns
+        self._player_faints = player_faints
+        self._enemy_faints = enemy_faints
+
+    def get_winner(self) -> Optional[bool]:
+        """Return True if the player won, False if the enemy won, or None for a draw.
+
+        Returns:
+            (Optional[bool]): The winner of the battle.
+        """
+        return self._winner
+
+    def get_turns(self) -> int:
+        """Return the number of turns the battle lasted.
+
+        Returns:
+            (int): The number of turns played.
+        """
+        return self._turns
+
+    def get_faints(self, is_player: bool) -> int:
+        """Return the number of pokemon that fainted for the supplied trainer.
+
+        Parameters:
+            is_player(bool): True if we want the player's faint count.
+
+        Returns:
+            (int): The number of fainted pokemon.
+        """
+        if is_player:
+            return self._player_faints
+        return self._enemy_faints
+
+    def __repr__(self) -> str:
+        """(str): Return a string representation of this class."""
+        return (f'{self.__class__.__name__}({self._winner}, {self._turns}, '
+                f'{self._player_faints}, {self._enemy_faints})')
+
+
+class SimulationReport(object):
+    """Aggregated results over many simulated battles."""
+    def __init__(self, results: Iterable[BattleResult] = ()) -> None:
+        """Creates a SimulationReport from an optional set of results.
+
+        Parameters:
+            results(Iterable[BattleResult]): The results to aggregate.
+        """
+        self._runs = 0
+        self._wins = 0
+        self._losses = 0
+        self._total_turns = 0
+        self._total_faints = [0, 0]
+        for result in results:
+            self.add_result(result)
+
+    def add_result(self, result: BattleResult) -> None:
+        """Adds a single battle result to this report.
+
+        Parameters:
+            result(BattleResult): The result to add.
+        """
+        self._runs += 1
+        if result.get_winner() is True:
+            self._wins += 1
+        elif result.get_winner() is False:
+            self._losses += 1
+        self._total_turns += result.get_turns()
+        self._total_faints[0] += result.get_faints(True)
+        self._total_faints[1] += result.get_faints(False)
+
+    def get_runs(self) -> int:
+        """(int): Return the number of battles in this report."""
+        return self._runs
+
+    def get_wins(self) -> int:
+        """(int): Return the number of battles the player won."""
+        return self._wins
+
+    def get_losses(self) -> int:
+        """(int): Return the number of battles the enemy won."""
+        return self._losses
+
+    def get_draws(self) -> int:
+        """(int): Return the number of battles without a winner."""
+        return self._runs - self._wins - self._losses
+
+    def get_win_rate(self) -> float:
+        """(float): Return the fraction of battles the player won."""
+        return self._wins / self._runs if self._runs else 0.0
+
+    def get_mean_turns(self) -> float:
+        """(float): Return the mean number of turns per battle."""
+        return self._total_turns / self._runs if self._runs else 0.0
+
+    def get_mean_faints(self, is_player: bool) -> float:
+        """Return the mean number of pokemon fainted per battle for the supplied trainer.
+
+        Parameters:
+            is_player(bool): True if we want the player's faint count.
+
+        Returns:
+            (float): The mean number of fainted pokemon.
+        """
+        total = self._total_faints[0 if is_player else 1]
+        return total / self._runs if self._runs else 0.0
+
+    def __str__(self) -> str:
+        """(str): Return a human readable summary of this report."""
+        return (f'{self._runs} battles: win rate {self.get_win_rate():.3f} '
+                f'({self._wins}W/{self._losses}L/{self.get_draws()}D), '
+                f'{self.get_mean_turns():.1f} turns, '
+                f'{self.get_mean_faints(True):.2f}/{self.get_mean_faints(False):.2f} faints')
+
+
+def count_fainted(trainer: Trainer) -> int:
+    """Return the number of the trainer's pokemon which have fainted.
+
+    Parameters:
+        trainer(Trainer): The trainer to check.
+
+    Returns:
+        (int): The number of fainted pokemon.
+    """
+    return sum(1 for pokemon in trainer.get_all_pokemon() if pokemon.has_fainted())
+
+
+def play_battle(battle: Battle, player_strategy: Strategy, enemy_strategy: Strategy,
+                max_turns: int = DEFAULT_MAX_TURNS,
+                recorder: Optional[BattleRecorder] = None) -> BattleResult:
+    """Plays the supplied battle to completion and returns its result.
+
+    Each turn both strategies queue an action, player first, and the queued
+    actions are enacted until the battle is no longer ready. The battle is
+    recorded as a draw if it is still going after max_turns turns, or if a
+    strategy returns an action which is not valid.
+
+    Parameters:
+        battle(Battle): The battle to play. It is mutated in place.
+        player_strategy(Strategy): The strategy choosing the player's actions.
+        enemy_strategy(Strategy): The strategy choosing the enemy's actions.
+        max_turns(int): The maximum number of turns to play.
+        recorder(Optional[BattleRecorder]): If supplied, records the battle as it is played.
+
+    Returns:
+        (BattleResult): The outcome of the battle.
+    """
+    enact_turn = battle.enact_turn
+    if recorder is not None:
+        recorder.start(battle)
+        enact_turn = recorder.enact_turn
+    turns = 0
+    while not battle.is_over() and turns < max_turns:
+        for is_player, strategy in ((True, player_strategy), (False, enemy_strategy)):
+            battle.queue_action(strategy.get_next_action(battle, is_player), is_player)
+        if not battle.is_ready():
+            """A strategy chose an invalid action, so the battle cannot progress."""
+            break
+        while battle.is_ready():
+            enact_turn()
+        turns += 1
+    if recorder is not None:
+        recorder.finish()
+
+    player = battle.get_trainer(True)
+    enemy = battle.get_trainer(False)
+    winner = None
+    if player.all_pokemon_fainted():
+        winner = False
+    elif enemy.all_pokemon_fainted():
+        winner = True
+    return BattleResult(winner, turns, count_fainted(player), count_fainted(enemy))
+
+
+def simulate_battle(player: Trainer, enemy: Trainer, player_strategy: Strategy,
+                    enemy_strategy: Strategy, is_trainer_battle: bool = True,
+                    seed: Optional[int] = None,
+                    max_turns: int = DEFAULT_MAX_TURNS,
+                    rng: Optional[BattleRandom] = None) -> BattleResult:
+    """Plays a single battle between private copies of the supplied trainers.
+
+    The trainers are deep-copied, so the originals are left untouched and can
+    be reused as templates for further battles. The battle's rolls are drawn
+    from its own random stream, so battles played concurrently are reproducible. The battle
+    is headless, since no one reads the summaries of its actions.
+
+    Parameters:
+        player(Trainer): The template for the player trainer.
+        enemy(Trainer): The template for the enemy trainer.
+        player_strategy(Strategy): The strategy choosing the player's actions.
+        enemy_strategy(Strategy): The strategy choosing the enemy's actions.
+        is_trainer_battle(bool): True if the battle takes place between trainers.
+        seed(Optional[int]): If supplied, the random seed for this battle.
+        max_turns(int): The maximum number of turns to play.
+        rng(Optional[BattleRandom]): If supplied, the random stream for this battle,
+            used instead of seed.
+
+    Returns:
+        (BattleResult): The outcome of the battle.
+    """
+    if rng is None:
+        rng = BattleRandom(seed)
+    player, enemy = copy.deepcopy((player, enemy))
+    battle = Battle(player, enemy, is_trainer_battle, rng, headless=True)
+    return play_battle(battle, player_strategy, enemy_strategy, max_turns)
+
+
+# The matchup each worker process plays, set once per worker by _init_worker so
+# that the trainers are only pickled once per process rather than once per run.
+_worker_matchup = None
+
+
+def _init_worker(matchup: Tuple) -> None:
+    """Stores the matchup to be simulated by this worker process."""
+    global _worker_matchup
+    _worker_matchup = matchup
+
+
+def _run_worker_battle(run: int) -> BattleResult:
+    """Plays a single battle of the worker's matchup."""
+    player, enemy, player_strategy, enemy_strategy, is_trainer_battle, seed, max_turns = _worker_matchup
+    rng = None if seed is None else BattleRandom(seed, (run,))
+    return simulate_battle(player, enemy, player_strategy, enemy_strategy,
+                           is_trainer_battle, max_turns=max_turns, rng=rng)
+
+
+def run_simulations(player: Trainer, enemy: Trainer, player_strategy: Strategy,
+                    enemy_strategy: Strategy, runs: int, is_trainer_battle: bool = True,
+                    processes: Optional[int] = None, seed: Optional[int] = None,
+                    max_turns: int = DEFAULT_MAX_TURNS) -> SimulationReport:
+    """Plays many independent battles between copies of the supplied trainers.
+
+    Battles are spread across a process pool. Every run plays on its own deep
+    copy of the trainers, so no Pokemon state is shared between runs. When a
+    seed is supplied, run i draws its rolls from sub-stream i of the seed, so
+    results do not depend on how runs are scheduled across workers.
+
+    Parameters:
+        player(Trainer): The template for the player trainer.
+        enemy(Trainer): The template for the enemy trainer.
+        player_strategy(Strategy): The strategy choosing the player's actions.
+        enemy_strategy(Strategy): The strategy choosing the enemy's actions.
+        runs(int): The number of battles to play.
+        is_trainer_battle(bool): True if the battles take place between trainers.
+        processes(Optional[int]): The number of worker processes, defaulting to
+            the number of CPUs. With 1 process, battles are played in-process.
+        seed(Optional[int]): If supplied, the base random seed for the runs.
+        max_turns(int): The maximum number of turns to play per battle.
+
+    Returns:
+        (SimulationReport): The aggregated results of every run.
+    """
+    matchup = (player, enemy, player_strategy, enemy_strategy, is_trainer_battle, seed, max_turns)
+    if processes == 1:
+        _init_worker(matchup)
+        return SimulationReport(_run_worker_battle(run) for run in range(runs))
+    with Pool(processes, initializer=_init_worker, initargs=(matchup,)) as pool:
+        return SimulationReport(pool.imap_unordered(_run_worker_battle, range(runs),
+                                                    chunksize=SIMULATION_CHUNK_SIZE))
+
+
+if __name__ == "__main__":
+    import data
+    print(run_simulations(data.ash, data.brock, DefaultAIStrategy(), DefaultAIStrategy(),
+                          1000, seed=0))
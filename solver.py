@@ -0,0 +1,299 @@
+"""Exact win probabilities for one-on-one matchups.
+
+solve_matchup computes the exact probability that each pokemon wins a battle
+between them, and the expected number of turns, when both trainers follow
+fixed, deterministic strategies. Rather than restating the rules, each round
+is played by the engine itself from every reachable state, once for every
+combination of roll outcomes: a scripted random stream answers each
+did_succeed roll in turn and records its chance. The results are memoised on a
+compact key of the health, move uses, stat modifiers, level and experience of
+both pokemon, and the states are solved from an explicit worklist, so the
+length of a battle is not limited by the recursion limit.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from a2 import Battle, BattleRandom, DefaultAIStrategy, Pokemon, Strategy, Trainer
+
+
+class _BranchingRandom(BattleRandom):
+    """A random stream which answers rolls from a script of outcomes, recording the chance
+    of each roll so that every combination of outcomes can be enumerated."""
+    __slots__ = ('script', 'chances', 'position')
+
+    def __init__(self) -> None:
+        super().__init__(0)
+        self.script: List[bool] = []
+        self.chances: List[float] = []
+        self.position = 0
+
+    def did_succeed(self, chance: float) -> bool:
+        if chance <= 0 or chance >= 1:
+            """The outcome is certain, so there is nothing to branch on."""
+            return chance >= 1
+        position = self.position
+        self.position += 1
+        if position == len(self.script):
+            """A roll beyond the script succeeds first; failing is enumerated later."""
+            self.script.append(True)
+            self.chances.append(chance)
+        return self.script[position]
+
+    def get_probability(self) -> float:
+        """Returns the probability of the outcomes scripted so far."""
+        probability = 1.0
+        for outcome, chance in zip(self.script, self.chances):
+            probability *= chance if outcome else 1 - chance
+        return probability
+
+    def next_script(self) -> bool:
+        """Advances the script to the next untried combination of outcomes, returning
+        false once every combination has been tried."""
+        del self.script[self.position:], self.chances[self.position:]
+        while self.script and not self.script[-1]:
+            self.script.pop()
+            self.chances.pop()
+        if not self.script:
+            return False
+        self.script[-1] = False
+        self.position = 0
+        return True
+
+
+class MatchupSolution(object):
+    """The exact outcome probabilities of a one-on-one matchup."""
+    def __init__(self, win: float, loss: float, draw: float, expected_turns: float, states: int) -> None:
+        """Creates a MatchupSolution.
+
+        Parameters:
+            win(float): The probability that the player's pokemon wins.
+            loss(float): The probability that the enemy's pokemon wins.
+            draw(float): The probability that neither can make progress.
+            expected_turns(float): The expected number of turns played.
+            states(int): The number of distinct states solved.
+        """
+        self._win = win
+        self._loss = loss
+        self._draw = draw
+        self._expected_turns = expected_turns
+        self._states = states
+
+    def get_win_probability(self) -> float:
+        """(float): Return the probability that the player's pokemon wins."""
+        return self._win
+
+    def get_loss_probability(self) -> float:
+        """(float): Return the probability that the enemy's pokemon wins."""
+        return self._loss
+
+    def get_draw_probability(self) -> float:
+        """(float): Return the probability that the battle ends without a winner."""
+        return self._draw
+
+    def get_expected_turns(self) -> float:
+        """(float): Return the expected number of turns, where a turn is one action from each trainer."""
+        return self._expected_turns
+
+    def get_states(self) -> int:
+        """(int): Return the number of distinct states solved."""
+        return self._states
+
+    def __str__(self) -> str:
+        """(str): Return a human readable summary of this solution."""
+        return (f'win {self._win:.6f}, loss {self._loss:.6f}, draw {self._draw:.6f}, '
+                f'{self._expected_turns:.3f} turns over {self._states} states')
+
+
+class _MatchupSolver(object):
+    """Solves the states of one battle, memoising the value of each on a compact key."""
+    __slots__ = ('_battle', '_random', '_strategies', '_values', '_rosters', '_parts')
+
+    def __init__(self, battle: Battle, player_strategy: Strategy, enemy_strategy: Strategy) -> None:
+        self._battle = battle
+        self._random = _BranchingRandom()
+        battle.set_random(self._random)
+        battle.enable_journal()
+        self._strategies = (player_strategy, enemy_strategy)
+        # The (win, loss, draw, expected turns) of each state solved, by compact key.
+        self._values: Dict[Tuple, Tuple[float, float, float, float]] = {}
+        # The roster, current pokemon and base stats of each trainer. None of them can
+        # change before the battle is over, as a one-on-one battle ends when a pokemon faints.
+        self._rosters = []
+        for trainer_snapshot in battle.snapshot()[:2]:
+            all_pokemon, current, _, pokemon_snapshots = trainer_snapshot
+            self._rosters.append((all_pokemon, current, tuple(snapshot[3] for snapshot in pokemon_snapshots)))
+        # One copy of each trainer's part of a key, shared by every key it appears in.
+        self._parts: Dict[Tuple, Tuple] = {}
+
+    def encode(self) -> Tuple:
+        """Returns the compact key of the battle's state between rounds: the inventory of each
+        trainer, and the health, level, experience, move uses and stat modifiers of each pokemon."""
+        key = []
+        for is_player in (True, False):
+            trainer = self._battle.get_trainer(is_player)
+            pokemon_states = []
+            for pokemon in trainer.get_all_pokemon():
+                health, level, experience, _, move_uses, modifications, _ = pokemon.snapshot()
+                modifications = tuple((tuple(modifier), rounds) for modifier, rounds in modifications)
+                pokemon_states.append((health, level, experience, move_uses, modifications))
+            part = (tuple(trainer.get_inventory().items()), tuple(pokemon_states))
+            key.append(self._parts.setdefault(part, part))
+        return tuple(key)
+
+    def decode(self, key: Tuple) -> None:
+        """Restores the battle, in place, to the state between rounds with the supplied key."""
+        trainer_snapshots = []
+        for (all_pokemon, current, base_stats), (inventory, pokemon_states) in zip(self._rosters, key):
+            pokemon_snapshots = tuple((health, level, experience, stats, move_uses, modifications, None)
+                                      for stats, (health, level, experience, move_uses, modifications)
+                                      in zip(base_stats, pokemon_states))
+            trainer_snapshots.append((all_pokemon, current, inventory, pokemon_snapshots))
+        self._battle.restore((trainer_snapshots[0], trainer_snapshots[1], (), (), False))
+
+    def solve(self, root: Tuple) -> Tuple[float, float, float, float]:
+        """Returns the (win, loss, draw, expected turns) of the state with the supplied key.
+
+        The states are solved from an explicit worklist rather than by recursion, so
+        a battle of any number of rounds can be solved. A state is expanded when it
+        is first reached and valued once every state it can lead to has been.
+        """
+        values = self._values
+        # The terminal value, successors and chance of staying put of each state expanded but not yet valued.
+        expanded: Dict[Tuple, Tuple[Tuple[float, float, float], Dict[Tuple, float], float]] = {}
+        pending = [root]
+        while pending:
+            key = pending[-1]
+            if key in values:
+                """The state was reached again, and valued, after it was added to the worklist."""
+                pending.pop()
+                continue
+            expansion = expanded.get(key)
+            if expansion is None:
+                expansion = expanded[key] = self._expand(key)
+                for next_key in expansion[1]:
+                    if next_key in values:
+                        continue
+                    if next_key in expanded:
+                        """Every state expanded and not yet valued leads to the one being expanded."""
+                        raise ValueError('The battle can return to an earlier state, so it cannot be solved.')
+                    pending.append(next_key)
+                continue
+            pending.pop()
+            del expanded[key]
+            values[key] = self._value(*expansion)
+        return values[root]
+
+    def _expand(self, key: Tuple) -> Tuple[Tuple[float, float, float], Dict[Tuple, float], float]:
+        """Plays a round from the state with the supplied key once for every combination of
+        roll outcomes. Returns the chance of each terminal outcome, the chance of reaching each
+        other state by its key, and the chance that the round leaves the state unchanged."""
+        battle = self._battle
+        random = self._random
+        self.decode(key)
+        win = loss = draw = stay = 0.0
+        successors: Dict[Tuple, float] = {}
+        for is_player, strategy in zip((True, False), self._strategies):
+            battle.queue_action(strategy.get_next_action(battle, is_player), is_player)
+        if not battle.is_ready():
+            """A strategy chose an invalid action, so the battle cannot progress."""
+            stay = 1.0
+        else:
+            """The actions are chosen before any roll, so only the turns are played again for each script."""
+            random.script, random.chances, random.position = [], [], 0
+            while True:
+                turns = 0
+                while battle.is_ready():
+                    battle.enact_turn()
+                    turns += 1
+                probability = random.get_probability()
+                terminal_value = self._terminal_value()
+                if terminal_value is not None:
+                    win += probability * terminal_value[0]
+                    loss += probability * terminal_value[1]
+                    draw += probability * terminal_value[2]
+                else:
+                    next_key = self.encode()
+                    if next_key == key:
+                        stay += probability
+                    else:
+                        successors[next_key] = successors.get(next_key, 0.0) + probability
+                for _ in range(turns):
+                    battle.undo()
+                if not random.next_script():
+                    break
+        while battle.can_undo():
+            battle.undo()
+        return (win, loss, draw), successors, stay
+
+    def _value(self, terminal: Tuple[float, float, float], successors: Dict[Tuple, float],
+               stay: float) -> Tuple[float, float, float, float]:
+        """Returns the value of an expanded state, once each of its successors has been valued."""
+        if stay >= 1.0:
+            """Neither pokemon can make progress, so the battle is drawn here."""
+            return 0.0, 0.0, 1.0, 0.0
+        win, loss, draw = terminal
+        turns = 0.0
+        for next_key, probability in successors.items():
+            next_value = self._values[next_key]
+            win += probability * next_value[0]
+            loss += probability * next_value[1]
+            draw += probability * next_value[2]
+            turns += probability * next_value[3]
+        """Rounds which leave the state unchanged are repeated until one does not."""
+        scale = 1 / (1 - stay)
+        return win * scale, loss * scale, draw * scale, (1 + turns) * scale
+
+    def _terminal_value(self) -> Optional[Tuple[float, float, float, float]]:
+        """Returns the value of the battle's state if it is over, judged as play_battle does."""
+        if not self._battle.is_over():
+            return None
+        if self._battle.get_trainer(True).all_pokemon_fainted():
+            return 0.0, 1.0, 0.0, 0.0
+        if self._battle.get_trainer(False).all_pokemon_fainted():
+            return 1.0, 0.0, 0.0, 0.0
+        return 0.0, 0.0, 1.0, 0.0
+
+    def get_states(self) -> int:
+        """Returns the number of states solved."""
+        return len(self._values)
+
+
+def solve_matchup(pokemon: Pokemon, enemy_pokemon: Pokemon,
+                  player_strategy: Optional[Strategy] = None,
+                  enemy_strategy: Optional[Strategy] = None,
+                  is_trainer_battle: bool = True) -> MatchupSolution:
+    """Computes the exact outcome probabilities of a battle between two pokemon.
+
+    The pokemon are cloned, so the originals are untouched. Both strategies must
+    choose their action from the battle's state alone, so that the same state
+    always leads to the same actions. A battle in which a round can no longer
+    change the state, such as when both pokemon have run out of moves, counts as
+    a draw from that point.
+
+    Every reachable combination of both pokemon's health and move uses is a state,
+    so the number of states grows quickly with the number of hits each pokemon can
+    take. Each state takes roughly 150 microseconds and 300 bytes: a matchup of
+    level 20 pokemon from the starter species has about 10,000 states and is solved
+    in under 2 seconds, but at level 40 it has about 200,000 states and takes over
+    30 seconds. Matchups of more than a few hundred thousand states, such as those
+    between high level pokemon, are better estimated with run_simulations.
+
+    Parameters:
+        pokemon(Pokemon): The player's pokemon.
+        enemy_pokemon(Pokemon): The enemy's pokemon.
+        player_strategy(Optional[Strategy]): The player's strategy, by default DefaultAIStrategy.
+        enemy_strategy(Optional[Strategy]): The enemy's strategy, by default DefaultAIStrategy.
+        is_trainer_battle(bool): True if the battle takes place between trainers.
+
+    Returns:
+        (MatchupSolution): The probabilities of each outcome and the expected turns.
+    """
+    trainers = []
+    for name, each in (('Player', pokemon), ('Enemy', enemy_pokemon)):
+        trainer = Trainer(name)
+        trainer.add_pokemon(each.clone())
+        trainers.append(trainer)
+    battle = Battle(trainers[0], trainers[1], is_trainer_battle, headless=True)
+    solver = _MatchupSolver(battle, player_strategy or DefaultAIStrategy(),
+                            enemy_strategy or DefaultAIStrategy())
+    win, loss, draw, turns = solver.solve(solver.encode())
+    return MatchupSolution(win, loss, draw, turns, solver.get_states())
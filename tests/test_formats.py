@@ -0,0 +1,72 @@
+import unittest
+
+import data
+from a2 import BattleRandom, Food, Pokemon, PokemonStats, Trainer
+from formats import (ENEMY_SIDE, PLAYER_SIDE, choose_default_action, create_doubles_battle,
+                     create_raid_battle, play_multi_battle)
+
+
+def make_raiders(count: int, level: int):
+    """Returns trainers with one basic pokemon each."""
+    raiders = []
+    for index in range(count):
+        raider = Trainer(f'Raider{index}')
+        raider.add_pokemon(data.make_basic_pokemon(f'Raider{index}', 'water', data.DEFAULT_MOVES, level))
+        raiders.append(raider)
+    return raiders
+
+
+def make_boss(health: int) -> Trainer:
+    boss = Trainer('Boss')
+    boss.add_pokemon(Pokemon('Boss', PokemonStats((1, health, 100, 100)), 'fire', data.DEFAULT_MOVES, 10))
+    return boss
+
+
+class MultiBattleTest(unittest.TestCase):
+    def test_doubles_finish(self):
+        for seed in range(5):
+            battle = create_doubles_battle(data.ash.clone(), data.brock.clone(), BattleRandom(seed), headless=True)
+            self.assertEqual(len(battle.get_slots()), 4)
+            self.assertIn(play_multi_battle(battle), (PLAYER_SIDE, ENEMY_SIDE))
+            self.assertTrue(battle.is_over())
+
+    def test_raid_finishes(self):
+        battle = create_raid_battle(make_raiders(8, 10), make_boss(1000), BattleRandom(0), headless=True)
+        self.assertEqual(len(battle.get_slots()), 9)
+        self.assertEqual(play_multi_battle(battle), PLAYER_SIDE)
+        self.assertEqual(battle.get_standing_slots(ENEMY_SIDE), [])
+
+    def test_slot_with_nothing_to_do_passes(self):
+        """A raider out of moves, with no pokemon to switch in or items, no longer holds up the raid."""
+        raiders = make_raiders(4, 10)
+        tired = raiders[0].get_current_pokemon()
+        for move, uses in tired.get_move_info():
+            for _ in range(uses):
+                tired.reduce_move_count(move)
+        battle = create_raid_battle(raiders, make_boss(500), BattleRandom(0), headless=True)
+        self.assertFalse(battle.can_queue_action(0))
+        self.assertEqual(list(battle.legal_actions(0)), [])
+        self.assertEqual(play_multi_battle(battle), PLAYER_SIDE)
+
+    def test_food_is_used_up(self):
+        """Food is used up in a MultiBattle just as in a single Battle."""
+        player = data.ash.clone()
+        food = next(item for item in player.get_inventory() if isinstance(item, Food))
+        uses = player.get_inventory()[food]
+        battle = create_doubles_battle(player, data.brock.clone(), BattleRandom(0))
+        pokemon = battle.get_slot(1).get_pokemon()
+        pokemon.modify_health(-60)
+        battle.queue_action(food, 1)
+        for index in (0, 2, 3):
+            action, target = choose_default_action(battle, index)
+            battle.queue_action(action, index, target)
+        messages = []
+        while battle.is_ready():
+            summary = battle.enact_turn()
+            if summary is not None:
+                messages.extend(summary.get_messages())
+        self.assertIn(f'{pokemon.get_name()} ate {food.get_name()}.', messages)
+        self.assertEqual(player.get_inventory()[food], uses - 1)
+
+if __name__ == '__main__':
+    unittest.main()
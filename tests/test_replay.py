@@ -0,0 +1,83 @@
+import io
+import random
+import unittest
+from typing import List, Tuple
+
+import data
+from a2 import Battle, BattleRandom, Flee, Trainer
+from replay import BattleRecorder, ReplayIndex, read_replays
+
+
+def make_battle(seed: int) -> Battle:
+    """Returns a battle between copies of Ash and Brock, or every third seed Ash and a wild Rattata."""
+    player = data.ash.clone()
+    if seed % 3:
+        return Battle(player, data.brock.clone(), True, BattleRandom(seed), headless=True)
+    enemy = Trainer('Wild')
+    enemy.add_pokemon(data.rattata.clone())
+    return Battle(player, enemy, False, BattleRandom(seed), headless=True)
+
+
+def record_battles(stream: io.BytesIO, keyframe_interval, count: int) -> List[List[Tuple]]:
+    """Plays and records battles of random legal actions, returning each battle's state after every turn.
+
+    The last battle is cut off with an action still queued, so it ends with a pending record.
+    """
+    recorder = BattleRecorder(stream, keyframe_interval)
+    states = []
+    for seed in range(count):
+        battle = make_battle(seed)
+        choices = random.Random(seed)
+        recorder.start(battle)
+        keys = [battle.state_key()]
+        max_turns = 80 if seed < count - 1 else 7
+        while not battle.is_over() and len(keys) <= max_turns:
+            for is_player in (True, False):
+                if battle.can_queue_action(is_player):
+                    """Fleeing is only a last resort, so that battles run long enough to need keyframes."""
+                    actions = [action for action in battle.legal_actions(is_player) if not isinstance(action, Flee)]
+                    battle.queue_action(choices.choice(actions) if actions else Flee(), is_player)
+            if not battle.is_ready():
+                break
+            while battle.is_ready() and len(keys) <= max_turns:
+                recorder.enact_turn()
+                keys.append(battle.state_key())
+        recorder.finish()
+        states.append(keys)
+    recorder.close()
+    stream.seek(0)
+    return states
+
+
+class ReplayTest(unittest.TestCase):
+    def test_sequential_replay(self) -> None:
+        stream = io.BytesIO()
+        states = record_battles(stream, None, 6)
+        replays = 0
+        for replay, keys in zip(read_replays(stream), states):
+            self.assertEqual(replay.get_battle().state_key(), keys[0])
+            for turn, _ in enumerate(replay.turns(), 1):
+                self.assertEqual(replay.get_battle().state_key(), keys[turn])
+            self.assertTrue(replay.is_finished())
+            self.assertEqual(replay.get_turns(), len(keys) - 1)
+            replays += 1
+        self.assertEqual(replays, len(states))
+
+    def test_seek(self) -> None:
+        for interval in (4, 64, None):
+            stream = io.BytesIO()
+            states = record_battles(stream, interval, 6)
+            index = ReplayIndex(stream)
+            self.assertEqual(index.get_battle_count(), len(states))
+            for battle_index, keys in enumerate(states):
+                self.assertEqual(index.get_turns(battle_index), len(keys) - 1)
+                for turn, key in enumerate(keys):
+                    self.assertEqual(index.seek(battle_index, turn).get_battle().state_key(), key,
+                                     (interval, battle_index, turn))
+                """Carrying on from a seek reaches the same final state as direct play."""
+                replay = index.seek(battle_index, len(keys) // 2)
+                self.assertEqual(replay.replay().state_key(), keys[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
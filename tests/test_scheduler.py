@@ -0,0 +1,62 @@
+import unittest
+
+import data
+from a2 import ActionScheduler, Battle, BattleRandom, SwitchPokemon, EVENT_ACTION_APPLIED
+
+
+class FixedAction(object):
+    """A stand-in action with a fixed priority, as the scheduler only asks for priorities."""
+
+    def __init__(self, priority: int) -> None:
+        self._priority = priority
+
+    def get_priority(self) -> int:
+        return self._priority
+
+
+class ActionSchedulerTest(unittest.TestCase):
+    def test_lower_priority_first(self) -> None:
+        scheduler = ActionScheduler()
+        actions = [FixedAction(priority) for priority in (5, 1, 3, 0)]
+        for actor, action in enumerate(actions):
+            scheduler.push(action, actor)
+        order = [scheduler.pop()[1] for _ in actions]
+        self.assertEqual(order, [3, 1, 2, 0])
+        self.assertEqual(scheduler.get_acted_count(), 4)
+
+    def test_ties_in_queue_order(self) -> None:
+        scheduler = ActionScheduler()
+        for actor, priority in enumerate((2, 1, 2, 1, 2)):
+            scheduler.push(FixedAction(priority), actor)
+        self.assertEqual([actor for _, actor in scheduler.get_queued()], [1, 3, 0, 2, 4])
+        self.assertEqual([scheduler.pop()[1] for _ in range(5)], [1, 3, 0, 2, 4])
+
+    def test_restore_keeps_order(self) -> None:
+        scheduler = ActionScheduler()
+        for actor, priority in enumerate((1, 0, 1, 0)):
+            scheduler.push(FixedAction(priority), actor)
+        queued, acted = scheduler.snapshot()
+        restored = ActionScheduler()
+        restored.restore(queued, acted)
+        restored.push(FixedAction(0), 4)
+        self.assertEqual([restored.pop()[1] for _ in range(5)], [1, 3, 4, 0, 2])
+
+    def test_battle_order(self) -> None:
+        """A switch beats a move, and between equally fast moves the player, who queued first, goes first."""
+        fastest = lambda pokemon: min((move for move, _ in pokemon.get_move_info()), key=lambda move: move.get_priority())
+        for enemy_action, expected in ((lambda pokemon: SwitchPokemon(1), [False, True]), (fastest, [True, False])):
+            """Both sides are copies of Ash, so their leads are equally fast."""
+            player, enemy = data.ash.clone(), data.ash.clone()
+            battle = Battle(player, enemy, True, BattleRandom(0), headless=True)
+            order = []
+            battle.subscribe(lambda _, event: order.append(event.get_actor() in (player, player.get_current_pokemon())),
+                             kinds=[EVENT_ACTION_APPLIED])
+            battle.queue_action(fastest(player.get_current_pokemon()), True)
+            battle.queue_action(enemy_action(enemy.get_current_pokemon()), False)
+            while battle.is_ready():
+                battle.enact_turn()
+            self.assertEqual(order, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
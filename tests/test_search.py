@@ -0,0 +1,49 @@
+import time
+import unittest
+
+from a2 import Attack, Battle, Pokemon, PokemonStats, Trainer
+from search import MCTSStrategy
+
+# Attacks which do no damage and can be used once, so a battle soon stops changing.
+TAPS = [Attack('Tap', 'normal', 1, 100, 0, 1.0), Attack('Nudge', 'normal', 1, 100, 0, 1.0)]
+
+
+def make_stalled_battle(roster_size: int) -> Battle:
+    """Returns a trainer battle between pokemon which can never faint each other."""
+    trainers = []
+    for name in ('Player', 'Enemy'):
+        trainer = Trainer(name)
+        for index in range(roster_size):
+            trainer.add_pokemon(Pokemon(f'{name}{index}', PokemonStats((1, 100, 100, 100)), 'normal', TAPS, 1))
+        trainers.append(trainer)
+    return Battle(trainers[0], trainers[1], True, headless=True)
+
+
+class MCTSDeadlineTest(unittest.TestCase):
+    def assert_within_budget(self, battle: Battle) -> None:
+        strategy = MCTSStrategy(0.05, seed=0)
+        start = time.perf_counter()
+        action = strategy.get_next_action(battle, True)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertTrue(action.can_apply(battle, True))
+        self.assertGreater(strategy.get_last_iterations(), 0)
+
+    def test_rounds_which_leave_the_state_unchanged(self):
+        """Once both pokemon are out of moves, fleeing a trainer battle changes nothing."""
+        self.assert_within_budget(make_stalled_battle(1))
+
+    def test_rounds_which_cycle(self):
+        """Switching back and forth returns to earlier states."""
+        self.assert_within_budget(make_stalled_battle(2))
+
+    def test_max_depth(self):
+        battle = make_stalled_battle(2)
+        strategy = MCTSStrategy(10.0, max_iterations=200, seed=0, max_depth=3)
+        start = time.perf_counter()
+        strategy.get_next_action(battle, True)
+        self.assertLess(time.perf_counter() - start, 5.0)
+        self.assertEqual(strategy.get_last_iterations(), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import data
+from a2 import Battle, BattleRandom, DefaultAIStrategy
+
+
+def make_battle(seed: int) -> Battle:
+    return Battle(data.ash.clone(), data.brock.clone(), True, BattleRandom(seed), headless=True)
+
+
+def get_state(battle: Battle):
+    """Returns the state key along with the values it is built from, read through the public getters."""
+    trainers = []
+    for is_player in (True, False):
+        trainer = battle.get_trainer(is_player)
+        trainers.append((trainer.get_all_pokemon().index(trainer.get_current_pokemon()),
+                         list(trainer.get_inventory().items()),
+                         [(pokemon.get_health(), pokemon.get_level(), pokemon.get_experience(),
+                           pokemon.get_stats().snapshot(), pokemon.get_move_info(), pokemon.get_stat_modifiers())
+                          for pokemon in trainer.get_all_pokemon()]))
+    return battle.state_key(), trainers, battle.get_queued_actions()
+
+
+def play_round(battle: Battle) -> None:
+    strategy = DefaultAIStrategy()
+    for is_player in (True, False):
+        battle.queue_action(strategy.get_next_action(battle, is_player), is_player)
+    while battle.is_ready():
+        battle.enact_turn()
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_restore_round_trip(self):
+        """Restoring a snapshot taken at any point of a battle returns to that point."""
+        for seed in range(5):
+            battle = make_battle(seed)
+            snapshots = []
+            while not battle.is_over():
+                snapshots.append((battle.snapshot(), get_state(battle)))
+                play_round(battle)
+            for snapshot, state in reversed(snapshots):
+                battle.restore(snapshot)
+                self.assertEqual(get_state(battle), state)
+
+    def test_restore_with_queued_action(self):
+        battle = make_battle(0)
+        battle.queue_action(DefaultAIStrategy().get_next_action(battle, True), True)
+        snapshot, state = battle.snapshot(), get_state(battle)
+        battle.queue_action(DefaultAIStrategy().get_next_action(battle, False), False)
+        battle.enact_turn()
+        battle.restore(snapshot)
+        self.assertEqual(get_state(battle), state)
+        self.assertFalse(battle.is_ready())
+
+    def test_clone_is_independent(self):
+        battle = make_battle(0)
+        play_round(battle)
+        clone = battle.clone()
+        state = get_state(battle)
+        self.assertEqual(clone.state_key(), battle.state_key())
+        while not clone.is_over():
+            play_round(clone)
+        self.assertEqual(get_state(battle), state)
+
+
+if __name__ == '__main__':
+    unittest.main()
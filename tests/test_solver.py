@@ -0,0 +1,50 @@
+import unittest
+
+import data
+from a2 import Battle, BattleRandom, DefaultAIStrategy, Trainer
+from simulation import play_battle
+from solver import solve_matchup
+
+BATTLES = 3000
+
+
+def simulate_matchup(pokemon, enemy_pokemon, battles: int):
+    """Returns the fraction of battles won and lost and the mean turns of played one-on-one battles."""
+    wins = losses = turns = 0
+    for index in range(battles):
+        player, enemy = Trainer('Player'), Trainer('Enemy')
+        player.add_pokemon(pokemon.clone())
+        enemy.add_pokemon(enemy_pokemon.clone())
+        result = play_battle(Battle(player, enemy, True, BattleRandom(7, (index,)), headless=True),
+                             DefaultAIStrategy(), DefaultAIStrategy())
+        wins += result.get_winner() is True
+        losses += result.get_winner() is False
+        turns += result.get_turns()
+    return wins / battles, losses / battles, turns / battles
+
+
+class SolveMatchupTest(unittest.TestCase):
+    def test_agrees_with_simulation(self) -> None:
+        """Each simulated rate is within four standard errors of the solved probability."""
+        for pokemon, enemy_pokemon in ((data.ash.get_all_pokemon()[0], data.brock.get_all_pokemon()[1]),
+                                       (data.ash.get_all_pokemon()[3], data.brock.get_all_pokemon()[1])):
+            solution = solve_matchup(pokemon, enemy_pokemon)
+            self.assertAlmostEqual(solution.get_win_probability() + solution.get_loss_probability()
+                                   + solution.get_draw_probability(), 1.0)
+            win, loss, turns = simulate_matchup(pokemon, enemy_pokemon, BATTLES)
+            for solved, simulated in ((solution.get_win_probability(), win),
+                                      (solution.get_loss_probability(), loss)):
+                self.assertLess(abs(simulated - solved), 4 * (solved * (1 - solved) / BATTLES) ** 0.5 + 1e-9,
+                                (pokemon.get_name(), enemy_pokemon.get_name()))
+            self.assertAlmostEqual(turns, solution.get_expected_turns(), delta=0.05 * solution.get_expected_turns())
+
+    def test_pokemon_untouched(self) -> None:
+        pokemon, enemy_pokemon = data.ash.get_all_pokemon()[0], data.brock.get_all_pokemon()[1]
+        before = [(p.get_health(), p.get_experience(), list(p.get_move_info())) for p in (pokemon, enemy_pokemon)]
+        solve_matchup(pokemon, enemy_pokemon)
+        after = [(p.get_health(), p.get_experience(), list(p.get_move_info())) for p in (pokemon, enemy_pokemon)]
+        self.assertEqual(before, after)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from a2 import DefaultAIStrategy
+from search import MCTSStrategy
+from tournament import ash, brock, read_results, run_tournament
+
+
+def make_strategies():
+    """Returns a stateless strategy and a seeded, stateful one which searches a fixed amount."""
+    return [DefaultAIStrategy(), MCTSStrategy(time_budget=60.0, max_iterations=10, seed=0)]
+
+
+class TournamentTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def play(self, name: str, strategies=None):
+        path = os.path.join(self.directory, name)
+        run_tournament(strategies or make_strategies(), [ash, brock], 1, path, processes=1, seed=3)
+        return path
+
+    def test_resume_after_truncated_line(self):
+        """A line cut off by a crash is played again, and the resumed tournament matches one run without a crash."""
+        full = sorted(map(repr, read_results(self.play('full.jsonl'))))
+        self.assertEqual(len(full), 12)
+
+        path = os.path.join(self.directory, 'resumed.jsonl')
+        with open(self.play('crashed.jsonl')) as file:
+            lines = file.readlines()
+        with open(path, 'w') as file:
+            file.writelines(lines[:5])
+            file.write(lines[5][:len(lines[5]) // 2])
+        self.assertEqual(len(read_results(path)), 5)
+        self.play('resumed.jsonl')
+        self.assertEqual(sorted(map(repr, read_results(path))), full)
+
+    def test_strategies_are_copied_for_each_battle(self):
+        """A strategy which has already searched another battle still plays the same battles."""
+        strategies = make_strategies()
+        fresh = sorted(map(repr, read_results(self.play('fresh.jsonl', strategies))))
+        self.assertEqual(strategies[1].get_last_iterations(), 0)
+        self.assertEqual(sorted(map(repr, read_results(self.play('again.jsonl', strategies)))), fresh)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+import data
+from a2 import Battle, BattleRandom, Flee, Item, SwitchPokemon, Trainer
+
+
+def make_battle(is_trainer_battle: bool = True) -> Battle:
+    """Returns a journaled battle between copies of Ash and Brock, or Ash and a wild Rattata."""
+    player = data.ash.clone()
+    if is_trainer_battle:
+        enemy = data.brock.clone()
+    else:
+        """Ash's roster is full, so only his first pokemon comes along to make room for a catch."""
+        ash = player
+        player = Trainer('Ash')
+        player.add_pokemon(ash.get_all_pokemon()[0])
+        for item, uses in ash.get_inventory().items():
+            player.add_item(item, uses)
+        enemy = Trainer('Wild')
+        enemy.add_pokemon(data.rattata.clone())
+    battle = Battle(player, enemy, is_trainer_battle, BattleRandom(0), headless=True)
+    battle.enable_journal()
+    return battle
+
+
+def get_item(battle: Battle, name: str) -> Item:
+    """Returns the player's item with the supplied name, as inventories hold items by identity."""
+    for item in battle.get_trainer(True).get_inventory():
+        if item.get_name() == name:
+            return item
+    raise KeyError(name)
+
+
+def get_state(battle: Battle):
+    """Returns everything an undo must put back: the state key, inventories, health and queues."""
+    trainers = [battle.get_trainer(is_player) for is_player in (True, False)]
+    return (battle.state_key(),
+            [list(trainer.get_inventory().items()) for trainer in trainers],
+            [[pokemon.get_health() for pokemon in trainer.get_all_pokemon()] for trainer in trainers],
+            battle.get_queued_actions())
+
+
+class UndoTest(unittest.TestCase):
+    def assert_round_trip(self, battle: Battle, action):
+        """Plays a round with the player's action, checks undo returns to each earlier state
+        and returns the state the round led to."""
+        enemy_move = battle.get_trainer(False).get_current_pokemon().get_move_info()[0][0]
+        states = [get_state(battle)]
+        battle.queue_action(action, True)
+        states.append(get_state(battle))
+        battle.queue_action(enemy_move, False)
+        states.append(get_state(battle))
+        while battle.is_ready():
+            battle.enact_turn()
+            states.append(get_state(battle))
+        after = states[-1]
+        self.assertNotEqual(states[0], after)
+        while battle.can_undo():
+            states.pop()
+            battle.undo()
+            self.assertEqual(get_state(battle), states[-1])
+        self.assertEqual(len(states), 1)
+        return after
+
+    def test_attack(self):
+        battle = make_battle()
+        self.assert_round_trip(battle, data.moves['flamethrower'])
+
+    def test_buff(self):
+        battle = make_battle()
+        self.assert_round_trip(battle, data.moves['meditate'])
+
+    def test_switch(self):
+        battle = make_battle()
+        self.assert_round_trip(battle, SwitchPokemon(3))
+
+    def test_food(self):
+        battle = make_battle()
+        pokemon = battle.get_trainer(True).get_current_pokemon()
+        pokemon.modify_health(-50)
+        food = get_item(battle, 'Number12Chook')
+        _, inventories, healths, _ = self.assert_round_trip(battle, food)
+        self.assertIn((food, 2), inventories[0])
+        self.assertGreater(healths[0][0], pokemon.get_health())
+        self.assertEqual(battle.get_trainer(True).get_inventory()[food], 3)
+
+    def test_last_food(self):
+        """Using up an item removes it, and undo puts it back in its place."""
+        battle = make_battle()
+        trainer = battle.get_trainer(True)
+        food = get_item(battle, 'Whopper')
+        for _ in range(trainer.get_inventory()[food] - 1):
+            trainer.use_item(food)
+        order = list(trainer.get_inventory())
+        _, inventories, _, _ = self.assert_round_trip(battle, food)
+        self.assertNotIn(food, dict(inventories[0]))
+        self.assertEqual(list(trainer.get_inventory()), order)
+
+    def test_pokeball(self):
+        battle = make_battle(False)
+        state_key, inventories, _, _ = self.assert_round_trip(battle, get_item(battle, 'Master Ball'))
+        self.assertNotIn(get_item(battle, 'Master Ball'), dict(inventories[0]))
+        self.assertEqual(len(state_key[0][2]), len(battle.get_trainer(True).get_all_pokemon()) + 1)
+
+    def test_flee(self):
+        battle = make_battle(False)
+        self.assert_round_trip(battle, Flee())
+
+
+if __name__ == '__main__':
+    unittest.main()
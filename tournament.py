@@ -0,0 +1,364 @@
+"""Round-robin tournaments between strategies and rosters.
+
+Every entrant, a strategy paired with a roster, plays a number of battles
+against every other entrant in each seat. Battles are spread across a process
+pool and each result is appended to a JSON lines file as soon as it arrives,
+so a tournament which is interrupted can be resumed from the same file,
+skipping the battles already played.
+
+Run `python tournament.py results.jsonl` for a tournament between the
+strategies and trainers in data.py.
+"""
+import argparse
+import copy
+import hashlib
+import json
+import math
+import os
+from multiprocessing import Pool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from a2 import Battle, BattleRandom, DefaultAIStrategy, Strategy, Trainer
+from simulation import BattleResult, play_battle, DEFAULT_MAX_TURNS
+
+# Battles handed to a worker process at a time.
+TOURNAMENT_CHUNK_SIZE = 16
+
+# The z-score of the confidence intervals reported, for 95% confidence.
+CONFIDENCE_Z = 1.96
+
+# A function building a fresh trainer for each battle.
+RosterFactory = Callable[[], Trainer]
+
+# An entrant's name, strategy and roster factory.
+Entrant = Tuple[str, Strategy, RosterFactory]
+
+
+def wilson_interval(successes: int, trials: int, z: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    """Returns the Wilson score interval of a binomial proportion.
+
+    Parameters:
+        successes(int): The number of successes.
+        trials(int): The number of trials.
+        z(float): The z-score of the interval's confidence level.
+
+    Returns:
+        (Tuple[float, float]): The lower and upper bounds, or (0, 1) without trials.
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    proportion = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (proportion + z * z / (2 * trials)) / denominator
+    spread = z * math.sqrt(proportion * (1 - proportion) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+class TournamentReport(object):
+    """The pairwise results of a tournament between named entrants."""
+    def __init__(self, entrants: Sequence[str]) -> None:
+        """Creates an empty TournamentReport.
+
+        Parameters:
+            entrants(Sequence[str]): The names of the entrants, in the order they are reported.
+        """
+        self._entrants = list(entrants)
+        # Keyed by (entrant, opponent), the entrant's wins against the opponent and the
+        # battles between them, counting both seats.
+        self._wins: Dict[Tuple[str, str], int] = {}
+        self._games: Dict[Tuple[str, str], int] = {}
+
+    def add_result(self, player: str, enemy: str, result: BattleResult) -> None:
+        """Adds the result of a battle between two entrants.
+
+        Parameters:
+            player(str): The name of the entrant playing as the player.
+            enemy(str): The name of the entrant playing as the enemy.
+            result(BattleResult): The result of the battle.
+        """
+        for pair in ((player, enemy), (enemy, player)):
+            self._games[pair] = self._games.get(pair, 0) + 1
+        if result.get_winner() is not None:
+            pair = (player, enemy) if result.get_winner() else (enemy, player)
+            self._wins[pair] = self._wins.get(pair, 0) + 1
+
+    def get_entrants(self) -> List[str]:
+        """(List[str]): Return the names of the entrants."""
+        return list(self._entrants)
+
+    def get_games(self, entrant: str, opponent: str) -> int:
+        """Return the number of battles played between two entrants, in either seat.
+
+        Parameters:
+            entrant(str): The name of the first entrant.
+            opponent(str): The name of the second entrant.
+
+        Returns:
+            (int): The number of battles.
+        """
+        return self._games.get((entrant, opponent), 0)
+
+    def get_wins(self, entrant: str, opponent: str) -> int:
+        """Return the number of battles an entrant won against an opponent, in either seat.
+
+        Parameters:
+            entrant(str): The name of the winning entrant.
+            opponent(str): The name of the opponent.
+
+        Returns:
+            (int): The number of wins.
+        """
+        return self._wins.get((entrant, opponent), 0)
+
+    def get_win_rate(self, entrant: str, opponent: str) -> Optional[float]:
+        """Return the fraction of battles against an opponent that an entrant won.
+
+        Parameters:
+            entrant(str): The name of the entrant.
+            opponent(str): The name of the opponent.
+
+        Returns:
+            (Optional[float]): The win rate, or None if they have not played.
+        """
+        games = self.get_games(entrant, opponent)
+        return self.get_wins(entrant, opponent) / games if games else None
+
+    def get_confidence_interval(self, entrant: str, opponent: str) -> Tuple[float, float]:
+        """Return the 95% Wilson confidence interval of an entrant's win rate against an opponent.
+
+        Parameters:
+            entrant(str): The name of the entrant.
+            opponent(str): The name of the opponent.
+
+        Returns:
+            (Tuple[float, float]): The lower and upper bounds of the win rate.
+        """
+        return wilson_interval(self.get_wins(entrant, opponent), self.get_games(entrant, opponent))
+
+    def get_matrix(self) -> List[List[Optional[float]]]:
+        """Return the win-rate matrix, where row i, column j is entrant i's win rate against entrant j.
+
+        Returns:
+            (List[List[Optional[float]]]): The win rates, with None where entrants have not played.
+        """
+        return [[self.get_win_rate(entrant, opponent) for opponent in self._entrants]
+                for entrant in self._entrants]
+
+    def __str__(self) -> str:
+        """(str): Return the win-rate matrix, with confidence intervals, as a table."""
+        width = max([len(entrant) for entrant in self._entrants] + [17])
+        lines = [' ' * width + ''.join(f' {opponent[:width]:>{width}}' for opponent in self._entrants)]
+        for entrant in self._entrants:
+            cells = []
+            for opponent in self._entrants:
+                rate = self.get_win_rate(entrant, opponent)
+                if rate is None:
+                    cells.append(f' {"-":>{width}}')
+                else:
+                    low, high = self.get_confidence_interval(entrant, opponent)
+                    cells.append(f' {f"{rate:.2f} [{low:.2f},{high:.2f}]":>{width}}')
+            lines.append(f'{entrant:<{width}}' + ''.join(cells))
+        return '\n'.join(lines)
+
+
+def make_entrants(strategies: Sequence[Strategy], rosters: Sequence[RosterFactory]) -> List[Entrant]:
+    """Pairs every strategy with every roster, naming each entrant 'strategy/roster'.
+
+    Strategies are named by their class and rosters by their factory's name, with an
+    index appended where names would otherwise repeat.
+
+    Parameters:
+        strategies(Sequence[Strategy]): The strategies.
+        rosters(Sequence[RosterFactory]): Functions building a fresh trainer for each battle.
+
+    Returns:
+        (List[Entrant]): The entrants.
+    """
+    strategy_names = _unique_names([strategy.__class__.__name__ for strategy in strategies])
+    roster_names = _unique_names([getattr(roster, '__name__', 'roster') for roster in rosters])
+    return [(f'{strategy_name}/{roster_name}', strategy, roster)
+            for strategy_name, strategy in zip(strategy_names, strategies)
+            for roster_name, roster in zip(roster_names, rosters)]
+
+
+def _unique_names(names: List[str]) -> List[str]:
+    """Appends an index to each name which appears more than once."""
+    return [f'{name}#{names[:index].count(name)}' if names.count(name) > 1 else name
+            for index, name in enumerate(names)]
+
+
+def get_battle_random(player: str, enemy: str, game: int, seed: int) -> BattleRandom:
+    """Returns the random stream of a tournament battle.
+
+    The stream depends only on the seed, the entrants' names and the game number,
+    so a resumed tournament plays the same battles whatever else has changed.
+
+    Parameters:
+        player(str): The name of the entrant playing as the player.
+        enemy(str): The name of the entrant playing as the enemy.
+        game(int): The number of the battle between them in these seats.
+        seed(int): The tournament's seed.
+
+    Returns:
+        (BattleRandom): The battle's random stream.
+    """
+    pairing = hashlib.sha256(f'{player}\0{enemy}'.encode()).digest()
+    return BattleRandom(seed, (int.from_bytes(pairing[:4], 'little'), game))
+
+
+def read_results(path: str) -> List[Tuple[str, str, int, BattleResult]]:
+    """Reads the results already written to a tournament results file.
+
+    A line cut off by a crash is ignored, and its battle is played again on resuming.
+
+    Parameters:
+        path(str): The path to the results file, which need not exist.
+
+    Returns:
+        (List[Tuple[str, str, int, BattleResult]]): The player, enemy, game number and
+            result of each battle.
+    """
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results.append((record['player'], record['enemy'], record['game'],
+                            BattleResult(record['winner'], record['turns'],
+                                         record['player_faints'], record['enemy_faints'])))
+    return results
+
+
+def _truncate_partial_line(path: str) -> None:
+    """Removes a final line left incomplete by a crash, so that appended results start on a new line."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as file:
+        data = file.read()
+        if data and not data.endswith(b'\n'):
+            file.truncate(data.rfind(b'\n') + 1)
+
+
+# The entrants and settings played by each worker process, set by _init_worker.
+_worker_tournament = None
+
+
+def _init_worker(tournament: Tuple) -> None:
+    """Stores the tournament to be played by this worker process."""
+    global _worker_tournament
+    _worker_tournament = tournament
+
+
+def _play_worker_battle(task: Tuple[int, int, int]) -> Tuple[int, int, int, BattleResult]:
+    """Plays a single battle of the worker's tournament."""
+    entrants, is_trainer_battle, seed, max_turns = _worker_tournament
+    player_index, enemy_index, game = task
+    player_name, player_strategy, player_roster = entrants[player_index]
+    enemy_name, enemy_strategy, enemy_roster = entrants[enemy_index]
+    battle_random = get_battle_random(player_name, enemy_name, game, seed)
+    strategies = []
+    for strategy, strategy_random in zip((player_strategy, enemy_strategy), battle_random.spawn(2)):
+        """Each seat plays with a fresh copy of its strategy, seeded from the battle, so that
+        a stateful strategy plays the same way however the battles are scheduled."""
+        strategy = copy.deepcopy(strategy)
+        strategy.reseed(strategy_random)
+        strategies.append(strategy)
+    battle = Battle(player_roster(), enemy_roster(), is_trainer_battle, battle_random, headless=True)
+    return player_index, enemy_index, game, play_battle(battle, strategies[0], strategies[1], max_turns)
+
+
+def run_tournament(strategies: Sequence[Strategy], rosters: Sequence[RosterFactory],
+                   games: int, results_path: str, is_trainer_battle: bool = True,
+                   processes: Optional[int] = None, seed: int = 0,
+                   max_turns: int = DEFAULT_MAX_TURNS) -> TournamentReport:
+    """Plays a round-robin tournament between every pairing of strategy and roster.
+
+    Each entrant plays games battles as the player against every other entrant
+    as the enemy, so every pair of entrants meets 2 * games times. Results are
+    appended to results_path as they arrive. If the file already holds results
+    of this tournament, those battles are not played again.
+
+    Parameters:
+        strategies(Sequence[Strategy]): The strategies. Each must be picklable and
+            deep-copyable: every battle is played by fresh copies of them, one per
+            seat, reseeded from the battle's random stream.
+        rosters(Sequence[RosterFactory]): Functions building a fresh trainer for each battle.
+        games(int): The number of battles per pairing and seating.
+        results_path(str): The JSON lines file results are streamed to.
+        is_trainer_battle(bool): True if the battles take place between trainers.
+        processes(Optional[int]): The number of worker processes, defaulting to
+            the number of CPUs. With 1 process, battles are played in-process.
+        seed(int): The tournament's seed.
+        max_turns(int): The maximum number of turns to play per battle.
+
+    Returns:
+        (TournamentReport): The results of every battle, including resumed ones.
+    """
+    entrants = make_entrants(strategies, rosters)
+    names = [name for name, _, _ in entrants]
+    report = TournamentReport(names)
+    played = set()
+    for player, enemy, game, result in read_results(results_path):
+        if player in names and enemy in names and game < games and (player, enemy, game) not in played:
+            played.add((player, enemy, game))
+            report.add_result(player, enemy, result)
+
+    tasks = [(player, enemy, game)
+             for player in range(len(entrants)) for enemy in range(len(entrants)) if player != enemy
+             for game in range(games) if (names[player], names[enemy], game) not in played]
+    tournament = (entrants, is_trainer_battle, seed, max_turns)
+    _truncate_partial_line(results_path)
+    with open(results_path, 'a') as file:
+        if processes == 1:
+            _init_worker(tournament)
+            _write_results(file, report, names, map(_play_worker_battle, tasks))
+        else:
+            with Pool(processes, initializer=_init_worker, initargs=(tournament,)) as pool:
+                _write_results(file, report, names, pool.imap_unordered(_play_worker_battle, tasks,
+                                                                        chunksize=TOURNAMENT_CHUNK_SIZE))
+    return report
+
+
+def _write_results(file, report: TournamentReport, names: List[str], results) -> None:
+    """Appends each result to the results file as it arrives, and adds it to the report."""
+    for player, enemy, game, result in results:
+        file.write(json.dumps({'player': names[player], 'enemy': names[enemy], 'game': game,
+                               'winner': result.get_winner(), 'turns': result.get_turns(),
+                               'player_faints': result.get_faints(True),
+                               'enemy_faints': result.get_faints(False)}) + '\n')
+        file.flush()
+        report.add_result(names[player], names[enemy], result)
+
+
+def ash() -> Trainer:
+    """Builds a copy of Ash from data.py."""
+    import data
+    return copy.deepcopy(data.ash)
+
+
+def brock() -> Trainer:
+    """Builds a copy of Brock from data.py."""
+    import data
+    return copy.deepcopy(data.brock)
+
+
+def main() -> None:
+    from search import MCTSStrategy
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('results', help='the JSON lines file to stream results to and resume from')
+    parser.add_argument('--games', type=int, default=20, help='battles per pairing and seating')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='the tournament seed')
+    args = parser.parse_args()
+
+    strategies = [DefaultAIStrategy(), MCTSStrategy(time_budget=0.005)]
+    print(run_tournament(strategies, [ash, brock], args.games, args.results,
+                         processes=args.processes, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
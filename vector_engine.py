@@ -0,0 +1,437 @@
+"""Vectorized struct-of-arrays battle engine.
+
+Stores the state of a whole batch of battles in NumPy arrays, indexed by
+(battle, side, roster slot[, move slot]), and resolves one turn of every battle
+at once with array operations instead of walking the Trainer -> Pokemon ->
+PokemonStats object graph.
+
+Both trainers in every battle follow the DefaultAIStrategy policy, and the rules
+mirror the reference engine in a2.py: actions are performed in priority order,
+with the player first on ties, damage follows
+Attack.calculate_damage, experience and levels follow Pokemon.gain_experience,
+and stat modifiers are applied in order and expire at the end of each round.
+Battles are imported from and exported to regular Trainer objects, so results
+can be checked against the reference engine.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from a2 import *
+from simulation import BattleResult, SimulationReport
+
+# The number of stat modifiers a single pokemon can have in effect at once.
+DEFAULT_MAX_MODIFIERS = 8
+
+# Kinds of move supported by the engine.
+MOVE_KIND_ATTACK = 0
+MOVE_KIND_BUFF = 1
+MOVE_KIND_DEBUFF = 2
+
+# Kinds of action chosen by the DefaultAIStrategy policy.
+ACTION_SWITCH = 0
+ACTION_MOVE = 1
+ACTION_FLEE = 2
+
+PLAYER_SIDE = 0
+ENEMY_SIDE = 1
+
+
+class VectorBattleEngine(object):
+    """A batch of battles whose state is stored in NumPy arrays."""
+    def __init__(self, battles: List[Tuple[Trainer, Trainer]], is_trainer_battle: bool = True,
+                 max_modifiers: int = DEFAULT_MAX_MODIFIERS,
+                 rng: Optional[np.random.Generator] = None) -> None:
+        """Imports a batch of battles from pairs of trainers.
+
+        The supplied trainers are not modified; their state is copied into the
+        engine's arrays.
+
+        Parameters:
+            battles(List[Tuple[Trainer, Trainer]]): The (player, enemy) pair for each battle.
+            is_trainer_battle(bool): True if the battles take place between trainers.
+            max_modifiers(int): The number of stat modifiers a pokemon can have at once.
+            rng(Optional[np.random.Generator]): The generator used to roll hits.
+        """
+        self._is_trainer_battle = is_trainer_battle
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self._battles = battles
+        self._max_modifiers = max_modifiers
+
+        count = len(battles)
+        shape = (count, 2, MAXIMUM_POKEMON_ROSTER)
+        self._present = np.zeros(shape, dtype=bool)
+        self._health = np.zeros(shape, dtype=np.int64)
+        self._hit_chance = np.zeros(shape, dtype=np.float64)
+        self._max_health = np.zeros(shape, dtype=np.int64)
+        self._attack = np.zeros(shape, dtype=np.int64)
+        self._defense = np.zeros(shape, dtype=np.int64)
+        self._level = np.zeros(shape, dtype=np.int64)
+        self._experience = np.zeros(shape, dtype=np.int64)
+        self._element = np.zeros(shape, dtype=np.int64)
+        self._move = np.full(shape + (MAXIMUM_MOVE_SLOTS,), -1, dtype=np.int64)
+        self._pp = np.zeros(shape + (MAXIMUM_MOVE_SLOTS,), dtype=np.int64)
+        self._modifier = np.zeros(shape + (max_modifiers, 4), dtype=np.float64)
+        self._modifier_rounds = np.zeros(shape + (max_modifiers,), dtype=np.int64)
+        self._modifier_count = np.zeros(shape, dtype=np.int64)
+        self._current = np.zeros((count, 2), dtype=np.int64)
+        self._ended_early = np.zeros(count, dtype=bool)
+        self._turns = np.zeros(count, dtype=np.int64)
+
+        self._move_ids: Dict[Move, int] = {}
+        self._moves: List[Move] = []
+        for index, trainers in enumerate(battles):
+            for side, trainer in enumerate(trainers):
+                self._import_trainer(index, side, trainer)
+        self._build_move_table()
+        self._effectiveness = ElementType.get_effectiveness_matrix()
+
+    def _get_move_id(self, move: Move) -> int:
+        """Returns the dense id of the supplied move, assigning one if needed."""
+        if move not in self._move_ids:
+            if not isinstance(move, (Attack, Buff, Debuff)):
+                raise ValueError(f'{move!r} is not supported by the vector engine.')
+            self._move_ids[move] = len(self._moves)
+            self._moves.append(move)
+        return self._move_ids[move]
+
+    def _import_trainer(self, index: int, side: int, trainer: Trainer) -> None:
+        """Copies the state of a trainer's pokemon into the engine's arrays."""
+        all_pokemon = trainer.get_all_pokemon()
+        for slot, pokemon in enumerate(all_pokemon):
+            stats = pokemon.get_base_stats()
+            at = (index, side, slot)
+            self._present[at] = True
+            self._health[at] = pokemon.get_health()
+            self._hit_chance[at] = stats.get_hit_chance()
+            self._max_health[at] = stats.get_max_health()
+            self._attack[at] = stats.get_attack()
+            self._defense[at] = stats.get_defense()
+            self._level[at] = pokemon.get_level()
+            self._experience[at] = pokemon.get_experience()
+            self._element[at] = pokemon.get_element_type_id()
+            # Move slots follow get_move_info's name order, which is the order
+            # DefaultAIStrategy considers moves in.
+            for move_slot, (move, uses) in enumerate(pokemon.get_move_info()):
+                self._move[at + (move_slot,)] = self._get_move_id(move)
+                self._pp[at + (move_slot,)] = uses
+            modifiers = pokemon.get_stat_modifiers()
+            if len(modifiers) > self._max_modifiers:
+                raise ValueError(f'{pokemon} has more than {self._max_modifiers} stat modifiers.')
+            for modifier_slot, (modifier, rounds) in enumerate(modifiers):
+                self._modifier[at + (modifier_slot,)] = modifier
+                self._modifier_rounds[at + (modifier_slot,)] = rounds
+            self._modifier_count[at] = len(modifiers)
+        if len(all_pokemon) != 0:
+            current = trainer.get_current_pokemon()
+            self._current[index, side] = next(slot for slot, pokemon in enumerate(all_pokemon)
+                                              if pokemon is current)
+
+    def _build_move_table(self) -> None:
+        """Builds the per-move lookup arrays, indexed by move id."""
+        count = len(self._moves)
+        self._move_kind = np.zeros(count, dtype=np.int64)
+        self._move_element = np.zeros(count, dtype=np.int64)
+        self._move_damage = np.zeros(count, dtype=np.float64)
+        self._move_hit_chance = np.zeros(count, dtype=np.float64)
+        self._move_modifier = np.zeros((count, 4), dtype=np.float64)
+        self._move_rounds = np.zeros(count, dtype=np.int64)
+        self._move_priority = np.zeros(count, dtype=np.int64)
+        for move_id, move in enumerate(self._moves):
+            self._move_element[move_id] = move.get_element_type_id()
+            self._move_priority[move_id] = move.get_priority()
+            if isinstance(move, Attack):
+                self._move_kind[move_id] = MOVE_KIND_ATTACK
+                self._move_damage[move_id] = move.get_base_damage()
+                self._move_hit_chance[move_id] = move.get_hit_chance()
+            else:
+                self._move_kind[move_id] = MOVE_KIND_BUFF if isinstance(move, Buff) else MOVE_KIND_DEBUFF
+                self._move_modifier[move_id] = move.get_modification()
+                self._move_rounds[move_id] = move.get_rounds()
+
+    def get_battle_count(self) -> int:
+        """(int): Return the number of battles in this batch."""
+        return len(self._battles)
+
+    def _effective_stats(self, battles: np.ndarray, side: int,
+                         slots: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Returns the hit chance, max health, attack and defense of the indexed
+        pokemon after applying their stat modifiers in order, as in Pokemon.get_stats."""
+        stats = np.stack([self._hit_chance[battles, side, slots],
+                          self._max_health[battles, side, slots],
+                          self._attack[battles, side, slots],
+                          self._defense[battles, side, slots]], axis=-1).astype(np.float64)
+        counts = self._modifier_count[battles, side, slots]
+        if counts.size != 0:
+            modifiers = self._modifier[battles, side, slots]
+            for modifier_slot in range(counts.max()):
+                in_use = (counts > modifier_slot)[:, None]
+                modified = np.maximum(stats + modifiers[:, modifier_slot], 0)
+                stats = np.where(in_use, modified, stats)
+        return (stats[:, STAT_HIT_CHANCE], stats[:, STAT_MAX_HEALTH].astype(np.int64),
+                stats[:, STAT_ATTACK], stats[:, STAT_DEFENSE])
+
+    def _alive(self, battles: np.ndarray, side: int) -> np.ndarray:
+        """Returns a (battles, roster) mask of the side's pokemon which have not fainted."""
+        return self._present[battles, side] & (self._health[battles, side] > 0)
+
+    def _is_over(self, battles: np.ndarray) -> np.ndarray:
+        """Returns a mask of the supplied battles which are over."""
+        return (self._ended_early[battles]
+                | ~self._alive(battles, PLAYER_SIDE).any(axis=1)
+                | ~self._alive(battles, ENEMY_SIDE).any(axis=1))
+
+    def get_over(self) -> np.ndarray:
+        """Return a mask of the battles in this batch which are over.
+
+        Returns:
+            (np.ndarray): True for every battle which is over.
+        """
+        return self._is_over(np.arange(self.get_battle_count()))
+
+    def _choose_actions(self, battles: np.ndarray, side: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Chooses each battle's next action for the side, following DefaultAIStrategy.
+
+        Returns the kind of each action, and its argument: the roster slot to
+        switch to, or the move slot to use.
+        """
+        current = self._current[battles, side]
+        fainted = self._health[battles, side, current] <= 0
+        switch_to = self._alive(battles, side).argmax(axis=1)
+        usable = (self._move[battles, side, current] >= 0) & (self._pp[battles, side, current] > 0)
+        move_slot = usable.argmax(axis=1)
+        kind = np.where(fainted, ACTION_SWITCH,
+                        np.where(usable.any(axis=1), ACTION_MOVE, ACTION_FLEE))
+        return kind, np.where(fainted, switch_to, move_slot)
+
+    def _action_priority(self, battles: np.ndarray, side: int, kind: np.ndarray,
+                         argument: np.ndarray) -> np.ndarray:
+        """Returns the priority of each battle's chosen action for the side, as in Action.get_priority."""
+        current = self._current[battles, side]
+        moving = kind == ACTION_MOVE
+        moves = self._move[battles, side, current, np.where(moving, argument, 0)]
+        return np.where(moving, self._move_priority[moves], DEFAULT_ACTION_PRIORITY)
+
+    def _apply_actions(self, battles: np.ndarray, side: int, kind: np.ndarray,
+                       argument: np.ndarray) -> None:
+        """Applies one action of the side in each of the supplied battles."""
+        switching = kind == ACTION_SWITCH
+        self._current[battles[switching], side] = argument[switching]
+        if not self._is_trainer_battle:
+            self._ended_early[battles[kind == ACTION_FLEE]] = True
+
+        moving = kind == ACTION_MOVE
+        battles, move_slots = battles[moving], argument[moving]
+        current = self._current[battles, side]
+        moves = self._move[battles, side, current, move_slots]
+        self._pp[battles, side, current, move_slots] -= 1
+        move_kind = self._move_kind[moves]
+
+        attacking = move_kind == MOVE_KIND_ATTACK
+        self._apply_attacks(battles[attacking], side, current[attacking], moves[attacking])
+        buffing = move_kind == MOVE_KIND_BUFF
+        self._add_modifiers(battles[buffing], side, current[buffing], moves[buffing])
+        debuffing = move_kind == MOVE_KIND_DEBUFF
+        targets = self._current[battles[debuffing], 1 - side]
+        self._add_modifiers(battles[debuffing], 1 - side, targets, moves[debuffing])
+
+    def _apply_attacks(self, battles: np.ndarray, side: int, current: np.ndarray,
+                       moves: np.ndarray) -> None:
+        """Applies an attack by the side's current pokemon in each supplied battle,
+        as in Attack.apply."""
+        if battles.size == 0:
+            return
+        hit_chance, _, attack, _ = self._effective_stats(battles, side, current)
+        hit = self._rng.random(battles.size) < self._move_hit_chance[moves] * hit_chance
+        battles, current, moves, attack = battles[hit], current[hit], moves[hit], attack[hit]
+
+        other = 1 - side
+        targets = self._current[battles, other]
+        _, max_health, _, defense = self._effective_stats(battles, other, targets)
+        effectiveness = self._effectiveness[self._move_element[moves],
+                                            self._element[battles, other, targets]]
+        damage = np.trunc(self._move_damage[moves] * effectiveness * attack / (defense + 1))
+        health = self._health[battles, other, targets] - damage.astype(np.int64)
+        health = np.where(health >= max_health, max_health, np.maximum(health, 0))
+        self._health[battles, other, targets] = health
+
+        fainted = health <= 0
+        experience = np.trunc(200 * self._level[battles[fainted], other, targets[fainted]] / 7)
+        self._gain_experience(battles[fainted], side, current[fainted],
+                              experience.astype(np.int64))
+
+    def _gain_experience(self, battles: np.ndarray, side: int, slots: np.ndarray,
+                         experience: np.ndarray) -> None:
+        """Adds experience to the indexed pokemon, levelling them up as in
+        Pokemon.gain_experience."""
+        if battles.size == 0:
+            return
+        self._experience[battles, side, slots] += experience
+        # Faints are rare, so the levels and stats are looked up one pokemon at a
+        # time in the same tables as the reference engine.
+        new_level = np.array([level_for_experience(total) for total
+                              in self._experience[battles, side, slots].tolist()], dtype=np.int64)
+        levels = new_level - self._level[battles, side, slots]
+        growing = levels > 0
+        if not growing.any():
+            return
+        at = (battles[growing], side, slots[growing])
+        gained = levels[growing]
+        old_max_health = self._max_health[at]
+        self._hit_chance[at] = 1
+        for stat in (self._max_health, self._attack, self._defense):
+            stat[at] = [grow_stat(value, count) for value, count in zip(stat[at].tolist(), gained.tolist())]
+        self._level[at] += gained
+        self._health[at] += self._max_health[at] - old_max_health
+
+    def _add_modifiers(self, battles: np.ndarray, side: int, slots: np.ndarray,
+                       moves: np.ndarray) -> None:
+        """Adds each move's stat modifier to the indexed pokemon, as in
+        Pokemon.add_stat_modifier."""
+        if battles.size == 0:
+            return
+        modifier_slots = self._modifier_count[battles, side, slots]
+        if (modifier_slots >= self._max_modifiers).any():
+            raise ValueError(f'A pokemon has more than {self._max_modifiers} stat modifiers.')
+        self._modifier[battles, side, slots, modifier_slots] = self._move_modifier[moves]
+        self._modifier_rounds[battles, side, slots, modifier_slots] = self._move_rounds[moves]
+        self._modifier_count[battles, side, slots] += 1
+        self._clamp_health(battles, side, slots)
+
+    def _clamp_health(self, battles: np.ndarray, side: int, slots: np.ndarray) -> None:
+        """Lowers the health of the indexed pokemon to their modified max health."""
+        _, max_health, _, _ = self._effective_stats(battles, side, slots)
+        health = self._health[battles, side, slots]
+        self._health[battles, side, slots] = np.minimum(health, max_health)
+
+    def _end_round(self, battles: np.ndarray) -> None:
+        """Expires stat modifiers of both current pokemon, as in Battle.end_round."""
+        in_use_slots = np.arange(self._max_modifiers)
+        for side in (PLAYER_SIDE, ENEMY_SIDE):
+            slots = self._current[battles, side]
+            at = (battles, side, slots)
+            rounds = self._modifier_rounds[at] - 1
+            keep = (in_use_slots < self._modifier_count[at][:, None]) & (rounds > 0)
+            # Stable compaction keeps the remaining modifiers in the order they were added.
+            order = np.argsort(~keep, axis=1, kind='stable')
+            self._modifier_rounds[at] = np.take_along_axis(rounds, order, axis=1)
+            self._modifier[at] = np.take_along_axis(self._modifier[at], order[:, :, None], axis=1)
+            self._modifier_count[at] = keep.sum(axis=1)
+            self._clamp_health(battles, side, slots)
+
+    def step(self) -> int:
+        """Plays one turn of every battle which is not over.
+
+        Both trainers choose their action from the state at the start of the
+        turn. The action with the lower priority is performed first, the
+        player's on a tie, and the other only if the first did not end the battle.
+
+        Returns:
+            (int): The number of battles which played a turn.
+        """
+        battles = np.flatnonzero(~self.get_over())
+        if battles.size == 0:
+            return 0
+        actions = [self._choose_actions(battles, side) for side in (PLAYER_SIDE, ENEMY_SIDE)]
+        player_first = (self._action_priority(battles, PLAYER_SIDE, *actions[PLAYER_SIDE])
+                        <= self._action_priority(battles, ENEMY_SIDE, *actions[ENEMY_SIDE]))
+        for side in (PLAYER_SIDE, ENEMY_SIDE):
+            first = player_first == (side == PLAYER_SIDE)
+            kind, argument = actions[side]
+            self._apply_actions(battles[first], side, kind[first], argument[first])
+        continuing = ~self._is_over(battles)
+        for side in (PLAYER_SIDE, ENEMY_SIDE):
+            second = continuing & (player_first != (side == PLAYER_SIDE))
+            kind, argument = actions[side]
+            self._apply_actions(battles[second], side, kind[second], argument[second])
+        self._end_round(battles[continuing])
+        self._turns[battles] += 1
+        return battles.size
+
+    def run(self, max_turns: int = 1000) -> None:
+        """Plays every battle until it is over, or until max_turns turns have been played.
+
+        Parameters:
+            max_turns(int): The maximum number of turns to play.
+        """
+        for _ in range(max_turns):
+            if self.step() == 0:
+                break
+
+    def get_results(self) -> List[BattleResult]:
+        """Return the result of every battle in this batch.
+
+        Returns:
+            (List[BattleResult]): The result of each battle, in import order.
+        """
+        battles = np.arange(self.get_battle_count())
+        player_alive = self._alive(battles, PLAYER_SIDE).any(axis=1)
+        enemy_alive = self._alive(battles, ENEMY_SIDE).any(axis=1)
+        faints = (self._present & (self._health <= 0)).sum(axis=2)
+        results = []
+        for index in battles.tolist():
+            winner = None
+            if not player_alive[index]:
+                winner = False
+            elif not enemy_alive[index]:
+                winner = True
+            results.append(BattleResult(winner, int(self._turns[index]),
+                                        int(faints[index, PLAYER_SIDE]),
+                                        int(faints[index, ENEMY_SIDE])))
+        return results
+
+    def get_report(self) -> SimulationReport:
+        """(SimulationReport): Return the aggregated results of this batch."""
+        return SimulationReport(self.get_results())
+
+    def _export_pokemon(self, index: int, side: int, slot: int, source: Pokemon) -> Pokemon:
+        """Builds a Pokemon holding the state of the indexed roster slot."""
+        at = (index, side, slot)
+        stats = PokemonStats((float(self._hit_chance[at]), int(self._max_health[at]),
+                              int(self._attack[at]), int(self._defense[at])))
+        move_ids = [move_id for move_id in self._move[at].tolist() if move_id >= 0]
+        moves = [self._moves[move_id] for move_id in move_ids]
+        level = int(self._level[at])
+        pokemon = Pokemon(source.get_name(), stats, source.get_element_type(), moves, level)
+        pokemon.gain_experience(int(self._experience[at]) - level ** 3)
+        for move, uses in zip(moves, self._pp[at].tolist()):
+            for _ in range(move.get_max_uses() - uses):
+                pokemon.reduce_move_count(move)
+        for modifier_slot in range(int(self._modifier_count[at])):
+            modifier = self._modifier[at + (modifier_slot,)].tolist()
+            pokemon.add_stat_modifier((modifier[STAT_HIT_CHANCE], int(modifier[STAT_MAX_HEALTH]),
+                                       int(modifier[STAT_ATTACK]), int(modifier[STAT_DEFENSE])),
+                                      int(self._modifier_rounds[at + (modifier_slot,)]))
+        pokemon.modify_health(int(self._health[at]) - pokemon.get_health())
+        return pokemon
+
+    def export_trainers(self, index: int) -> Tuple[Trainer, Trainer]:
+        """Builds new trainers holding the current state of the indexed battle.
+
+        Pokemon names, types and trainer inventories are taken from the trainers
+        the battle was imported from; moves are shared with them.
+
+        Parameters:
+            index(int): The index of the battle to export.
+
+        Returns:
+            (Tuple[Trainer, Trainer]): The (player, enemy) pair for the battle.
+        """
+        exported = []
+        for side, source in enumerate(self._battles[index]):
+            trainer = Trainer(source.get_name())
+            for slot, pokemon in enumerate(source.get_all_pokemon()):
+                trainer.add_pokemon(self._export_pokemon(index, side, slot, pokemon))
+            if len(trainer.get_all_pokemon()) != 0:
+                trainer.switch_pokemon(int(self._current[index, side]))
+            for item, uses in source.get_inventory().items():
+                trainer.add_item(item, uses)
+            exported.append(trainer)
+        return exported[PLAYER_SIDE], exported[ENEMY_SIDE]
+
+
+if __name__ == "__main__":
+    import data
+    engine = VectorBattleEngine([(data.ash, data.brock)] * 10000, rng=np.random.default_rng(0))
+    engine.run()
+    print(engine.get_report())